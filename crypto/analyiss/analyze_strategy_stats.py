@@ -1,8 +1,9 @@
-import pandas as pd
+from crypto.backtest.trade_log import read_trades
 
 
 def analyze_strategy_stats(csv_path: str) -> None:
-    trade_data = pd.read_csv(csv_path)
+    # Бинарный лог рядом с CSV, если он есть, — и только нужные колонки
+    trade_data = read_trades(csv_path, ["reason", "entry_time", "exit_time"])
 
     # Общее количество сделок
     total_trades = len(trade_data)
@@ -11,8 +12,6 @@ def analyze_strategy_stats(csv_path: str) -> None:
     reason_counts = trade_data["reason"].value_counts(normalize=True)
 
     # Средняя длительность сделки (в часах)
-    trade_data["entry_time"] = pd.to_datetime(trade_data["entry_time"])
-    trade_data["exit_time"] = pd.to_datetime(trade_data["exit_time"])
     trade_data["duration_hours"] = (
         trade_data["exit_time"] - trade_data["entry_time"]
     ).dt.total_seconds() / 3600
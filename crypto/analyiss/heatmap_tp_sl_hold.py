@@ -1,75 +1,166 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from functools import partial
+
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
 
-# === Параметры поиска ===
-tp_range = np.arange(1.0, 3.1, 0.5)
-sl_range = np.arange(0.5, 2.1, 0.5)
-hold_range = [24]  # фиксируем HOLD для упрощения первого heatmap
+from crypto.artifacts import PREDICTIONS, read_frame
+from crypto.shared_arrays import SharedArrays, attach_arrays, shared_arrays
 
-# === Загрузка данных ===
-price_data = pd.read_csv("crypto/processed/BTCUSDT_predictions.csv", parse_dates=True, index_col=0)
+# === Параметры поиска ===
+TP_RANGE = np.arange(1.0, 3.1, 0.5)
+SL_RANGE = np.arange(0.5, 2.1, 0.5)
+HOLD_RANGE = [6, 12, 24, 48]
+STD_WINDOW = 24  # rolling window for the return std used to size TP/SL
+
+
+@dataclass(frozen=True)
+class SweepState:
+    # Everything that does not depend on (TP, SL, hold) — computed once per sweep
+    entries: np.ndarray  # candle positions with prediction == 1
+    entry_price: np.ndarray
+    std: np.ndarray
+    highs: np.ndarray  # (entries × max_hold) forward windows, entry candle included
+    lows: np.ndarray
+    closes: np.ndarray
+    n_rows: int
+
+
+def prepare_sweep(price_df: pd.DataFrame, max_hold: int) -> SweepState:
+    std = price_df["return"].rolling(window=STD_WINDOW).std().fillna(0).to_numpy(dtype=float)
+    close = price_df["close"].to_numpy(dtype=float)
+    n_rows = len(price_df)
+
+    entries = np.flatnonzero(price_df["prediction"].to_numpy() == 1)
+    entries = entries[entries + 1 < n_rows]  # the shortest hold still needs one candle ahead
+
+    # Pad by max_hold so every window can be sliced; padded cells are never read for valid holds
+    window = np.arange(max_hold)
+    positions = np.minimum(entries[:, None] + window, n_rows - 1)
+    return SweepState(
+        entries=entries,
+        entry_price=close[entries],
+        std=std[entries],
+        highs=price_df["high"].to_numpy(dtype=float)[positions],
+        lows=price_df["low"].to_numpy(dtype=float)[positions],
+        closes=close[positions],
+        n_rows=n_rows,
+    )
+
+
+def _first_hit(hits: np.ndarray) -> np.ndarray:
+    return np.where(hits.any(axis=1), hits.argmax(axis=1), hits.shape[1])
+
+
+def _sweep_tp(
+    state: SweepState, tp_factor: float, sl_factors: list[float], holds: list[int]
+) -> list[tuple[float, float, int, float]]:
+    tp = state.entry_price * (1 + tp_factor * state.std)
+    tp_col = _first_hit(state.highs >= tp[:, None])
+    tp_gain = 1 + tp_factor * state.std
+
+    results = []
+    for sl_factor in sl_factors:
+        sl = state.entry_price * (1 - sl_factor * state.std)
+        sl_col = _first_hit(state.lows <= sl[:, None])
+        sl_loss = 1 - sl_factor * state.std
+
+        for hold in holds:
+            valid = state.entries + hold < state.n_rows
+            timeout = state.closes[:, hold - 1] / state.entry_price
+            factors = np.where(
+                (tp_col < hold) & (tp_col <= sl_col),
+                tp_gain,
+                np.where(sl_col < hold, sl_loss, timeout),
+            )[valid]
+            # cumprod is strictly sequential, so this rounds like `equity *= factor`
+            equity = factors.cumprod()[-1] if len(factors) else 1.0
+            results.append((tp_factor, sl_factor, hold, float(equity - 1)))
+    return results
+
+
+_worker_state: SweepState | None = None
+
+
+def _init_worker(shared: SharedArrays, n_rows: int) -> None:
+    # Окна (entries × max_hold) лежат в shared memory один раз — воркер их не копирует
+    global _worker_state
+    _worker_state = SweepState(**attach_arrays(shared), n_rows=n_rows)
+
+
+def _sweep_tp_in_worker(
+    tp_factor: float, sl_factors: list[float], holds: list[int]
+) -> list[tuple[float, float, int, float]]:
+    assert _worker_state is not None
+    return _sweep_tp(_worker_state, tp_factor, sl_factors, holds)
+
+
+def sweep_grid(
+    price_df: pd.DataFrame,
+    tp_factors: list[float],
+    sl_factors: list[float],
+    holds: list[int],
+    workers: int | None = None,
+) -> pd.DataFrame:
+    state = prepare_sweep(price_df, max(holds))
+    workers = workers or os.cpu_count() or 1
+    tp_factors = [float(tp) for tp in tp_factors]
+    sl_factors = [float(sl) for sl in sl_factors]
+
+    if workers == 1 or len(tp_factors) == 1:
+        chunks = [_sweep_tp(state, tp, sl_factors, holds) for tp in tp_factors]
+    else:
+        # The shared state is published once for all workers, not pickled into each of them
+        arrays = {f.name: getattr(state, f.name) for f in fields(state) if f.name != "n_rows"}
+        with shared_arrays(arrays) as shared, ProcessPoolExecutor(
+            max_workers=min(workers, len(tp_factors)),
+            initializer=_init_worker,
+            initargs=(shared, state.n_rows),
+        ) as pool:
+            sweep_tp = partial(_sweep_tp_in_worker, sl_factors=sl_factors, holds=holds)
+            chunks = list(pool.map(sweep_tp, tp_factors))
+
+    results = [row for chunk in chunks for row in chunk]
+    return pd.DataFrame(results, columns=["TP", "SL", "Hold", "Return"])
 
 
 # === Функция: фильтрация по pred == 1 и расчет прибыли ===
 def simulate_trades(
     price_df: pd.DataFrame, tp_factor: float, sl_factor: float, hold_hours: int
 ) -> float:
-    equity = 1.0
-    std = price_df["return"].rolling(window=24).std().fillna(0)
-
-    # Iterate using integer index
-    for idx in range(len(price_df)):
-        row = price_df.iloc[idx]
-        if row["prediction"] == 1:
-            entry = row["close"]
-            std_value = std.iloc[idx]  # Use iloc instead of loc with Hashable
-            tp = entry * (1 + tp_factor * std_value)
-            sl = entry * (1 - sl_factor * std_value)
-
-            # Use integer indexing
-            if idx + hold_hours >= len(price_df):
-                continue
-
-            future_window = price_df.iloc[idx : idx + hold_hours]
-
-            for _, fut in future_window.iterrows():
-                high = fut["high"]
-                low = fut["low"]
-
-                if high >= tp:
-                    equity *= 1 + tp_factor * std_value
-                    break
-
-                if low <= sl:
-                    equity *= 1 - sl_factor * std_value
-                    break
-            else:
-                if idx + hold_hours - 1 < len(price_df):
-                    equity *= price_df.iloc[idx + hold_hours - 1]["close"] / entry
-
-    return equity - 1  # cumulative return
-
-
-# === Сетка результатов ===
-results = []
-
-for tp in tp_range:
-    for sl in sl_range:
-        ret = simulate_trades(price_data.copy(), float(tp), float(sl), hold_range[0])
-        results.append((tp, sl, ret))
-
-# === Построение тепловой карты ===
-results_df = pd.DataFrame(results, columns=["TP", "SL", "Return"])
-# Use index and columns parameters for pivot
-heatmap_data = pd.pivot_table(results_df, values="Return", index="SL", columns="TP").astype(float)
-
-_ = plt.figure(figsize=(10, 6))
-# Simplify heatmap call to avoid type issues
-_ = sns.heatmap(heatmap_data, annot=True, fmt=".2%", cmap="RdYlGn", center=0)
-_ = plt.title(f"Heatmap — Cumulative Return by TP/SL (Hold={hold_range[0]}h)")
-_ = plt.xlabel("Take Profit Multiplier")
-_ = plt.ylabel("Stop Loss Multiplier")
-_ = plt.tight_layout()
-_ = plt.show()
+    state = prepare_sweep(price_df, hold_hours)
+    [(_, _, _, cumulative_return)] = _sweep_tp(state, tp_factor, [sl_factor], [hold_hours])
+    return cumulative_return
+
+
+def plot_heatmaps(results_df: pd.DataFrame) -> None:
+    holds = sorted(results_df["Hold"].unique())
+    _, axes = plt.subplots(1, len(holds), figsize=(8 * len(holds), 6), squeeze=False)
+
+    for ax, hold in zip(axes[0], holds, strict=True):
+        # Use index and columns parameters for pivot
+        heatmap_data = pd.pivot_table(
+            results_df[results_df["Hold"] == hold], values="Return", index="SL", columns="TP"
+        ).astype(float)
+        _ = sns.heatmap(heatmap_data, annot=True, fmt=".2%", cmap="RdYlGn", center=0, ax=ax)
+        _ = ax.set_title(f"Heatmap — Cumulative Return by TP/SL (Hold={hold}h)")
+        _ = ax.set_xlabel("Take Profit Multiplier")
+        _ = ax.set_ylabel("Stop Loss Multiplier")
+
+    _ = plt.tight_layout()
+    _ = plt.show()
+
+
+if __name__ == "__main__":
+    # === Загрузка данных ===
+    price_data = read_frame("crypto/processed/BTCUSDT_predictions.csv", PREDICTIONS)
+
+    # === Сетка результатов ===
+    results = sweep_grid(price_data, list(TP_RANGE), list(SL_RANGE), HOLD_RANGE)
+
+    # === Построение тепловой карты ===
+    plot_heatmaps(results)
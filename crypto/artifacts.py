@@ -0,0 +1,172 @@
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from crypto.backtest.trade_log import read_trades, trade_log_path, write_trade_log
+
+# Constants
+BINARY_SUFFIX = ".npz"  # <name>.csv → <name>.npz next to it; the CSV is only an export
+BINARY_VERSION = 1
+INDEX_KEY = "_index"  # open_time as int64 epoch milliseconds
+INDEX_NAME_KEY = "_index_name"
+
+
+@dataclass(frozen=True)
+class Schema:
+    name: str
+    columns: dict[str, str] = field(default_factory=dict)  # known column → dtype, others kept
+
+
+# float32 — только там, где колонку не сравнивают с ценой или порогом: объём, macd и volatility
+# (бэктесты пересчитывают volatility из close). Цены, ema, rsi, return, вероятности — float64
+KLINES = Schema(
+    "klines",
+    {
+        "open": "float64",
+        "high": "float64",
+        "low": "float64",
+        "close": "float64",
+        "volume": "float32",
+    },
+)
+FEATURES = Schema(
+    "features",
+    KLINES.columns
+    | {
+        "rsi": "float64",
+        "macd": "float32",
+        "ema20": "float64",
+        "ema50": "float64",
+        "return": "float64",
+        "volatility": "float32",
+        "target": "int8",
+    },
+)
+PREDICTIONS = Schema(
+    "predictions", FEATURES.columns | {"prediction": "int8", "prediction_prob": "float64"}
+)
+TRADES = Schema("trades")  # колонки и бинарный формат сделок ведёт trade_log
+
+
+def schema_for(path: str | Path) -> Schema:
+    # По имени артефакта: <symbol>_predictions, <symbol>_features, *backtest* — сделки
+    stem = Path(path).name.split(".")[0]
+    if stem.endswith("_predictions"):
+        return PREDICTIONS
+    if stem.endswith("_features"):
+        return FEATURES
+    if "backtest" in stem or stem.endswith("_trades"):
+        return TRADES
+    return KLINES
+
+
+def binary_path(path: str | Path, schema: Schema | None = None) -> Path:
+    if (schema or schema_for(path)) is TRADES:
+        return trade_log_path(path)
+    return Path(path).with_suffix(BINARY_SUFFIX)
+
+
+def apply_schema(df: pd.DataFrame, schema: Schema) -> pd.DataFrame:
+    dtypes = {
+        name: dtype
+        for name, dtype in schema.columns.items()
+        if name in df.columns and df[name].dtype != dtype
+    }
+    return df.astype(dtypes) if dtypes else df
+
+
+def _epoch_ms(index: pd.Index) -> np.ndarray:
+    return index.values.astype("datetime64[ms]").view("i8")
+
+
+def write_frame(
+    df: pd.DataFrame, path: str | Path, schema: Schema | None = None, export_csv: bool = True
+) -> Path:
+    path, schema = Path(path), schema or schema_for(path)
+    if schema is TRADES:
+        if export_csv:
+            df.to_csv(path)
+        return write_trade_log(df, trade_log_path(path))
+
+    df = apply_schema(df, schema)
+    # CSV — раньше бинарного: бинарный файл не старше CSV и читается вместо него
+    if export_csv:
+        df.to_csv(path)
+
+    columns = {
+        "_version": np.array(BINARY_VERSION),
+        INDEX_KEY: _epoch_ms(df.index),
+        INDEX_NAME_KEY: np.array(df.index.name or ""),
+    }
+    for name in df.columns:
+        values = df[name].to_numpy()
+        if values.dtype.hasobject:
+            raise TypeError(f"Column {name!r} of {path.name} has no fixed dtype")
+        columns[name] = values
+
+    out_path = binary_path(path, schema)
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    with tmp_path.open("wb") as binary:
+        np.savez(binary, **columns)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def read_binary(path: str | Path, columns: list[str] | None = None) -> pd.DataFrame:
+    # Колонки npz читаются по одной — ненужные не попадают в память
+    with np.load(path, allow_pickle=False) as archive:
+        names = columns or [name for name in archive.files if not name.startswith("_")]
+        index = pd.DatetimeIndex(
+            archive[INDEX_KEY].view("datetime64[ms]").astype("datetime64[ns]"),
+            name=str(archive[INDEX_NAME_KEY]) or None,
+        )
+        return pd.DataFrame({name: archive[name] for name in names}, index=index, copy=False)
+
+
+def read_csv(
+    path: str | Path, schema: Schema | None = None, columns: list[str] | None = None
+) -> pd.DataFrame:
+    # Явные dtype вместо вывода типов, даты — сразу ISO-форматом без угадывания
+    schema = schema or schema_for(path)
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [header[0], *(name for name in header[1:] if columns is None or name in columns)]
+    df = pd.read_csv(
+        path,
+        index_col=0,
+        usecols=usecols,
+        dtype={name: schema.columns[name] for name in usecols if name in schema.columns},
+        parse_dates=[0],
+        date_format="ISO8601",
+    )
+    df.index = pd.DatetimeIndex(df.index.values.astype("datetime64[ns]"), name=df.index.name)
+    return df if columns is None else df[columns]
+
+
+def read_frame(
+    path: str | Path,
+    schema: Schema | None = None,
+    columns: list[str] | None = None,
+    cache: bool = True,
+) -> pd.DataFrame:
+    path = Path(path)
+    schema = schema or schema_for(path)
+    if schema is TRADES:
+        return read_trades(path, columns)
+
+    binary = path if path.suffix == BINARY_SUFFIX else binary_path(path, schema)
+    if binary.exists() and (
+        binary == path
+        or not path.exists()
+        or binary.stat().st_mtime_ns >= path.stat().st_mtime_ns
+    ):
+        return read_binary(binary, columns)
+
+    # CSV новее (или бинарного нет) — читаем его и сразу кладём рядом бинарный для следующих стадий
+    if not cache:
+        return read_csv(path, schema, columns)
+    df = read_csv(path, schema)
+    write_frame(df, path, schema, export_csv=False)
+    return df if columns is None else df[columns]
@@ -0,0 +1 @@
+"""Shared backtesting engine for cryptocurrency strategies."""
@@ -0,0 +1,119 @@
+import math
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from crypto.artifacts import PREDICTIONS, read_frame
+from crypto.backtest.engine import SL, TIMEOUT, TP, TRAIL, price_arrays, resolve_trailhawk_exits
+from crypto.strategies.trailhawk_24.run_strategy import (
+    STOP_LOSS_MULT,
+    TAKE_PROFIT_MULT,
+    TRAIL_ACTIVATION_THRESHOLD,
+    TRAIL_MULT,
+)
+
+# Constants
+BENCHMARK_HOLDS = (3, 24, 168)
+BENCHMARK_REPEATS = 3
+DEFAULT_SOURCE = "crypto/data/BTCUSDT_1h_2020-05-01_2025-05-01.csv"
+
+
+def python_loop_exits(
+    arrays: dict[str, np.ndarray],
+    entries: np.ndarray,
+    hold: int,
+    tp_mult: float,
+    sl_mult: float,
+    trail_mult: float,
+    trail_activation: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Эталон: построчный цикл из исходного run_btc_backtest, только на списках вместо iloc
+    highs, lows = arrays["high"].tolist(), arrays["low"].tolist()
+    closes = arrays["close"].tolist()
+    stds = arrays["volatility"].tolist()
+
+    exit_pos, exit_price, reason = [], [], []
+    for i in entries.tolist():
+        entry, std = closes[i], stds[i]
+        tp, sl = entry + std * tp_mult, entry - std * sl_mult
+        trail_active, trail_stop = False, -math.inf
+        result = (i + hold, closes[i + hold], TIMEOUT)
+
+        for j in range(1, hold + 1):
+            high, low, close = highs[i + j], lows[i + j], closes[i + j]
+            if not trail_active and (high - entry) / entry >= trail_activation:
+                trail_active = True
+            if trail_active:
+                trail_stop = max(trail_stop, close - std * trail_mult)
+                if low <= trail_stop:
+                    result = (i + j, trail_stop, TRAIL)
+                    break
+            if high >= tp:
+                result = (i + j, tp, TP)
+                break
+            if low <= sl:
+                result = (i + j, sl, SL)
+                break
+
+        exit_pos.append(result[0])
+        exit_price.append(result[1])
+        reason.append(result[2])
+
+    return np.array(exit_pos), np.array(exit_price), np.array(reason)
+
+
+def _best_of(func, repeats: int) -> tuple[float, tuple]:
+    best, result = math.inf, ()
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def benchmark_exit_resolvers(
+    price_data: pd.DataFrame,
+    holds: tuple[int, ...] = BENCHMARK_HOLDS,
+    repeats: int = BENCHMARK_REPEATS,
+) -> pd.DataFrame:
+    price_data = price_data.copy()
+    price_data["volatility"] = price_data["close"].rolling(window=10).std()
+    arrays = price_arrays(price_data)
+    params = (TAKE_PROFIT_MULT, STOP_LOSS_MULT, TRAIL_MULT, TRAIL_ACTIVATION_THRESHOLD)
+
+    results = []
+    for hold in holds:
+        # Каждая свеча с посчитанной волатильностью — кандидат на вход: худший случай для резолвера
+        entries = np.flatnonzero(~np.isnan(arrays["volatility"][: len(price_data) - hold - 1]))
+
+        loop_seconds, expected = _best_of(
+            lambda: python_loop_exits(arrays, entries, hold, *params), repeats
+        )
+        kernel_seconds, actual = _best_of(
+            lambda: resolve_trailhawk_exits(arrays, entries, hold, *params), repeats
+        )
+
+        results.append(
+            {
+                "hold": hold,
+                "entries": len(entries),
+                "loop_ms": loop_seconds * 1000,
+                "kernel_ms": kernel_seconds * 1000,
+                "speedup": loop_seconds / kernel_seconds,
+                "identical": all(
+                    np.array_equal(a, b, equal_nan=True) for a, b in zip(expected, actual)
+                ),
+            }
+        )
+
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOURCE
+    report = benchmark_exit_resolvers(read_frame(source, PREDICTIONS))
+
+    print(f"\n=== Trailhawk exit resolver — kernel vs Python loop ({source}) ===")
+    print(report.to_string(index=False, float_format="{:.2f}".format))
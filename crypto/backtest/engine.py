@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+
+from crypto.instrumentation import count_filter
+
+# Constants
+ENTRY_BATCH_SIZE = 8192  # entries resolved per batch — bounds the (entries × hold) window memory
+REASONS = np.array(["tp", "sl", "trail", "timeout"])
+TP, SL, TRAIL, TIMEOUT = range(4)
+
+PRICE_COLUMNS = [
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "prediction",
+    "prediction_prob",
+    "rsi",
+    "ema20",
+    "ema50",
+    "volatility",
+]
+
+
+def price_arrays(price_data: pd.DataFrame) -> dict[str, np.ndarray]:
+    # Один раз вытаскиваем колонки в непрерывные float64-массивы
+    return {
+        column: np.ascontiguousarray(price_data[column].to_numpy(dtype=float))
+        for column in PRICE_COLUMNS
+        if column in price_data.columns
+    }
+
+
+def smart_filter(
+    arrays: dict[str, np.ndarray], min_prob: float, rsi_overbought: float, vol_threshold: float
+) -> np.ndarray:
+    # Rejection rule → mask of candles that pass it, in evaluation order.
+    # Negated comparisons on purpose: a NaN feature passes the filter, exactly like the row loop did
+    conditions = {
+        "prediction != 1": arrays["prediction"] == 1,
+        "prediction_prob < min_prob": ~(arrays["prediction_prob"] < min_prob),
+        "rsi >= rsi_overbought": ~(arrays["rsi"] >= rsi_overbought),
+        "ema20 <= ema50": ~(arrays["ema20"] <= arrays["ema50"]),
+        "volatility < vol_threshold": ~(arrays["volatility"] < vol_threshold),
+    }
+    count_filter("smart_filter", conditions)
+    return np.logical_and.reduce(list(conditions.values()))
+
+
+def entry_indices(mask: np.ndarray, hold: int) -> np.ndarray:
+    # Same range as `for i in range(len(price_data) - hold - 1)`
+    return np.flatnonzero(mask[: max(len(mask) - hold - 1, 0)])
+
+
+def forward_windows(values: np.ndarray, entries: np.ndarray, hold: int) -> np.ndarray:
+    # Row k holds values[entries[k] + 1 : entries[k] + hold + 1]
+    return values[entries[:, None] + np.arange(1, hold + 1)]
+
+
+def _first_true(hits: np.ndarray) -> np.ndarray:
+    width = hits.shape[1]
+    return np.where(hits.any(axis=1), hits.argmax(axis=1), width)
+
+
+def _batches(entries: np.ndarray):
+    for start in range(0, len(entries), ENTRY_BATCH_SIZE):
+        yield slice(start, start + ENTRY_BATCH_SIZE)
+
+
+def _finalize_exits(
+    entries: np.ndarray,
+    exit_col: np.ndarray,
+    reason: np.ndarray,
+    exit_price: np.ndarray,
+    close: np.ndarray,
+    hold: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    timeout = reason == TIMEOUT
+    exit_price[timeout] = close[entries[timeout] + hold]
+    exit_pos = entries + np.minimum(exit_col + 1, hold)
+    return exit_pos, exit_price, reason
+
+
+def resolve_basic_exits(
+    arrays: dict[str, np.ndarray],
+    entries: np.ndarray,
+    hold: int,
+    tp_mult: float,
+    sl_mult: float,
+    trail_start: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Order per candle: TP → SL → trailing stop (from candle `trail_start`) → timeout
+    exit_pos = np.empty(len(entries), dtype=np.int64)
+    exit_price = np.empty(len(entries))
+    reason = np.empty(len(entries), dtype=np.int64)
+
+    for batch in _batches(entries):
+        idx = entries[batch]
+        entry = arrays["close"][idx]
+        vol = arrays["volatility"][idx]
+        stop_loss = entry - vol * sl_mult
+        take_profit = entry + vol * tp_mult
+
+        highs = forward_windows(arrays["high"], idx, hold)
+        lows = forward_windows(arrays["low"], idx, hold)
+
+        tp_col = _first_true(highs >= take_profit[:, None])
+        sl_col = _first_true(lows <= stop_loss[:, None])
+
+        # Trail = running max of closes since `trail_start` minus volatility
+        offset = max(trail_start - 1, 0)
+        trail = np.full((len(idx), hold), np.nan)
+        trail_col = np.full(len(idx), hold)
+        if offset < hold:
+            closes = forward_windows(arrays["close"], idx, hold)[:, offset:]
+            trail[:, offset:] = np.maximum.accumulate(closes, axis=1) - vol[:, None]
+            trail_col = _first_true(lows[:, offset:] < trail[:, offset:]) + offset
+
+        exit_col = np.minimum(np.minimum(tp_col, sl_col), trail_col)
+        batch_reason = np.select(
+            [exit_col == hold, tp_col == exit_col, sl_col == exit_col], [TIMEOUT, TP, SL], TRAIL
+        )
+        rows = np.arange(len(idx))
+        batch_price = np.select(
+            [batch_reason == TP, batch_reason == SL, batch_reason == TRAIL],
+            [take_profit, stop_loss, trail[rows, np.minimum(exit_col, hold - 1)]],
+            np.nan,
+        )
+
+        exit_pos[batch], exit_price[batch], reason[batch] = _finalize_exits(
+            idx, exit_col, batch_reason, batch_price, arrays["close"], hold
+        )
+
+    return exit_pos, exit_price, reason
+
+
+def candle_windows(values: np.ndarray, hold: int) -> np.ndarray:
+    # Zero-copy strided view: row i is values[i + 1 : i + hold + 1]
+    return np.lib.stride_tricks.sliding_window_view(values[1:], hold)
+
+
+def resolve_trailhawk_exits(
+    arrays: dict[str, np.ndarray],
+    entries: np.ndarray,
+    hold: int,
+    tp_mult: float,
+    sl_mult: float,
+    trail_mult: float,
+    trail_activation: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Order per candle: trailing stop (once activated) → TP → SL → timeout.
+    # The trail is path-dependent, so the kernel walks the windows candle by candle
+    # for all open trades at once, carrying each trade's state in arrays.
+    entry = arrays["close"][entries]
+    std = arrays["volatility"][entries]
+    tp = entry + std * tp_mult
+    sl = entry - std * sl_mult
+    trail_offset = std * trail_mult
+
+    active = np.zeros(len(entries), dtype=bool)
+    best_close = np.full(len(entries), -np.inf)  # trail = best close since activation - offset
+    exit_col = np.full(len(entries), hold)
+    exit_price = np.full(len(entries), np.nan)
+    reason = np.full(len(entries), TIMEOUT)
+
+    if len(entries) == 0:
+        return _finalize_exits(entries, exit_col, reason, exit_price, arrays["close"], hold)
+
+    highs = candle_windows(arrays["high"], hold)
+    lows = candle_windows(arrays["low"], hold)
+    closes = candle_windows(arrays["close"], hold)
+
+    running = np.arange(len(entries))
+    for col in range(hold):
+        if len(running) == 0:
+            break  # every trade already closed — the rest of the window is never read
+        rows = entries[running]
+        high, low, close = highs[rows, col], lows[rows, col], closes[rows, col]
+        price = entry[running]
+
+        # Trailing stop switches on at the first candle whose high clears the activation threshold
+        trail_on = active[running] | ((high - price) / price >= trail_activation)
+        active[running] = trail_on
+        best = np.where(trail_on, np.maximum(best_close[running], close), best_close[running])
+        best_close[running] = best
+        trail = best - trail_offset[running]
+
+        hit_trail = trail_on & (low <= trail)
+        hit_tp = ~hit_trail & (high >= tp[running])
+        hit_sl = ~hit_trail & ~hit_tp & (low <= sl[running])
+        closed = hit_trail | hit_tp | hit_sl
+
+        done = running[closed]
+        exit_col[done] = col
+        reason[done] = np.select([hit_trail[closed], hit_tp[closed]], [TRAIL, TP], SL)
+        exit_price[done] = np.select(
+            [hit_trail[closed], hit_tp[closed]], [trail[closed], tp[done]], sl[done]
+        )
+        running = running[~closed]
+
+    return _finalize_exits(entries, exit_col, reason, exit_price, arrays["close"], hold)
+
+
+def compound_balance(pnl_pct: np.ndarray, start_balance: float) -> tuple[np.ndarray, np.ndarray]:
+    # Sequential on purpose — `balance += balance * pnl` must round exactly like the original loop
+    profits = np.empty(len(pnl_pct))
+    balances = np.empty(len(pnl_pct))
+    balance = start_balance
+    for k, pnl in enumerate(pnl_pct.tolist()):
+        profits[k] = balance * pnl
+        balance += profits[k]
+        balances[k] = balance
+    return profits, balances
@@ -0,0 +1,235 @@
+import heapq
+import math
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from crypto.artifacts import PREDICTIONS, read_frame
+from crypto.strategies.trailhawk_24.run_strategy import (
+    COMMISSION,
+    START_BALANCE,
+    backtest_trades,
+)
+
+# Constants
+MAX_POSITIONS = 5  # concurrent positions across all symbols; each gets 1 / MAX_POSITIONS of equity
+BAR_FREQ = "1h"
+CANDIDATE_COLUMNS = [
+    "high",
+    "low",
+    "close",
+    "prediction",
+    "prediction_prob",
+    "rsi",
+    "ema20",
+    "ema50",
+]
+
+
+@dataclass(frozen=True, slots=True)
+class Candidate:
+    entry_ns: int
+    prob: float
+    symbol: str
+    exit_ns: int
+    pnl_pct: float  # already net of commission on both sides
+    reason: str
+    entry_price: float  # raw close at entry, before commission
+
+
+def symbol_candidates(
+    path: str, hold: int = 24, min_prob: float = 0.52, vol_threshold: float = 0.0007
+) -> list[Candidate]:
+    # Читаем только нужные колонки; наружу уходят сделки-кандидаты, а не весь DataFrame
+    price_data = read_frame(path, PREDICTIONS, CANDIDATE_COLUMNS)
+    trades_df = backtest_trades(price_data, hold, min_prob, vol_threshold)
+    probs = price_data["prediction_prob"].reindex(trades_df["entry_time"]).to_numpy()
+
+    symbol = Path(path).name.split("_")[0]
+    return [
+        Candidate(entry_ns, prob, symbol, exit_ns, pnl_pct, reason, entry_price)
+        for entry_ns, prob, exit_ns, pnl_pct, reason, entry_price in zip(
+            trades_df["entry_time"].values.astype("datetime64[ns]").view("i8").tolist(),
+            probs.tolist(),
+            trades_df["exit_time"].values.astype("datetime64[ns]").view("i8").tolist(),
+            trades_df["pnl_pct"].tolist(),
+            trades_df["reason"].tolist(),
+            trades_df["entry_price"].tolist(),
+        )
+    ]
+
+
+def merge_candidates(streams: Iterable[Iterable[Candidate]]) -> Iterator[Candidate]:
+    # Сортированное слияние по времени входа; при равенстве — сначала более уверенный сигнал
+    return heapq.merge(*streams, key=lambda candidate: (candidate.entry_ns, -candidate.prob))
+
+
+@dataclass
+class Portfolio:
+    # Учёт по балансовой стоимости: позиция стоит вложенную сумму, пока не закрыта;
+    # переоценка по рынку — в exposure_by_bar
+    cash: float = START_BALANCE
+    max_positions: int = MAX_POSITIONS
+    positions: dict[str, float] = field(default_factory=dict)  # symbol → invested amount
+    exits: list[tuple[int, int, Candidate]] = field(default_factory=list)  # heap by exit time
+    trades: list[dict] = field(default_factory=list)
+    events: list[tuple[int, float, float, int]] = field(default_factory=list)
+    opened: int = 0  # tie-breaker for exits at the same time
+    skipped_busy: int = 0
+    skipped_full: int = 0
+
+    @property
+    def invested(self) -> float:
+        return sum(self.positions.values())
+
+    @property
+    def equity(self) -> float:
+        return self.cash + self.invested
+
+    def _record(self, time_ns: int) -> None:
+        self.events.append((time_ns, self.equity, self.invested, len(self.positions)))
+
+    def settle(self, until_ns: float) -> None:
+        # Выходы до входа на той же свече: освободившийся капитал сразу доступен
+        while self.exits and self.exits[0][0] <= until_ns:
+            exit_ns, _, candidate = heapq.heappop(self.exits)
+            size = self.positions.pop(candidate.symbol)
+            proceeds = size * (1 + candidate.pnl_pct)
+            self.cash += proceeds
+            self.trades.append(
+                {
+                    "symbol": candidate.symbol,
+                    "entry_time": candidate.entry_ns,
+                    "exit_time": exit_ns,
+                    "prediction_prob": candidate.prob,
+                    "size": size,
+                    "entry_price": candidate.entry_price,
+                    "pnl_pct": candidate.pnl_pct,
+                    "pnl_usd": proceeds - size,
+                    "equity": self.equity,
+                    "reason": candidate.reason,
+                }
+            )
+            self._record(exit_ns)
+
+    def try_open(self, candidate: Candidate) -> bool:
+        self.settle(candidate.entry_ns)
+        if candidate.symbol in self.positions:
+            self.skipped_busy += 1
+            return False
+        if len(self.positions) >= self.max_positions:
+            self.skipped_full += 1
+            return False
+
+        size = min(self.cash, self.equity / self.max_positions)
+        self.cash -= size
+        self.positions[candidate.symbol] = size
+        heapq.heappush(self.exits, (candidate.exit_ns, self.opened, candidate))
+        self.opened += 1
+        self._record(candidate.entry_ns)
+        return True
+
+
+def simulate_portfolio(
+    candidates: Iterable[Candidate],
+    start_balance: float = START_BALANCE,
+    max_positions: int = MAX_POSITIONS,
+) -> Portfolio:
+    portfolio = Portfolio(cash=start_balance, max_positions=max_positions)
+    for candidate in candidates:
+        _ = portfolio.try_open(candidate)
+    portfolio.settle(math.inf)
+    return portfolio
+
+
+def read_closes(paths: list[str]) -> dict[str, pd.Series]:
+    # Цены закрытия по символам — для переоценки открытых позиций на каждом баре
+    return {
+        Path(path).name.split("_")[0]: read_frame(path, PREDICTIONS, ["close"])["close"]
+        for path in paths
+    }
+
+
+def exposure_by_bar(
+    portfolio: Portfolio, closes: dict[str, pd.Series], freq: str = BAR_FREQ
+) -> pd.DataFrame:
+    # Между событиями кэш не меняется — протягиваем последнее событие на каждый бар
+    events = pd.DataFrame(
+        portfolio.events, columns=["time", "equity", "invested", "open_positions"]
+    )
+    events["time"] = pd.to_datetime(events["time"])
+    events = events.groupby("time").last()
+
+    bars = pd.date_range(events.index[0], events.index[-1], freq=freq, name="time")
+    per_bar = events.reindex(events.index.union(bars)).ffill().loc[bars]
+    cash = (per_bar["equity"] - per_bar["invested"]).to_numpy()
+
+    # Открытая позиция стоит столько, сколько дала бы продажа по close бара (с комиссией выхода)
+    bar_ns = bars.values.astype("datetime64[ns]").view("i8")
+    marked = np.zeros(len(bars))
+    close_by_bar = {
+        symbol: close.reindex(bars).ffill().to_numpy(dtype=float)
+        for symbol, close in closes.items()
+    }
+    for trade in portfolio.trades:
+        held = slice(*np.searchsorted(bar_ns, [trade["entry_time"], trade["exit_time"]]))
+        units = trade["size"] / (trade["entry_price"] * (1 + COMMISSION))
+        marked[held] += units * close_by_bar[trade["symbol"]][held] * (1 - COMMISSION)
+
+    per_bar["invested"] = marked
+    per_bar["equity"] = cash + marked
+    per_bar["exposure"] = per_bar["invested"] / per_bar["equity"]
+    per_bar["drawdown"] = per_bar["equity"] / per_bar["equity"].cummax() - 1
+    return per_bar
+
+
+def run_portfolio_backtest(
+    paths: list[str] | None = None,
+    max_positions: int = MAX_POSITIONS,
+    workers: int = 1,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    if paths is None:
+        paths = sorted(str(path) for path in Path("crypto/processed").glob("*_predictions.csv"))
+    if not paths:
+        raise FileNotFoundError("No *_predictions.csv files to backtest")
+
+    # Символы обрабатываются по одному (или по одному на воркер) — в памяти только кандидаты
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            streams = list(pool.map(symbol_candidates, paths))
+    else:
+        streams = [symbol_candidates(path) for path in paths]
+
+    portfolio = simulate_portfolio(merge_candidates(streams), max_positions=max_positions)
+    if not portfolio.trades:
+        raise ValueError("No trades were taken by the portfolio")
+
+    trades_df = pd.DataFrame(portfolio.trades)
+    trades_df["entry_time"] = pd.to_datetime(trades_df["entry_time"])
+    trades_df["exit_time"] = pd.to_datetime(trades_df["exit_time"])
+    per_bar = exposure_by_bar(portfolio, read_closes(paths))
+
+    trades_df.to_csv("crypto/processed/portfolio_trades.csv", index=False)
+    per_bar.to_csv("crypto/processed/portfolio_equity.csv")
+
+    print(f"\n=== Portfolio — {len(paths)} symbols, max {max_positions} positions ===")
+    print(f"Trades taken: {len(trades_df)}")
+    print(
+        f"Signals skipped: {portfolio.skipped_full} (all slots busy), "
+        f"{portfolio.skipped_busy} (symbol already held)"
+    )
+    print(f"Final equity: ${portfolio.equity:.2f}")
+    print(f"Total return: {(portfolio.equity / START_BALANCE - 1):.2%}")
+    print(f"Max drawdown: {per_bar['drawdown'].min():.2%}")
+    print(f"Average exposure: {per_bar['exposure'].mean():.2%}")
+    print(f"Winrate: {(trades_df['pnl_pct'] > 0).mean():.2%}")
+    return trades_df, per_bar
+
+
+if __name__ == "__main__":
+    _ = run_portfolio_backtest(workers=os.cpu_count() or 1)
@@ -0,0 +1,171 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from crypto.backtest.trade_log import read_trades, trade_returns
+
+# Constants
+N_SIMULATIONS = 100_000
+SIM_CHUNK = 10_000  # simulations per matrix — bounds memory to SIM_CHUNK × n_trades floats
+BLOCK_SIZE = 5  # consecutive trades kept together by the block bootstrap (regime clustering)
+SKIP_PROB = 0.1  # chance that any single trade is missed in the random-skip simulation
+CONFIDENCE = 0.95
+METHODS = ("shuffle", "bootstrap", "block_bootstrap", "skip")
+
+
+def equity_stats(returns: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Строка — одна симуляция: полный реинвест, как в compound_balance.
+    # Всё in-place на двух буферах — на 10k × n_trades это и есть основное время
+    equity = 1 + returns
+    _ = np.cumprod(equity, axis=1, out=equity)
+    # Пик считаем от стартового капитала 1.0 — просадка с первой же сделки тоже просадка
+    ratio = np.maximum.accumulate(equity, axis=1)
+    _ = np.maximum(ratio, 1.0, out=ratio)
+    _ = np.divide(equity, ratio, out=ratio)
+    return equity[:, -1] - 1, ratio.min(axis=1, initial=1.0) - 1
+
+
+def resample(
+    returns: np.ndarray,
+    method: str,
+    n_sims: int,
+    rng: np.random.Generator,
+    block_size: int = BLOCK_SIZE,
+    skip_prob: float = SKIP_PROB,
+) -> np.ndarray:
+    n_trades = len(returns)
+
+    if method == "shuffle":
+        # Те же сделки в другом порядке: итог тот же, меняется только путь и просадка
+        return rng.permuted(np.broadcast_to(returns, (n_sims, n_trades)), axis=1)
+
+    if method == "bootstrap":
+        return returns[rng.integers(0, n_trades, size=(n_sims, n_trades))]
+
+    if method == "block_bootstrap":
+        # Циклические блоки подряд идущих сделок, обрезанные до исходной длины
+        n_blocks = -(-n_trades // block_size)
+        starts = rng.integers(0, n_trades, size=(n_sims, n_blocks, 1))
+        order = (starts + np.arange(block_size)).reshape(n_sims, -1)[:, :n_trades] % n_trades
+        return returns[order]
+
+    if method == "skip":
+        # Пропущенная сделка — ноль вместо её PnL, остальной путь не меняется
+        return np.where(rng.random((n_sims, n_trades)) < skip_prob, 0.0, returns)
+
+    raise ValueError(f"Unknown resampling method {method!r}, expected one of {METHODS}")
+
+
+def _simulate_chunk(
+    returns: np.ndarray,
+    method: str,
+    n_sims: int,
+    seed: np.random.SeedSequence,
+    block_size: int,
+    skip_prob: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    return equity_stats(resample(returns, method, n_sims, rng, block_size, skip_prob))
+
+
+def simulate(
+    returns: np.ndarray,
+    method: str,
+    n_sims: int = N_SIMULATIONS,
+    seed: int = 0,
+    block_size: int = BLOCK_SIZE,
+    skip_prob: float = SKIP_PROB,
+    workers: int = 1,
+) -> tuple[np.ndarray, np.ndarray]:
+    if method not in METHODS:
+        raise ValueError(f"Unknown resampling method {method!r}, expected one of {METHODS}")
+
+    # Свой seed на каждый чанк — результат не зависит от числа воркеров
+    sizes = [min(SIM_CHUNK, n_sims - start) for start in range(0, n_sims, SIM_CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    run_chunk = partial(
+        _simulate_chunk, returns, method, block_size=block_size, skip_prob=skip_prob
+    )
+
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as pool:
+            chunks = list(pool.map(run_chunk, sizes, seeds))
+    else:
+        chunks = [run_chunk(size, chunk_seed) for size, chunk_seed in zip(sizes, seeds)]
+
+    return (
+        np.concatenate([total for total, _ in chunks]),
+        np.concatenate([drawdown for _, drawdown in chunks]),
+    )
+
+
+def summarize(samples: np.ndarray, actual: float, confidence: float = CONFIDENCE) -> dict:
+    tail = (1 - confidence) / 2
+    ci_low, median, ci_high = np.quantile(samples, [tail, 0.5, 1 - tail])
+    return {
+        "actual": actual,
+        "mean": samples.mean(),
+        "median": median,
+        "ci_low": ci_low,
+        "ci_high": ci_high,
+        "worst": samples.min(),
+    }
+
+
+def robustness_report(
+    trades_df: pd.DataFrame,
+    methods: tuple[str, ...] = METHODS,
+    n_sims: int = N_SIMULATIONS,
+    seed: int = 0,
+    confidence: float = CONFIDENCE,
+    workers: int = 1,
+) -> pd.DataFrame:
+    returns = trade_returns(trades_df)
+    if len(returns) == 0:
+        raise ValueError("No trades to resample")
+    actual_return, actual_drawdown = equity_stats(returns[None, :])
+
+    rows = []
+    for method in methods:
+        total_return, max_drawdown = simulate(returns, method, n_sims, seed, workers=workers)
+        rows += [
+            {
+                "method": method,
+                "metric": "total_return",
+                **summarize(total_return, actual_return[0], confidence),
+                "p_loss": (total_return < 0).mean(),
+            },
+            {
+                "method": method,
+                "metric": "max_drawdown",
+                **summarize(max_drawdown, actual_drawdown[0], confidence),
+                "p_loss": np.nan,
+            },
+        ]
+    return pd.DataFrame(rows)
+
+
+def run_robustness(csv_path: str, n_sims: int = N_SIMULATIONS, workers: int = 1) -> pd.DataFrame:
+    trades_df = read_trades(csv_path)
+    started = time.perf_counter()
+    report = robustness_report(trades_df, n_sims=n_sims, workers=workers)
+
+    print(f"\n=== {Path(csv_path).name} — Robustness ({n_sims:,} resamples per method) ===")
+    print(f"Trades: {len(trades_df)} | CI: {CONFIDENCE:.0%}")
+    print(report.to_string(index=False, float_format="{:.2%}".format))
+    print(f"Elapsed: {time.perf_counter() - started:.1f}s")
+    return report
+
+
+if __name__ == "__main__":
+    for path in (
+        "crypto/processed/BTCUSDT_backtest_full_risk.csv",
+        "crypto/processed/BTCUSDT_backtest_results.csv",
+    ):
+        if Path(path).exists():
+            _ = run_robustness(path, workers=os.cpu_count() or 1)
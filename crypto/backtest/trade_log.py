@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Constants
+TRADE_LOG_SUFFIX = ".trades.npz"  # <name>.csv → <name>.trades.npz next to it
+TRADE_LOG_VERSION = 1
+CODES_SUFFIX = "__codes"  # string column → small-int codes + "<name>__labels"
+LABELS_SUFFIX = "__labels"
+TIME_COLUMNS = ("entry_time", "exit_time")
+EQUITY_COLUMNS = ("equity", "peak", "drawdown")
+PNL_COLUMNS = ("pnl_pct", "pnl")  # run_btc_backtest / run_backtest
+
+
+def trade_log_path(csv_path: str | Path) -> Path:
+    return Path(csv_path).with_suffix(TRADE_LOG_SUFFIX)
+
+
+def trade_returns(trades_df: pd.DataFrame) -> np.ndarray:
+    for column in PNL_COLUMNS:
+        if column in trades_df.columns:
+            return trades_df[column].to_numpy(dtype=float)
+    raise KeyError(f"Trades have none of the PnL columns {PNL_COLUMNS}")
+
+
+def equity_columns(returns: np.ndarray) -> dict[str, np.ndarray]:
+    # Рост капитала ×: полный реинвест по порядку сделок; пик — по самой кривой, как в скриптах
+    equity = np.cumprod(1 + returns)
+    peak = np.maximum.accumulate(equity)
+    return {"equity": equity, "peak": peak, "drawdown": equity / peak - 1}
+
+
+def write_trade_log(trades_df: pd.DataFrame, path: str | Path) -> Path:
+    # Колоночный npz без сжатия: каждая колонка — отдельный .npy, читается по запросу
+    columns: dict[str, np.ndarray] = {"_version": np.array(TRADE_LOG_VERSION)}
+    for name in trades_df.columns:
+        values = trades_df[name]
+        if name in TIME_COLUMNS or pd.api.types.is_datetime64_any_dtype(values):
+            columns[name] = pd.to_datetime(values).to_numpy(dtype="datetime64[ns]")
+        elif pd.api.types.is_numeric_dtype(values):
+            columns[name] = values.to_numpy()
+        else:
+            labels, codes = np.unique(values.to_numpy(dtype=str), return_inverse=True)
+            columns[name + CODES_SUFFIX] = codes.astype(np.min_scalar_type(len(labels)))
+            columns[name + LABELS_SUFFIX] = labels
+    columns |= equity_columns(trade_returns(trades_df))
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as log:
+        np.savez(log, **columns)
+    os.replace(tmp_path, path)
+    return path
+
+
+class TradeLog:
+    # Ленивый доступ: открывается только оглавление zip, колонки читаются при первом обращении
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.archive = np.load(self.path, allow_pickle=False)
+        self.cache: dict[str, np.ndarray] = {}
+        self.columns = [
+            name.removesuffix(CODES_SUFFIX)
+            for name in self.archive.files
+            if not name.startswith("_") and not name.endswith(LABELS_SUFFIX)
+        ]
+
+    def __enter__(self) -> "TradeLog":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.archive.close()
+
+    def __len__(self) -> int:
+        return len(self["equity"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self.cache:
+            if name + CODES_SUFFIX in self.archive.files:
+                labels = self.archive[name + LABELS_SUFFIX]
+                self.cache[name] = labels[self.archive[name + CODES_SUFFIX]]
+            elif name in self.archive.files:
+                self.cache[name] = self.archive[name]
+            else:
+                raise KeyError(f"{self.path.name} has no column {name!r}")
+        return self.cache[name]
+
+    def frame(self, columns: list[str] | None = None) -> pd.DataFrame:
+        return pd.DataFrame({name: self[name] for name in columns or self.columns})
+
+
+def read_trades(path: str | Path, columns: list[str] | None = None) -> pd.DataFrame:
+    # Берём бинарный лог, если он не старше CSV; иначе — CSV только с нужными колонками
+    path = Path(path)
+    log_path = path if path.name.endswith(TRADE_LOG_SUFFIX) else trade_log_path(path)
+    if log_path.exists() and (
+        log_path == path or log_path.stat().st_mtime_ns >= path.stat().st_mtime_ns
+    ):
+        with TradeLog(log_path) as log:
+            return log.frame(columns)
+
+    trades_df = pd.read_csv(
+        path, usecols=lambda name: columns is None or name in columns or name in PNL_COLUMNS
+    )
+    for name in TIME_COLUMNS:
+        if name in trades_df.columns:
+            trades_df[name] = pd.to_datetime(trades_df[name])
+    if columns is None or any(name in EQUITY_COLUMNS for name in columns):
+        trades_df = trades_df.assign(**equity_columns(trade_returns(trades_df)))
+    return trades_df if columns is None else trades_df[columns]
+
+
+def summarize_trade_log(path: str | Path) -> dict:
+    with TradeLog(path) as log:
+        equity, drawdown = log["equity"], log["drawdown"]
+        returns = log[next(name for name in PNL_COLUMNS if name in log.columns)]
+        durations = (log["exit_time"] - log["entry_time"]) / np.timedelta64(1, "h")
+        reasons, counts = np.unique(log["reason"], return_counts=True)
+        return {
+            "log": Path(path).name,
+            "trades": len(equity),
+            "total_return": equity[-1] - 1 if len(equity) else 0.0,
+            "max_drawdown": drawdown.min(initial=0.0),
+            "winrate": (returns > 0).mean() if len(equity) else np.nan,
+            "avg_hours": durations.mean() if len(equity) else np.nan,
+            **{f"share_{reason}": count / len(equity) for reason, count in zip(reasons, counts)},
+        }
+
+
+def summarize_trade_logs(paths: list[str | Path]) -> pd.DataFrame:
+    return pd.DataFrame([summarize_trade_log(path) for path in paths])
+
+
+if __name__ == "__main__":
+    root = Path(sys.argv[1] if len(sys.argv) > 1 else "crypto/processed")
+    paths = sorted(root.rglob(f"*{TRADE_LOG_SUFFIX}"))
+    started = time.perf_counter()
+    summary = summarize_trade_logs(paths)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n=== Trade logs in {root} ===")
+    print(summary.to_string(index=False, float_format="{:.4f}".format))
+    print(f"Summarized {len(paths)} logs in {elapsed * 1000:.1f} ms")
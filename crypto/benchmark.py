@@ -0,0 +1,230 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import UTC, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import sklearn
+import xgboost
+
+from crypto.analyiss.heatmap_tp_sl_hold import simulate_trades
+from crypto.artifacts import PREDICTIONS, read_csv, read_frame, write_frame
+from crypto.data.synthetic import bars_for, synthetic_ohlcv
+from crypto.processed.prepare_data import calculate_indicators
+from crypto.run_crypto import run_backtest
+from crypto.strategies.ensemble_crypto_strategy import train_ensemble_model
+from crypto.strategies.trailhawk_24.run_strategy import run_btc_backtest
+
+# Constants
+BENCHMARK_DIR = "crypto/processed/benchmarks"  # one JSON per run: <UTC time>_<commit>.json
+DATASETS = {
+    "1y": ("1h", 365),
+    "5y": ("1h", 5 * 365),
+    "1y_1m": ("1m", 365),
+}
+STAGES = (
+    "calculate_indicators",
+    "train_ensemble_model",
+    "run_backtest",
+    "run_btc_backtest",
+    "simulate_trades",
+    "load_csv_inferred",
+    "load_csv_typed",
+    "load_binary",
+)
+REPEATS = 3  # best-of / median over this many timed runs
+SLOW_STAGES = {"train_ensemble_model": 1}  # ensemble fit dominates the suite — one run is enough
+PREDICTION_SKILL = 0.1  # how far synthetic probabilities lean towards the real target
+REGRESSION_TOLERANCE = 0.1  # slower than the baseline by more than 10% → flagged
+SYMBOL = "SYNTH"
+
+
+def synthetic_predictions(features_df: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    # Бэктестам нужен *_predictions.csv — слабый «модельный» сигнал без обучения модели
+    rng = np.random.default_rng(seed)
+    noise = rng.random(len(features_df))
+    probs = (1 - PREDICTION_SKILL) * noise + PREDICTION_SKILL * features_df["target"].to_numpy()
+
+    predictions_df = features_df.copy()
+    predictions_df["prediction"] = (probs >= 0.5).astype(int)
+    predictions_df["prediction_prob"] = probs
+    return predictions_df
+
+
+def measure(func: Callable[[], object], repeats: int, trace_memory: bool) -> dict:
+    # Время — без tracemalloc (он замедляет аллокации), пик памяти — отдельным прогоном.
+    # tracemalloc видит Python- и NumPy-буферы, но не нативную память XGBoost/sklearn
+    timings, result = [], None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+
+    peak_mb = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            _ = func()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "repeats": repeats,
+        "seconds_min": min(timings),
+        "seconds_median": statistics.median(timings),
+        "peak_mb": peak_mb,
+        # Загрузчики возвращают DataFrame — сколько он занимает в памяти после загрузки
+        "result_mb": (
+            result.memory_usage(deep=True).sum() / 2**20
+            if isinstance(result, pd.DataFrame)
+            else None
+        ),
+    }
+
+
+def stage_actions(raw_df: pd.DataFrame, predictions_path: str, seed: int) -> dict:
+    features_df = calculate_indicators(raw_df)
+    predictions_df = synthetic_predictions(features_df, seed)
+    write_frame(predictions_df, predictions_path, PREDICTIONS)
+
+    return {
+        "calculate_indicators": lambda: calculate_indicators(raw_df),
+        "train_ensemble_model": lambda: train_ensemble_model(features_df, SYMBOL),
+        "run_backtest": lambda: run_backtest(predictions_path, SYMBOL),
+        "run_btc_backtest": lambda: run_btc_backtest(predictions_path),
+        "simulate_trades": lambda: simulate_trades(predictions_df, 2.0, 1.0, 24),
+        # Загрузка predictions: как раньше (вывод типов, разбор дат строками) → схема → .npz
+        "load_csv_inferred": lambda: pd.read_csv(predictions_path, index_col=0, parse_dates=True),
+        "load_csv_typed": lambda: read_csv(predictions_path, PREDICTIONS),
+        "load_binary": lambda: read_frame(predictions_path, PREDICTIONS),
+    }
+
+
+def benchmark_dataset(
+    name: str,
+    stages: tuple[str, ...] = STAGES,
+    repeats: int = REPEATS,
+    seed: int = 0,
+    trace_memory: bool = True,
+) -> list[dict]:
+    interval, days = DATASETS[name]
+    raw_df = synthetic_ohlcv(bars_for(days, interval), interval, seed)
+
+    # Стадии пишут по относительным путям crypto/processed, crypto/models — уводим их во временную
+    # папку, чтобы бенчмарк не трогал настоящие результаты
+    results = []
+    with tempfile.TemporaryDirectory() as scratch, contextlib.chdir(scratch):
+        Path("crypto/processed").mkdir(parents=True)
+        actions = stage_actions(raw_df, "synthetic_predictions.csv", seed)
+
+        for stage in stages:
+            print(f"[+] {name}: {stage}...")
+            with contextlib.redirect_stdout(io.StringIO()):
+                measurement = measure(
+                    actions[stage], SLOW_STAGES.get(stage, repeats), trace_memory
+                )
+            results.append(
+                {"dataset": name, "interval": interval, "rows": len(raw_df), "stage": stage}
+                | measurement
+            )
+    return results
+
+
+def _git(*args: str) -> str | None:
+    try:
+        done = subprocess.run(["git", *args], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return done.stdout.strip()
+
+
+def run_metadata(seed: int) -> dict:
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "created": datetime.now(UTC).isoformat(timespec="seconds"),
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "seed": seed,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "xgboost": xgboost.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def save_results(report: dict, output_dir: str = BENCHMARK_DIR) -> Path:
+    meta = report["meta"]
+    stamp = meta["created"].replace(":", "").replace("+0000", "Z")
+    path = Path(output_dir) / f"{stamp}_{meta['commit'] or 'nogit'}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _ = path.write_text(json.dumps(report, indent=2))
+    return path
+
+
+def compare_results(baseline: dict, current: dict) -> pd.DataFrame:
+    keys = ["dataset", "stage"]
+    merged = pd.DataFrame(baseline["results"]).merge(
+        pd.DataFrame(current["results"]), on=keys, suffixes=("_base", "_new")
+    )
+    merged["ratio"] = merged["seconds_min_new"] / merged["seconds_min_base"]
+    merged["regression"] = merged["ratio"] > 1 + REGRESSION_TOLERANCE
+    return merged[[*keys, "seconds_min_base", "seconds_min_new", "ratio", "regression"]]
+
+
+def run_benchmarks(
+    datasets: tuple[str, ...] = tuple(DATASETS),
+    stages: tuple[str, ...] = STAGES,
+    repeats: int = REPEATS,
+    seed: int = 0,
+    trace_memory: bool = True,
+) -> dict:
+    results = []
+    for name in datasets:
+        results += benchmark_dataset(name, stages, repeats, seed, trace_memory)
+    return {"meta": run_metadata(seed), "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmarks on synthetic OHLCV data")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=DATASETS)
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc runs")
+    parser.add_argument("--output-dir", default=BENCHMARK_DIR)
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    args = parser.parse_args()
+
+    report = run_benchmarks(
+        tuple(args.datasets), tuple(args.stages), args.repeats, args.seed, not args.no_memory
+    )
+    path = save_results(report, args.output_dir)
+
+    print(f"\n=== Benchmarks — commit {report['meta']['commit']} ===")
+    print(pd.DataFrame(report["results"]).to_string(index=False, float_format="{:.3f}".format))
+    print(f"[✓] Saved results to {path}")
+
+    if args.compare:
+        comparison = compare_results(json.loads(Path(args.compare).read_text()), report)
+        print(f"\n=== Compared with {args.compare} ===")
+        print(comparison.to_string(index=False, float_format="{:.3f}".format))
+        print(f"Regressions: {int(comparison['regression'].sum())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,163 @@
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 
+from crypto.artifacts import KLINES, write_frame
+from crypto.data.kline_store import (
+    STORE_DIR,
+    first_open_time,
+    klines_to_array,
+    last_close_time,
+    load_klines,
+    to_ms,
+    write_klines,
+)
+from crypto.data.rate_limiter import WeightRateLimiter
 
-def get_klines(symbol: str, interval: str, start_date: str, end_date: str) -> pd.DataFrame:
-    base_url = "https://api.binance.com/api/v3/klines"
-    start_ts = int(pd.to_datetime(start_date).timestamp() * 1000)
-    end_ts = int(pd.to_datetime(end_date).timestamp() * 1000)
-    all_data = []
+# Constants
+BINANCE_KLINES_URL = "https://api.binance.com/api/v3/klines"
+PAGE_LIMIT = 1000  # max candles per /api/v3/klines request
+KLINES_WEIGHT = 2  # request weight of one /api/v3/klines call
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.5  # seconds, doubled on every failed attempt
+PAGES_PER_CHUNK = 10  # one concurrent task = up to 10 pages of one symbol
+DOWNLOAD_WORKERS = 8
+
+INTERVAL_MS = {
+    "1m": 60_000,
+    "3m": 3 * 60_000,
+    "5m": 5 * 60_000,
+    "15m": 15 * 60_000,
+    "30m": 30 * 60_000,
+    "1h": 3_600_000,
+    "2h": 2 * 3_600_000,
+    "4h": 4 * 3_600_000,
+    "6h": 6 * 3_600_000,
+    "8h": 8 * 3_600_000,
+    "12h": 12 * 3_600_000,
+    "1d": 86_400_000,
+    "3d": 3 * 86_400_000,
+    "1w": 7 * 86_400_000,
+}
+
+
+@dataclass
+class DownloadStats:
+    symbol: str
+    candles: int = 0
+    requests: int = 0
+    retries: int = 0
+    failed_chunks: int = 0
+    started: float = float("inf")
+    finished: float = 0.0
+    # Чанки одного символа качаются в нескольких потоках — счётчики только под замком
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, requests: int = 0, retries: int = 0) -> None:
+        with self.lock:
+            self.requests += requests
+            self.retries += retries
+
+    def mark(self, now: float) -> None:
+        with self.lock:
+            self.started = min(self.started, now)
+            self.finished = max(self.finished, now)
+
+    @property
+    def seconds(self) -> float:
+        return max(self.finished - self.started, 0.0)
+
+    @property
+    def candles_per_second(self) -> float:
+        return self.candles / self.seconds if self.seconds else 0.0
+
+
+_sessions = threading.local()
+
+
+def _session(pool_size: int = DOWNLOAD_WORKERS) -> requests.Session:
+    # Одна keep-alive сессия на поток вместо нового соединения на каждую страницу
+    session = getattr(_sessions, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _sessions.session = session
+    return session
 
-    print(f"[+] Downloading {symbol} {interval} data from {start_date} to {end_date}...")
+
+def _retry_after(value: str | None, default: float) -> float:
+    # Retry-After — либо секунды, либо HTTP-date (RFC 9110)
+    if value is None:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+def _request_page(
+    params: dict[str, str | int],
+    limiter: WeightRateLimiter,
+    stats: DownloadStats,
+    base_url: str,
+) -> list[list]:
+    for attempt in range(MAX_RETRIES):
+        limiter.acquire(KLINES_WEIGHT)
+        stats.add(requests=1)
+        try:
+            response = _session().get(base_url, params=params, timeout=30)
+        except requests.RequestException:
+            stats.add(retries=1)
+            time.sleep(RETRY_BACKOFF * 2**attempt)
+            continue
+
+        limiter.update(response.headers)
+
+        # 429 — too many requests, 418 — IP banned for ignoring 429s; both carry Retry-After
+        if response.status_code in (418, 429):
+            stats.add(retries=1)
+            backoff = RETRY_BACKOFF * 2**attempt
+            limiter.block_for(_retry_after(response.headers.get("Retry-After"), backoff))
+            continue
+        if response.status_code >= 500:
+            stats.add(retries=1)
+            time.sleep(RETRY_BACKOFF * 2**attempt)
+            continue
+
+        response.raise_for_status()
+        return response.json()
+
+    raise RuntimeError(
+        f"{params['symbol']} page at {params['startTime']} failed after {MAX_RETRIES} attempts"
+    )
+
+
+def fetch_klines(
+    symbol: str,
+    interval: str,
+    start_ts: int,
+    end_ts: int,
+    base_url: str = BINANCE_KLINES_URL,
+    limiter: WeightRateLimiter | None = None,
+    stats: DownloadStats | None = None,
+) -> np.ndarray:
+    limiter = limiter or WeightRateLimiter()
+    stats = stats or DownloadStats(symbol)
+    all_data = []
 
     while start_ts < end_ts:
         params = {
@@ -19,59 +165,209 @@ def get_klines(symbol: str, interval: str, start_date: str, end_date: str) -> pd
             "interval": interval,
             "startTime": start_ts,
             "endTime": end_ts,
-            "limit": 1000,
+            "limit": PAGE_LIMIT,
         }
 
-        response = requests.get(base_url, params=params, timeout=30)
-        data = response.json()
+        data = _request_page(params, limiter, stats, base_url)
 
         if not data:
             break
 
         all_data += data
         start_ts = data[-1][6] + 1
-        time.sleep(0.5)
+
+    return klines_to_array(all_data)
+
+
+def get_klines(
+    symbol: str,
+    interval: str,
+    start_date: str,
+    end_date: str,
+    base_url: str = BINANCE_KLINES_URL,
+) -> pd.DataFrame:
+    print(f"[+] Downloading {symbol} {interval} data from {start_date} to {end_date}...")
+
+    records = fetch_klines(symbol, interval, to_ms(start_date), to_ms(end_date), base_url)
 
     klines_df = pd.DataFrame(
-        all_data,
-        columns=[
-            "open_time",
-            "open",
-            "high",
-            "low",
-            "close",
-            "volume",
-            "close_time",
-            "quote_asset_volume",
-            "number_of_trades",
-            "taker_buy_base_volume",
-            "taker_buy_quote_volume",
-            "ignore",
-        ],
+        {column: records[column] for column in ["open", "high", "low", "close", "volume"]},
+        index=pd.DatetimeIndex(pd.to_datetime(records["open_time"], unit="ms"), name="open_time"),
     )
 
-    klines_df["open_time"] = pd.to_datetime(klines_df["open_time"], unit="ms")
-    klines_df = klines_df.set_index("open_time")
-    klines_df = klines_df[["open", "high", "low", "close", "volume"]].astype(float)
-
     print(f"[✓] Retrieved {len(klines_df)} rows for {symbol} ({interval})")
     return klines_df
 
 
+def _missing_ranges(
+    symbol: str, interval: str, start_ts: int, end_ts: int, store_dir: str
+) -> list[tuple[int, int]]:
+    first_stored = first_open_time(symbol, interval, store_dir)
+    last_stored = last_close_time(symbol, interval, store_dir)
+
+    # Качаем только то, чего нет в хранилище: хвост после last close_time (+ голову, если надо)
+    ranges = [(start_ts, end_ts)]
+    if first_stored is not None and last_stored is not None:
+        ranges = [
+            (start_ts, min(end_ts, first_stored - 1)),
+            (max(start_ts, last_stored + 1), end_ts),
+        ]
+    return [(lo, hi) for lo, hi in ranges if lo < hi]
+
+
+def _closed_only(records: np.ndarray) -> np.ndarray:
+    # The candle that is still open would be frozen in the store with partial OHLCV
+    return records[records["close_time"] < int(time.time() * 1000)]
+
+
+def update_store(
+    symbol: str,
+    interval: str,
+    start_date: str,
+    end_date: str,
+    store_dir: str = STORE_DIR,
+    base_url: str = BINANCE_KLINES_URL,
+) -> int:
+    fetched = 0
+    for range_start, range_end in _missing_ranges(
+        symbol, interval, to_ms(start_date), to_ms(end_date), store_dir
+    ):
+        records = _closed_only(fetch_klines(symbol, interval, range_start, range_end, base_url))
+        write_klines(records, symbol, interval, store_dir)
+        fetched += len(records)
+
+    print(f"[✓] {symbol} ({interval}): {fetched} new candles stored in {store_dir}")
+    return fetched
+
+
+def _split_range(interval: str, start_ts: int, end_ts: int) -> list[tuple[int, int]]:
+    step = INTERVAL_MS.get(interval)
+    if step is None:  # "1M" has no fixed length — fetch it as one chunk
+        return [(start_ts, end_ts)]
+    chunk_ms = step * PAGE_LIMIT * PAGES_PER_CHUNK
+    return [
+        (chunk_start, min(chunk_start + chunk_ms - 1, end_ts))
+        for chunk_start in range(start_ts, end_ts, chunk_ms)
+    ]
+
+
+def update_store_concurrent(
+    symbols: list[str],
+    interval: str,
+    start_date: str,
+    end_date: str,
+    workers: int = DOWNLOAD_WORKERS,
+    store_dir: str = STORE_DIR,
+    base_url: str = BINANCE_KLINES_URL,
+) -> dict[str, DownloadStats]:
+    limiter = WeightRateLimiter()
+    stats = {symbol: DownloadStats(symbol) for symbol in symbols}
+
+    def fetch_chunk(symbol: str, chunk_start: int, chunk_end: int) -> np.ndarray:
+        stats[symbol].mark(time.perf_counter())
+        records = fetch_klines(
+            symbol, interval, chunk_start, chunk_end, base_url, limiter, stats[symbol]
+        )
+        stats[symbol].mark(time.perf_counter())
+        return records
+
+    # Символы и куски одного символа качаются параллельно; в хранилище пишет только главный поток
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        ranges: list[tuple[str, bool, list[Future]]] = []
+        for symbol in symbols:
+            first_stored = first_open_time(symbol, interval, store_dir)
+            for range_start, range_end in _missing_ranges(
+                symbol, interval, to_ms(start_date), to_ms(end_date), store_dir
+            ):
+                chunks = [
+                    pool.submit(fetch_chunk, symbol, chunk_start, chunk_end)
+                    for chunk_start, chunk_end in _split_range(interval, range_start, range_end)
+                ]
+                # Голова перед уже сохранённой историей пишется только целиком: частичная
+                # оставила бы дыру, которую _missing_ranges по границам хранилища не увидит
+                whole = first_stored is not None and range_end < first_stored
+                ranges.append((symbol, whole, chunks))
+
+        # Остальное — строго по времени: упавший кусок обрывает диапазон, и хвост хранилища
+        # остаётся непрерывным — следующий запуск докачает с last close_time
+        written = [0] * len(ranges)
+        futures = {chunk: k for k, (_, _, chunks) in enumerate(ranges) for chunk in chunks}
+        for future in as_completed(futures):
+            k = futures[future]
+            symbol, whole, chunks = ranges[k]
+            if future.cancelled():
+                continue
+            if future.exception() is not None:
+                stats[symbol].failed_chunks += 1
+                for chunk in chunks:
+                    _ = chunk.cancel()
+                continue
+
+            ready = written[k]
+            while ready < len(chunks) and chunks[ready].done() and not chunks[ready].cancelled():
+                if chunks[ready].exception() is not None:
+                    break
+                ready += 1
+            if whole and ready < len(chunks):
+                continue
+            for chunk in chunks[written[k] : ready]:
+                records = _closed_only(chunk.result())
+                write_klines(records, symbol, interval, store_dir)
+                stats[symbol].candles += len(records)
+            written[k] = ready
+
+    for symbol_stats in stats.values():
+        print(
+            f"[✓] {symbol_stats.symbol} ({interval}): {symbol_stats.candles} candles, "
+            f"{symbol_stats.requests} requests, {symbol_stats.retries} retries, "
+            f"{symbol_stats.seconds:.1f}s ({symbol_stats.candles_per_second:.0f} candles/s)"
+        )
+
+    failed = [symbol for symbol, symbol_stats in stats.items() if symbol_stats.failed_chunks]
+    if failed:
+        errors = [
+            chunk.exception()
+            for _, _, chunks in ranges
+            for chunk in chunks
+            if chunk.done() and not chunk.cancelled() and chunk.exception() is not None
+        ]
+        raise RuntimeError(
+            f"Download incomplete for {', '.join(failed)}: {errors[0]}. "
+            "The store keeps only the contiguous part; rerun to resume"
+        )
+    return stats
+
+
 def save_to_csv(
     klines_df: pd.DataFrame, symbol: str, interval: str, start_date: str, end_date: str
 ) -> None:
     Path("crypto/data").mkdir(parents=True, exist_ok=True)
     filename = f"{symbol}_{interval}_{start_date}_{end_date}.csv"
     path = f"crypto/data/{filename}"
-    klines_df.to_csv(path)
+    # CSV — экспорт; рядом типизированный .npz, который читают следующие стадии
+    write_frame(klines_df, path, KLINES)
     print(f"[✓] Saved to {path}")
 
 
-def download_symbols(symbols: list[str], interval: str, start_date: str, end_date: str) -> None:
+def download_symbols(
+    symbols: list[str], interval: str, start_date: str, end_date: str, workers: int = 1
+) -> None:
+    if workers > 1:
+        _ = update_store_concurrent(symbols, interval, start_date, end_date, workers)
+
     for symbol in symbols:
-        klines_df = get_klines(symbol, interval, start_date, end_date)
-        save_to_csv(klines_df, symbol, interval, start_date, end_date)
+        if workers == 1:
+            _ = update_store(symbol, interval, start_date, end_date)
+
+        # CSV — только экспорт из хранилища для prepare_data
+        klines_df = load_klines(symbol, interval, start_date, end_date)
+        save_to_csv(
+            klines_df[["open", "high", "low", "close", "volume"]],
+            symbol,
+            interval,
+            start_date,
+            end_date,
+        )
 
 
 if __name__ == "__main__":
@@ -80,4 +376,5 @@ if __name__ == "__main__":
         interval="1h",
         start_date="2020-05-01",
         end_date="2025-05-01",
+        workers=DOWNLOAD_WORKERS,
     )
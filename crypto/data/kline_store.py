@@ -0,0 +1,138 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Constants
+STORE_DIR = "crypto/data/store"  # <store>/<symbol>/<interval>/<YYYY-MM>.npy
+
+# Полный payload свечи Binance (все 12 полей /api/v3/klines)
+KLINE_DTYPE = np.dtype(
+    [
+        ("open_time", "i8"),
+        ("open", "f8"),
+        ("high", "f8"),
+        ("low", "f8"),
+        ("close", "f8"),
+        ("volume", "f8"),
+        ("close_time", "i8"),
+        ("quote_asset_volume", "f8"),
+        ("number_of_trades", "i8"),
+        ("taker_buy_base_volume", "f8"),
+        ("taker_buy_quote_volume", "f8"),
+        ("ignore", "f8"),
+    ]
+)
+KLINE_COLUMNS = list(KLINE_DTYPE.names or ())
+
+
+def to_ms(timestamp: str | pd.Timestamp) -> int:
+    return int(pd.to_datetime(timestamp).timestamp() * 1000)
+
+
+def klines_to_array(rows: list[list]) -> np.ndarray:
+    records = np.empty(len(rows), dtype=KLINE_DTYPE)
+    if rows:
+        for name, values in zip(KLINE_COLUMNS, zip(*rows, strict=True), strict=True):
+            records[name] = np.asarray(values, dtype=KLINE_DTYPE[name])
+    return records
+
+
+def _series_dir(symbol: str, interval: str, store_dir: str) -> Path:
+    return Path(store_dir) / symbol / interval
+
+
+def _months(open_time: np.ndarray) -> np.ndarray:
+    return open_time.astype("datetime64[ms]").astype("datetime64[M]")
+
+
+def partitions(symbol: str, interval: str, store_dir: str = STORE_DIR) -> list[Path]:
+    # Имена YYYY-MM сортируются лексикографически в хронологическом порядке
+    return sorted(_series_dir(symbol, interval, store_dir).glob("????-??.npy"))
+
+
+def write_klines(
+    records: np.ndarray, symbol: str, interval: str, store_dir: str = STORE_DIR
+) -> None:
+    series_dir = _series_dir(symbol, interval, store_dir)
+    series_dir.mkdir(parents=True, exist_ok=True)
+    months = _months(records["open_time"])
+
+    for month in np.unique(months):
+        path = series_dir / f"{month}.npy"
+        chunk = records[months == month]
+        if path.exists():
+            chunk = np.concatenate([np.load(path), chunk])
+
+        # Sort by open_time; on duplicates the freshly downloaded candle wins
+        _, keep = np.unique(chunk["open_time"][::-1], return_index=True)
+        chunk = chunk[::-1][keep]
+
+        # Atomic swap so a crashed download never leaves a half-written partition
+        tmp_path = path.with_name(f"{month}.tmp.npy")
+        np.save(tmp_path, chunk)
+        os.replace(tmp_path, path)
+
+
+def first_open_time(symbol: str, interval: str, store_dir: str = STORE_DIR) -> int | None:
+    stored = partitions(symbol, interval, store_dir)
+    if not stored:
+        return None
+    return int(np.load(stored[0], mmap_mode="r")["open_time"][0])
+
+
+def last_close_time(symbol: str, interval: str, store_dir: str = STORE_DIR) -> int | None:
+    stored = partitions(symbol, interval, store_dir)
+    if not stored:
+        return None
+    return int(np.load(stored[-1], mmap_mode="r")["close_time"][-1])
+
+
+def read_klines(
+    symbol: str,
+    interval: str,
+    start: str | pd.Timestamp | None = None,
+    end: str | pd.Timestamp | None = None,
+    store_dir: str = STORE_DIR,
+) -> np.ndarray:
+    # Slice is start <= open_time <= end, the same as Binance startTime/endTime
+    start_ms = to_ms(start) if start is not None else None
+    end_ms = to_ms(end) if end is not None else None
+    first_month = _months(np.int64(start_ms)) if start_ms is not None else None
+    last_month = _months(np.int64(end_ms)) if end_ms is not None else None
+
+    chunks = []
+    for path in partitions(symbol, interval, store_dir):
+        month = np.datetime64(path.stem, "M")
+        if (first_month is not None and month < first_month) or (
+            last_month is not None and month > last_month
+        ):
+            continue
+
+        # Только нужный кусок месяца копируется из mmap
+        partition = np.load(path, mmap_mode="r")
+        open_time = partition["open_time"]
+        lo = np.searchsorted(open_time, start_ms, side="left") if start_ms is not None else 0
+        hi = np.searchsorted(open_time, end_ms, side="right") if end_ms is not None else None
+        chunks.append(np.array(partition[lo:hi]))
+
+    if not chunks:
+        return np.empty(0, dtype=KLINE_DTYPE)
+    return np.concatenate(chunks)
+
+
+def load_klines(
+    symbol: str,
+    interval: str,
+    start: str | pd.Timestamp | None = None,
+    end: str | pd.Timestamp | None = None,
+    store_dir: str = STORE_DIR,
+) -> pd.DataFrame:
+    records = read_klines(symbol, interval, start, end, store_dir)
+    klines_df = pd.DataFrame({name: records[name] for name in KLINE_COLUMNS[1:]})
+    klines_df.index = pd.DatetimeIndex(
+        pd.to_datetime(records["open_time"], unit="ms"), name="open_time"
+    )
+    klines_df["close_time"] = pd.to_datetime(klines_df["close_time"], unit="ms")
+    return klines_df
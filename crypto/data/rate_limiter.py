@@ -0,0 +1,54 @@
+import threading
+import time
+from collections.abc import Mapping
+
+# Constants
+WEIGHT_LIMIT_1M = 6000  # Binance REST request-weight budget per minute
+WEIGHT_SAFETY = 0.8  # leave 20% of the budget for anything else on this IP
+WEIGHT_HEADERS = ("X-MBX-USED-WEIGHT-1M", "X-MBX-USED-WEIGHT")
+
+
+class WeightRateLimiter:
+    # Общий лимитер для всех потоков: считает вес за текущую минуту и
+    # синхронизируется с тем, что сообщает биржа в заголовках ответа
+
+    def __init__(self, weight_limit: int = WEIGHT_LIMIT_1M, safety: float = WEIGHT_SAFETY) -> None:
+        self.budget = int(weight_limit * safety)
+        self._lock = threading.Lock()
+        self._minute = self._current_minute()
+        self._used = 0
+        self._blocked_until = 0.0
+
+    @staticmethod
+    def _current_minute() -> int:
+        # Binance resets the weight counter on wall-clock minute boundaries
+        return int(time.time() // 60)
+
+    def acquire(self, weight: int) -> None:
+        while True:
+            with self._lock:
+                now = time.time()
+                minute = self._current_minute()
+                if minute != self._minute:
+                    self._minute, self._used = minute, 0
+
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._used + weight > self.budget:
+                    wait = (minute + 1) * 60 - now
+                else:
+                    self._used += weight
+                    return
+            time.sleep(wait)
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        for header in WEIGHT_HEADERS:
+            if header in headers:
+                with self._lock:
+                    # The exchange's count also includes requests still in flight elsewhere
+                    self._used = max(self._used, int(headers[header]))
+                return
+
+    def block_for(self, seconds: float) -> None:
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.time() + seconds)
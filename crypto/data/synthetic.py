@@ -0,0 +1,88 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from crypto.data.get_binance_data import INTERVAL_MS
+
+# Constants
+YEAR_MS = 365 * 86_400_000
+START_PRICE = 30_000.0
+START_TIME = "2020-05-01"
+REGIME_DURATION_DAYS = 30.0  # mean time spent in one regime before switching
+BASE_VOLUME = 500.0  # mean volume per hour of a calm market, scaled to the interval
+
+
+@dataclass(frozen=True)
+class Regime:
+    name: str
+    drift: float  # annualized log-drift
+    volatility: float  # annualized volatility
+
+
+REGIMES = (
+    Regime("calm", drift=0.05, volatility=0.35),
+    Regime("bull", drift=0.9, volatility=0.55),
+    Regime("bear", drift=-0.8, volatility=0.9),
+)
+
+
+def regime_path(
+    n_bars: int, interval: str, rng: np.random.Generator, regimes: tuple[Regime, ...] = REGIMES
+) -> np.ndarray:
+    # Марковская цепь: длина режима геометрическая, следующий режим — любой другой
+    switch_prob = INTERVAL_MS[interval] / (REGIME_DURATION_DAYS * 86_400_000)
+    switches = np.flatnonzero(rng.random(n_bars) < switch_prob)
+    steps = rng.integers(1, len(regimes), size=len(switches))
+
+    labels = np.zeros(n_bars, dtype=np.int64)
+    np.add.at(labels, switches, steps)
+    return np.cumsum(labels) % len(regimes)
+
+
+def synthetic_ohlcv(
+    n_bars: int,
+    interval: str = "1h",
+    seed: int = 0,
+    start: str = START_TIME,
+    start_price: float = START_PRICE,
+    regimes: tuple[Regime, ...] = REGIMES,
+) -> pd.DataFrame:
+    # GBM с переключением режимов волатильности; тот же формат, что save_to_csv
+    rng = np.random.default_rng(seed)
+    dt = INTERVAL_MS[interval] / YEAR_MS
+    labels = regime_path(n_bars, interval, rng, regimes)
+    drift = np.array([regime.drift for regime in regimes])[labels]
+    sigma = np.array([regime.volatility for regime in regimes])[labels] * np.sqrt(dt)
+
+    shocks = rng.standard_normal(n_bars)
+    log_close = np.log(start_price) + np.cumsum(drift * dt - sigma**2 / 2 + sigma * shocks)
+    close = np.exp(log_close)
+    open_ = np.r_[start_price, close[:-1]]
+
+    # Хвосты свечи за пределами тела — полунормальные, в масштабе текущей волатильности
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.standard_normal(n_bars)) * sigma / 2)
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.standard_normal(n_bars)) * sigma / 2)
+
+    # Объём растёт вместе с размером движения — как на реальном рынке
+    bar_volume = BASE_VOLUME * INTERVAL_MS[interval] / INTERVAL_MS["1h"]
+    volume = bar_volume * (1 + np.abs(shocks)) * rng.lognormal(0.0, 0.5, n_bars)
+
+    index = pd.date_range(
+        start,
+        periods=n_bars,
+        freq=pd.Timedelta(milliseconds=INTERVAL_MS[interval]),
+        name="open_time",
+    )
+    return pd.DataFrame(
+        {"open": open_, "high": high, "low": low, "close": close, "volume": volume}, index=index
+    )
+
+
+def bars_for(days: float, interval: str) -> int:
+    return int(days * 86_400_000 // INTERVAL_MS[interval])
+
+
+if __name__ == "__main__":
+    klines_df = synthetic_ohlcv(bars_for(365, "1h"))
+    print(klines_df.describe().to_string(float_format="{:.2f}".format))
@@ -0,0 +1,300 @@
+import cProfile
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+
+import numpy as np
+
+# Constants
+METRICS_FILE = "crypto/processed/metrics.jsonl"  # one JSON record per line, appended per run
+METRICS_ENV = "CRYPTO_METRICS"  # overrides the metrics path; "off" disables recording
+PROFILE_ENV = "CRYPTO_PROFILE"  # opt-in profiler: "cprofile" or "sample"
+PROFILE_DIR = "crypto/processed/profiles"  # cProfile dumps, open with `python -m pstats`
+MEMORY_SAMPLE_INTERVAL = 0.01  # seconds between RSS samples
+STACK_SAMPLE_INTERVAL = 0.005  # seconds between stack samples of the sampling profiler
+PROFILE_TOP = 25  # functions kept in the profile record
+
+
+def rss_bytes() -> int:
+    # Linux: текущий RSS из /proc; macOS: только пик процесса (ru_maxrss там в байтах)
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class MemorySampler(threading.Thread):
+    # Фоновый поток: пик RSS отдельно для каждой открытой стадии
+    def __init__(self, interval: float = MEMORY_SAMPLE_INTERVAL) -> None:
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peaks: dict[int, int] = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.slots = 0
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            _ = self.sample()
+
+    def sample(self) -> int:
+        rss = rss_bytes()
+        with self.lock:
+            for slot, peak in self.peaks.items():
+                self.peaks[slot] = max(peak, rss)
+        return rss
+
+    def open(self) -> int:
+        with self.lock:
+            self.slots += 1
+            self.peaks[self.slots] = 0
+        _ = self.sample()
+        return self.slots
+
+    def close(self, slot: int) -> int:
+        _ = self.sample()
+        with self.lock:
+            return self.peaks.pop(slot)
+
+
+class StackSampler(threading.Thread):
+    # Сэмплирующий профайлер: раз в interval снимаем стек потока, который ведёт прогон
+    def __init__(self, thread_id: int, interval: float = STACK_SAMPLE_INTERVAL) -> None:
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.samples = 0
+        self.inclusive: Counter[str] = Counter()
+        self.exclusive: Counter[str] = Counter()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.exclusive[_frame_key(frame)] += 1
+            seen = set()
+            while frame is not None:
+                key = _frame_key(frame)
+                if key not in seen:  # рекурсия не считается дважды
+                    seen.add(key)
+                    self.inclusive[key] += 1
+                frame = frame.f_back
+
+    def top(self, limit: int = PROFILE_TOP) -> list[dict]:
+        return [
+            {
+                "function": key,
+                "inclusive_share": count / max(self.samples, 1),
+                "self_share": self.exclusive[key] / max(self.samples, 1),
+            }
+            for key, count in self.inclusive.most_common(limit)
+        ]
+
+
+def _frame_key(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"
+
+
+@dataclass
+class Run:
+    name: str
+    tags: dict
+    sampler: MemorySampler
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    counters: Counter[str] = field(default_factory=Counter)
+    records: list[dict] = field(default_factory=list)
+    stages: list[str] = field(default_factory=list)  # open stage names → "fit/predict" paths
+
+    def emit(self, kind: str, name: str, **fields) -> None:
+        self.records.append(
+            {
+                "time": datetime.now(UTC).isoformat(timespec="milliseconds"),
+                "run_id": self.run_id,
+                "run": self.name,
+                "kind": kind,
+                "name": name,
+                **self.tags,
+                **fields,
+            }
+        )
+
+
+_active_run: ContextVar[Run | None] = ContextVar("instrumentation_run", default=None)
+
+
+def metrics_path() -> Path | None:
+    path = os.environ.get(METRICS_ENV, METRICS_FILE)
+    return None if path.lower() in ("", "0", "off") else Path(path)
+
+
+def write_records(records: list[dict], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Один write на прогон: параллельные процессы пайплайна не перемешивают строки
+    with path.open("a") as metrics:
+        _ = metrics.write("".join(json.dumps(record, default=float) + "\n" for record in records))
+
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    run = _active_run.get()
+    if run is None:
+        yield
+        return
+
+    run.stages.append(name)
+    stage = "/".join(run.stages)
+    slot = run.sampler.open()
+    rss_start = rss_bytes()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        peak = run.sampler.close(slot)
+        _ = run.stages.pop()
+        run.emit(
+            "stage",
+            stage,
+            seconds=seconds,
+            rss_start_mb=rss_start / 2**20,
+            rss_peak_mb=peak / 2**20,
+        )
+
+
+def count(name: str, value: int = 1) -> None:
+    run = _active_run.get()
+    if run is not None:
+        run.counters[name] += int(value)
+
+
+def count_values(prefix: str, values: np.ndarray) -> None:
+    run = _active_run.get()
+    if run is None:
+        return
+    labels, counts = np.unique(values, return_counts=True)
+    for label, value in zip(labels.tolist(), counts.tolist()):
+        run.counters[f"{prefix}:{label}"] += value
+
+
+def count_filter(prefix: str, conditions: dict[str, np.ndarray]) -> None:
+    # conditions: правило отказа → маска прошедших. Считаем и независимые отказы, и
+    # «отсечено первым» в порядке проверки — по второму видно, какое условие ставить раньше
+    run = _active_run.get()
+    if run is None or not conditions:
+        return
+    passed = np.ones(len(next(iter(conditions.values()))), dtype=bool)
+    run.counters[f"{prefix}.candles"] += len(passed)
+    for rule, keep in conditions.items():
+        run.counters[f"{prefix}.rejected:{rule}"] += len(keep) - int(np.count_nonzero(keep))
+        run.counters[f"{prefix}.rejected_first:{rule}"] += int(np.count_nonzero(passed & ~keep))
+        passed &= keep
+    run.counters[f"{prefix}.passed"] += int(np.count_nonzero(passed))
+
+
+def _profile_records(run: Run, profiler: cProfile.Profile) -> None:
+    Path(PROFILE_DIR).mkdir(parents=True, exist_ok=True)
+    dump_path = Path(PROFILE_DIR) / f"{run.name}_{run.run_id}.prof"
+    profiler.dump_stats(dump_path)
+
+    stats = pstats.Stats(profiler).stats  # (file, line, func) → (cc, ncalls, tottime, cumtime, …)
+    ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP]
+    top = [
+        {"function": f"{file}:{line}({func})", "calls": calls, "self": tottime, "cumulative": cum}
+        for (file, line, func), (_, calls, tottime, cum, _) in ranked
+    ]
+    run.emit("profile", "cprofile", dump=str(dump_path), top=top)
+
+
+@contextmanager
+def instrumented_run(name: str, **tags) -> Iterator[None]:
+    # Вложенный вызов (например, бэктест внутри другого прогона) — просто стадия внешнего
+    if _active_run.get() is not None:
+        with timer(name):
+            yield
+        return
+
+    path = metrics_path()
+    if path is None:
+        yield
+        return
+
+    run = Run(name=name, tags=tags, sampler=MemorySampler())
+    token = _active_run.set(run)
+    run.sampler.start()
+    profiler_kind = os.environ.get(PROFILE_ENV, "").lower()
+    profiler = cProfile.Profile() if profiler_kind == "cprofile" else None
+    stack_sampler = StackSampler(threading.get_ident()) if profiler_kind == "sample" else None
+
+    status = "ok"
+    if profiler is not None:
+        profiler.enable()
+    if stack_sampler is not None:
+        stack_sampler.start()
+    try:
+        with timer(name):
+            yield
+    except BaseException:
+        status = "failed"
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _profile_records(run, profiler)
+        if stack_sampler is not None:
+            stack_sampler.stopped.set()
+            stack_sampler.join()
+            run.emit("profile", "sample", samples=stack_sampler.samples, top=stack_sampler.top())
+        run.sampler.stopped.set()
+        run.sampler.join()
+        _active_run.reset(token)
+
+        run.emit("counters", name, counters=dict(sorted(run.counters.items())))
+        run.emit("run", name, status=status, process_peak_mb=process_peak() / 2**20)
+        write_records(run.records, path)
+
+
+def process_peak() -> int:
+    # ru_maxrss: килобайты на Linux, байты на macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def load_metrics(path: str = METRICS_FILE) -> list[dict]:
+    with open(path) as metrics:
+        return [json.loads(line) for line in metrics if line.strip()]
+
+
+if __name__ == "__main__":
+    # Сводка последнего прогона каждого вида: стадии и счётчики
+    records = load_metrics(sys.argv[1] if len(sys.argv) > 1 else METRICS_FILE)
+    last_runs = {record["run"]: record["run_id"] for record in records if record["kind"] == "run"}
+    for run_name, run_id in last_runs.items():
+        print(f"\n=== {run_name} ({run_id}) ===")
+        for record in records:
+            if record["run_id"] != run_id:
+                continue
+            if record["kind"] == "stage":
+                print(
+                    f"{record['name']:<40} {record['seconds']:>9.3f}s "
+                    f"peak RSS {record['rss_peak_mb']:>8.1f} MB"
+                )
+            elif record["kind"] == "counters":
+                for counter, value in record["counters"].items():
+                    print(f"  {counter:<60} {value:>12,}")
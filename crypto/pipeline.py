@@ -0,0 +1,370 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import time
+import traceback
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from functools import cache, partial
+from pathlib import Path
+
+import pandas as pd
+
+from crypto.analyiss.analyze_strategy_stats import analyze_strategy_stats
+from crypto.artifacts import binary_path
+from crypto.backtest.robustness import run_robustness
+from crypto.backtest.trade_log import trade_log_path
+from crypto.data.get_binance_data import DOWNLOAD_WORKERS, download_symbols
+from crypto.processed.feature_cache import FEATURE_CACHE_DIR, entry_dir_for, read_features
+from crypto.processed.prepare_data import process_crypto_file
+from crypto.run_crypto import run_backtest
+from crypto.strategies.ensemble_crypto_strategy import thread_budget, train_ensemble_model
+from crypto.strategies.model_store import LATEST_FILE, MODEL_DIR
+from crypto.strategies.trailhawk_24.run_strategy import run_btc_backtest
+from crypto.strategies.walk_forward import run_walk_forward
+
+# Constants
+PIPELINE_STATE = "crypto/processed/pipeline_state.json"  # stage name → fingerprint of its inputs
+PROCESSED_DIR = "crypto/processed"
+HASH_BLOCK = 1 << 20
+SYMBOLS = ["BTCUSDT", "ETHUSDT"]
+INTERVAL = "1h"
+START_DATE = "2020-05-01"
+END_DATE = "2025-05-01"
+TRAILHAWK_SYMBOL = "BTCUSDT"  # run_strategy is tuned for BTC only
+PROJECT_PACKAGE = "crypto"  # only our own modules are fingerprinted, not site-packages
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    action: Callable[[], object]
+    inputs: tuple[str, ...] = ()
+    outputs: tuple[str, ...] = ()
+    deps: tuple[str, ...] = ()
+    always_run: bool = False  # источник данных — сам решает, что докачать
+
+
+def _path_digest(path: Path) -> bytes:
+    digest = hashlib.sha256(str(path).encode())
+    if path.is_dir():
+        for child in sorted(path.rglob("*")):
+            if child.is_file():
+                digest.update(_path_digest(child))
+    elif path.is_file():
+        with path.open("rb") as source:
+            while block := source.read(HASH_BLOCK):
+                digest.update(block)
+    else:
+        digest.update(b"<missing>")
+    return digest.digest()
+
+
+def input_fingerprint(stage: Stage) -> str:
+    # Хэш содержимого, а не mtime: переписанный без изменений CSV не будит стадии ниже
+    digest = hashlib.sha256()
+    for path in stage.inputs:
+        digest.update(_path_digest(Path(path)))
+    return digest.hexdigest()
+
+
+def is_fresh(stage: Stage, fingerprint: str, state: dict[str, str]) -> bool:
+    if stage.always_run or state.get(stage.name) != fingerprint:
+        return False
+    return all(Path(path).exists() for path in stage.outputs)
+
+
+def load_state(state_path: str = PIPELINE_STATE) -> dict[str, str]:
+    path = Path(state_path)
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def save_state(state: dict[str, str], state_path: str = PIPELINE_STATE) -> None:
+    path = Path(state_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(state, indent=2, sort_keys=True))
+    os.replace(tmp_path, path)
+
+
+def _check_dag(stages: list[Stage]) -> None:
+    names = {stage.name for stage in stages}
+    if len(names) != len(stages):
+        raise ValueError("Duplicate stage names in pipeline")
+    for stage in stages:
+        unknown = set(stage.deps) - names
+        if unknown:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages: {sorted(unknown)}")
+
+    # Kahn: если кого-то не удалось упорядочить — в графе цикл
+    remaining = {stage.name: set(stage.deps) for stage in stages}
+    while ready := [name for name, deps in remaining.items() if not deps]:
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    if remaining:
+        raise ValueError(f"Dependency cycle between stages: {sorted(remaining)}")
+
+
+def _run_action(action: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    try:
+        _ = action()
+    except Exception as error:
+        # Трейсбек печатаем в воркере — через границу процесса он доходит обрезанным
+        traceback.print_exc()
+        raise RuntimeError(f"{type(error).__name__}: {error}") from None
+    return time.perf_counter() - started
+
+
+def run_pipeline(
+    stages: list[Stage],
+    workers: int | None = None,
+    force: bool = False,
+    state_path: str = PIPELINE_STATE,
+) -> pd.DataFrame:
+    _check_dag(stages)
+    state = load_state(state_path)
+    pending = {stage.name: stage for stage in stages}
+    done: set[str] = set()
+    failed: set[str] = set()
+    report: list[dict] = []
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        running: dict[Future, tuple[Stage, str]] = {}
+
+        while pending or running:
+            # Пропуск свежей стадии сразу открывает её потомков — повторяем, пока есть сдвиги
+            progressed = True
+            while progressed:
+                progressed = False
+                for name, stage in list(pending.items()):
+                    if any(dep in failed for dep in stage.deps):
+                        del pending[name]
+                        failed.add(name)
+                        report.append({"stage": name, "status": "blocked", "seconds": 0.0})
+                        progressed = True
+                    elif all(dep in done for dep in stage.deps):
+                        del pending[name]
+                        fingerprint = input_fingerprint(stage)
+                        if not force and is_fresh(stage, fingerprint, state):
+                            done.add(name)
+                            report.append({"stage": name, "status": "fresh", "seconds": 0.0})
+                            progressed = True
+                        else:
+                            print(f"[+] Stage {name} started")
+                            running[pool.submit(_run_action, stage.action)] = (stage, fingerprint)
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, fingerprint = running.pop(future)
+                try:
+                    seconds = future.result()
+                except Exception as error:
+                    failed.add(stage.name)
+                    _ = state.pop(stage.name, None)
+                    report.append({"stage": stage.name, "status": "failed", "seconds": 0.0})
+                    print(f"[!] Stage {stage.name} failed: {error}")
+                    continue
+
+                done.add(stage.name)
+                state[stage.name] = fingerprint
+                report.append({"stage": stage.name, "status": "ran", "seconds": seconds})
+                print(f"[✓] Stage {stage.name} finished in {seconds:.1f}s")
+            # Состояние пишем после каждой стадии — упавший прогон не теряет уже сделанное
+            save_state(state, state_path)
+
+    return pd.DataFrame(report, columns=["stage", "status", "seconds"])
+
+
+def _module_path(module: str) -> Path | None:
+    if module.split(".")[0] != PROJECT_PACKAGE:
+        return None
+    base = Path(*module.split("."))
+    for path in (base.with_suffix(".py"), base / "__init__.py"):
+        if path.is_file():
+            return path
+    return None  # "from crypto.x import some_function" — не модуль
+
+
+@cache
+def _module_files(module: str) -> tuple[str, ...]:
+    # Сам модуль и всё, что он транзитивно импортирует из проекта, включая импорты внутри
+    # функций: правка движка выходов или схемы артефактов будит стадии, которые на них стоят
+    found: set[str] = set()
+    todo = [module]
+    while todo:
+        path = _module_path(todo.pop())
+        if path is None or str(path) in found:
+            continue
+        found.add(str(path))
+        for node in ast.walk(ast.parse(path.read_text(), str(path))):
+            if isinstance(node, ast.Import):
+                todo += [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+                # from crypto.processed import prepare_data — импорт модуля, а не имени
+                todo += [node.module, *(f"{node.module}.{alias.name}" for alias in node.names)]
+    return tuple(sorted(found))
+
+
+def _train(
+    entry_dir: Path, symbol: str, interval: str, walk_forward: bool, cpus: int | None
+) -> None:
+    features_df = read_features(entry_dir)
+    if walk_forward:
+        run_walk_forward(features_df, symbol, workers=1, cpus=cpus)
+    else:
+        train_ensemble_model(features_df, symbol, n_jobs=cpus or -1, interval=interval)
+
+
+def build_stages(
+    symbols: list[str] = SYMBOLS,
+    interval: str = INTERVAL,
+    start_date: str = START_DATE,
+    end_date: str = END_DATE,
+    download: bool = True,
+    walk_forward: bool = False,
+    train_cpus: int | None = None,  # ядер на одно обучение; None — все
+) -> list[Stage]:
+    stages = []
+    if download:
+        stages.append(
+            Stage(
+                name="download",
+                action=partial(
+                    download_symbols, symbols, interval, start_date, end_date, DOWNLOAD_WORKERS
+                ),
+                outputs=tuple(
+                    f"crypto/data/{symbol}_{interval}_{start_date}_{end_date}.csv"
+                    for symbol in symbols
+                ),
+                always_run=True,
+            )
+        )
+    upstream = ("download",) if download else ()
+
+    # Ветки по символам не зависят друг от друга — раннер гоняет их параллельно
+    for symbol in symbols:
+        source = Path(f"crypto/data/{symbol}_{interval}_{start_date}_{end_date}.csv")
+        entry_dir = entry_dir_for(source, FEATURE_CACHE_DIR)
+        predictions = f"{PROCESSED_DIR}/{symbol}_predictions.csv"
+        predictions_binary = str(binary_path(predictions))  # то, что реально читают бэктесты
+        results = f"{PROCESSED_DIR}/{symbol}_backtest_results.csv"
+        trainer = "walk_forward" if walk_forward else "ensemble_crypto_strategy"
+        # walk-forward не сохраняет артефакт модели — его след на диске только отчёт по фолдам
+        trained = (
+            f"{PROCESSED_DIR}/{symbol}_walk_forward_folds.csv"
+            if walk_forward
+            else f"{MODEL_DIR}/{symbol}/{LATEST_FILE}"
+        )
+
+        stages += [
+            Stage(
+                name=f"features:{symbol}",
+                action=partial(process_crypto_file, source, PROCESSED_DIR),
+                inputs=(str(source), *_module_files("crypto.processed.prepare_data")),
+                outputs=(str(entry_dir / "meta.json"),),
+                deps=upstream,
+            ),
+            Stage(
+                name=f"train:{symbol}",
+                action=partial(_train, entry_dir, symbol, interval, walk_forward, train_cpus),
+                # meta.json несёт хэш исходника и конфига индикаторов — им и меряем свежесть
+                inputs=(
+                    str(entry_dir / "meta.json"),
+                    *_module_files(f"crypto.strategies.{trainer}"),
+                    *_module_files("crypto.processed.feature_cache"),
+                ),
+                outputs=(predictions, predictions_binary, trained),
+                deps=(f"features:{symbol}",),
+            ),
+            Stage(
+                name=f"backtest:{symbol}",
+                action=partial(run_backtest, predictions, symbol),
+                inputs=(predictions, predictions_binary, *_module_files("crypto.run_crypto")),
+                outputs=(results, str(trade_log_path(results))),
+                deps=(f"train:{symbol}",),
+            ),
+            Stage(
+                name=f"stats:{symbol}",
+                action=partial(analyze_strategy_stats, results),
+                inputs=(
+                    results,
+                    str(trade_log_path(results)),
+                    *_module_files("crypto.analyiss.analyze_strategy_stats"),
+                ),
+                deps=(f"backtest:{symbol}",),
+            ),
+        ]
+
+        if symbol == TRAILHAWK_SYMBOL:
+            full_risk = f"{PROCESSED_DIR}/{symbol}_backtest_full_risk.csv"
+            stages += [
+                Stage(
+                    name=f"trailhawk:{symbol}",
+                    action=partial(run_btc_backtest, predictions),
+                    inputs=(
+                        predictions,
+                        predictions_binary,
+                        *_module_files("crypto.strategies.trailhawk_24.run_strategy"),
+                    ),
+                    outputs=(full_risk, str(trade_log_path(full_risk))),
+                    deps=(f"train:{symbol}",),
+                ),
+                Stage(
+                    name=f"robustness:{symbol}",
+                    action=partial(run_robustness, full_risk),
+                    inputs=(full_risk, *_module_files("crypto.backtest.robustness")),
+                    deps=(f"trailhawk:{symbol}",),
+                ),
+            ]
+
+    return stages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the data → features → model → backtest DAG")
+    parser.add_argument("--symbols", nargs="+", default=SYMBOLS)
+    parser.add_argument("--interval", default=INTERVAL)
+    parser.add_argument("--start", default=START_DATE)
+    parser.add_argument("--end", default=END_DATE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="rerun fresh stages too")
+    parser.add_argument("--no-download", action="store_true", help="use existing CSVs")
+    parser.add_argument("--walk-forward", action="store_true", help="walk-forward training")
+    args = parser.parse_args()
+
+    # Обучения символов идут параллельно — каждому своя доля ядер, а не все сразу
+    _, train_cpus = thread_budget(len(args.symbols), workers=args.workers)
+    stages = build_stages(
+        args.symbols,
+        args.interval,
+        args.start,
+        args.end,
+        download=not args.no_download,
+        walk_forward=args.walk_forward,
+        train_cpus=train_cpus,
+    )
+
+    started = time.perf_counter()
+    report = run_pipeline(stages, args.workers, args.force)
+
+    print("\n=== Pipeline Report ===")
+    print(report.to_string(index=False, float_format="{:.2f}".format))
+    counts = report["status"].value_counts()
+    print(
+        f"Ran: {counts.get('ran', 0)} | fresh: {counts.get('fresh', 0)} | "
+        f"failed: {counts.get('failed', 0)} | blocked: {counts.get('blocked', 0)} | "
+        f"wall: {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
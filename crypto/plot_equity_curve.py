@@ -1,19 +1,15 @@
 import matplotlib.pyplot as plt
-import pandas as pd
 
-# Загрузка результатов
-df = pd.read_csv("crypto/processed/BTCUSDT_backtest_results.csv", parse_dates=["exit_time"])
+from crypto.backtest.trade_log import read_trades
 
-# Equity = cumulative_return + 1 (т.е. 0 → 1.0, +0.2 → 1.2)
-df["equity"] = df["cumulative_return"] + 1.0
+# Загрузка результатов: equity (= cumulative_return + 1) и просадка уже в логе
+df = read_trades(
+    "crypto/processed/BTCUSDT_backtest_results.csv", ["exit_time", "equity", "drawdown"]
+)
 
 # Сглаженная equity (rolling window = 5)
 df["equity_smooth"] = df["equity"].rolling(window=5).mean()
 
-# Расчёт максимальной просадки
-df["max_equity"] = df["equity"].cummax()
-df["drawdown"] = (df["equity"] - df["max_equity"]) / df["max_equity"]
-
 # Построение графика
 fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 8), sharex=True)
 
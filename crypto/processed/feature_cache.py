@@ -0,0 +1,324 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from crypto.artifacts import KLINES, read_frame
+from crypto.processed import prepare_data
+from crypto.processed.prepare_data import (
+    CHUNK_ROWS,
+    FEATURE_COLUMNS,
+    TARGET_HORIZON,
+    TARGET_RETURN_THRESHOLD,
+    ChunkedIndicators,
+    calculate_indicators,
+    iter_indicator_chunks,
+)
+from crypto.processed.streaming_indicators import StreamingIndicators, stream_indicators
+
+# Constants
+FEATURE_CACHE_DIR = "crypto/processed/feature_cache"  # <cache>/<source stem>/<column>.npy
+CACHE_VERSION = 3  # bump when the on-disk layout or the indicator numerics change
+STREAM_APPEND_LIMIT = 5_000  # above this many new candles a full vectorized rebuild is faster
+CHUNKED_MIN_BYTES = 64 << 20  # larger sources (1m candles) are rebuilt block by block
+HASH_BLOCK = 1 << 20
+TMP_SUFFIX = ".tmp"  # <stem>.tmp — entry being written, swapped in when complete
+OLD_SUFFIX = ".old"  # <stem>.old — replaced entry, removed after the swap
+
+
+def indicator_config() -> dict:
+    return {
+        "version": CACHE_VERSION,
+        "features": FEATURE_COLUMNS,
+        "rsi_window": prepare_data.RSI_WINDOW,
+        "macd_spans": [prepare_data.MACD_FAST_SPAN, prepare_data.MACD_SLOW_SPAN],
+        "ema_spans": [prepare_data.EMA_FAST_SPAN, prepare_data.EMA_SLOW_SPAN],
+        "volatility_window": prepare_data.VOLATILITY_WINDOW,
+        "target_horizon": TARGET_HORIZON,
+        "target_return_threshold": TARGET_RETURN_THRESHOLD,
+    }
+
+
+def config_hash() -> str:
+    return hashlib.sha256(json.dumps(indicator_config(), sort_keys=True).encode()).hexdigest()[:16]
+
+
+def entry_dir_for(source: Path, cache_dir: str = FEATURE_CACHE_DIR) -> Path:
+    # Одна запись на исходный файл: выгрузки пары за разные диапазоны не перетирают друг друга.
+    # Дописанный в конец тот же файл остаётся в своей записи и досчитывается через append
+    return Path(cache_dir) / source.stem
+
+
+def cached_entries(cache_dir: str = FEATURE_CACHE_DIR) -> list[Path]:
+    # После сбоя посреди подмены рядом остаются .tmp/.old с полным meta.json — это не записи
+    return sorted(
+        path.parent
+        for path in Path(cache_dir).glob("*/meta.json")
+        if not path.parent.name.endswith((TMP_SUFFIX, OLD_SUFFIX))
+    )
+
+
+def entry_symbol(entry_dir: Path) -> str:
+    return entry_dir.name.split("_")[0]
+
+
+def entry_interval(entry_dir: Path) -> str | None:
+    # <symbol>_<interval>_<start>_<end>, как называет выгрузки get_binance_data
+    parts = entry_dir.name.split("_")
+    return parts[1] if len(parts) > 1 else None
+
+
+def entry_rows(entry_dir: Path) -> int:
+    index = entry_dir / "index.npy"
+    return np.load(index, mmap_mode="r").shape[0] if index.exists() else 0
+
+
+def symbol_entries(
+    cache_dir: str = FEATURE_CACHE_DIR, interval: str | None = None
+) -> dict[str, Path]:
+    # Одна запись на символ: все записи пары пишут в одни {symbol}_predictions и модель.
+    # Из нескольких выгрузок (другие даты) берём самую длинную историю
+    chosen: dict[str, Path] = {}
+    for entry_dir in cached_entries(cache_dir):
+        if interval is not None and entry_interval(entry_dir) != interval:
+            continue
+        symbol = entry_symbol(entry_dir)
+        if symbol not in chosen or entry_rows(entry_dir) > entry_rows(chosen[symbol]):
+            chosen[symbol] = entry_dir
+    return chosen
+
+
+def _hash_file(path: Path, prefix_size: int | None = None) -> tuple[str, str | None]:
+    # Один проход: хэш всего файла и, попутно, хэш первых prefix_size байт
+    digest, prefix_digest, read = hashlib.sha256(), None, 0
+    with path.open("rb") as source:
+        while block := source.read(HASH_BLOCK):
+            if prefix_size is not None and read <= prefix_size < read + len(block):
+                digest.update(block[: prefix_size - read])
+                prefix_digest = digest.hexdigest()
+                digest.update(block[prefix_size - read :])
+            else:
+                digest.update(block)
+            read += len(block)
+    if prefix_size is not None and prefix_size == read:
+        prefix_digest = digest.hexdigest()
+    return digest.hexdigest(), prefix_digest
+
+
+def read_meta(entry_dir: Path) -> dict | None:
+    meta_path = entry_dir / "meta.json"
+    return json.loads(meta_path.read_text()) if meta_path.exists() else None
+
+
+def read_features(entry_dir: Path) -> pd.DataFrame:
+    meta = read_meta(entry_dir)
+    if meta is None:
+        raise FileNotFoundError(f"No feature cache entry in {entry_dir}")
+    columns = {
+        column: np.load(entry_dir / f"{column}.npy", mmap_mode="r") for column in meta["columns"]
+    }
+    index = pd.DatetimeIndex(
+        np.load(entry_dir / "index.npy", mmap_mode="r").view("datetime64[ns]"),
+        name=meta["index_name"],
+    )
+    return pd.DataFrame(columns, index=index)
+
+
+def iter_feature_blocks(entry_dir: Path, rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    # Блоки поверх mmap — экспорт минутной истории без загрузки всей записи
+    meta = read_meta(entry_dir)
+    if meta is None:
+        raise FileNotFoundError(f"No feature cache entry in {entry_dir}")
+    columns = {
+        column: np.load(entry_dir / f"{column}.npy", mmap_mode="r") for column in meta["columns"]
+    }
+    index = np.load(entry_dir / "index.npy", mmap_mode="r")
+    for start in range(0, max(len(index), 1), rows):
+        block = slice(start, start + rows)
+        yield pd.DataFrame(
+            {column: values[block] for column, values in columns.items()},
+            index=pd.DatetimeIndex(index[block].view("datetime64[ns]"), name=meta["index_name"]),
+        )
+
+
+def _swap_entry(tmp_dir: Path, entry_dir: Path) -> None:
+    # Подменяем запись целиком — читатель не увидит полузаписанную
+    old_dir = entry_dir.with_name(entry_dir.name + OLD_SUFFIX)
+    if entry_dir.exists():
+        os.replace(entry_dir, old_dir)
+    os.replace(tmp_dir, entry_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _fresh_tmp_dir(entry_dir: Path) -> Path:
+    tmp_dir = entry_dir.with_name(entry_dir.name + TMP_SUFFIX)
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    return tmp_dir
+
+
+def _write_entry(entry_dir: Path, features: pd.DataFrame, meta: dict) -> None:
+    tmp_dir = _fresh_tmp_dir(entry_dir)
+
+    np.save(tmp_dir / "index.npy", features.index.values.astype("datetime64[ns]").view("i8"))
+    for column in features.columns:
+        np.save(tmp_dir / f"{column}.npy", features[column].to_numpy())
+    meta = {**meta, "columns": list(features.columns), "index_name": features.index.name}
+    (tmp_dir / "meta.json").write_text(json.dumps(meta))
+
+    _swap_entry(tmp_dir, entry_dir)
+
+
+def _write_entry_chunked(entry_dir: Path, source: Path, source_hash: str) -> None:
+    # Блоки признаков дописываются в сырые .bin, в конце каждый оборачивается в .npy —
+    # в памяти только один блок при любой длине истории
+    tmp_dir = _fresh_tmp_dir(entry_dir)
+    state = ChunkedIndicators()
+    dtypes: dict[str, np.dtype] = {}
+    index_name, rows = None, 0
+
+    handles = {}
+    try:
+        for features in iter_indicator_chunks(source, CHUNK_ROWS, state):
+            if not handles:
+                index_name = features.index.name
+                dtypes = {"index": np.dtype("i8")} | {
+                    column: features[column].dtype for column in features.columns
+                }
+                handles = {name: (tmp_dir / f"{name}.bin").open("wb") for name in dtypes}
+
+            index = features.index.values.astype("datetime64[ns]").view("i8")
+            _ = handles["index"].write(index.tobytes())
+            for column in features.columns:
+                _ = handles[column].write(features[column].to_numpy().tobytes())
+            rows += len(features)
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+    for name, dtype in dtypes.items():
+        raw = np.memmap(tmp_dir / f"{name}.bin", dtype=dtype, mode="r", shape=(rows,))
+        array = np.lib.format.open_memmap(tmp_dir / f"{name}.npy", "w+", dtype, (rows,))
+        for start in range(0, rows, CHUNK_ROWS):
+            array[start : start + CHUNK_ROWS] = raw[start : start + CHUNK_ROWS]
+        array.flush()
+        del raw, array
+        (tmp_dir / f"{name}.bin").unlink()
+
+    # Состояние движка — из переносимого между блоками: хвост closes и EMA последней свечи
+    engine = StreamingIndicators.from_history(state.warmup)
+    engine.emas, engine.bars = dict(state.emas), state.bars
+    tail = pd.Series(state.warmup, index=pd.DatetimeIndex(state.warmup_times))
+    meta = {
+        **_source_meta(source, source_hash, engine, tail.iloc[-TARGET_HORIZON:]),
+        "columns": [name for name in dtypes if name != "index"],
+        "index_name": index_name,
+    }
+    (tmp_dir / "meta.json").write_text(json.dumps(meta))
+
+    _swap_entry(tmp_dir, entry_dir)
+
+
+def _epoch_ns(index: pd.Index) -> list[int]:
+    return index.values.astype("datetime64[ns]").view("i8").tolist()
+
+
+def _source_meta(
+    source: Path, source_hash: str, engine: StreamingIndicators, tail: pd.Series
+) -> dict:
+    return {
+        "source": source.name,
+        "source_hash": source_hash,
+        "source_size": source.stat().st_size,
+        "config_hash": config_hash(),
+        "engine_state": engine.to_state(),
+        # Последние closes нужны, чтобы досчитать таргет у строк, которым не хватало будущего
+        "tail_closes": tail.tolist(),
+        "tail_times": _epoch_ns(tail.index),
+    }
+
+
+def _append_features(
+    entry_dir: Path, meta: dict, source: Path, source_hash: str
+) -> pd.DataFrame | None:
+    with source.open("rb") as handle:
+        header = handle.readline().decode()
+        _ = handle.seek(meta["source_size"])
+        tail_text = handle.read().decode()
+
+    # dtype по схеме KLINES, как при пересборке: иначе дописанный volume станет float64
+    new_raw = pd.read_csv(
+        io.StringIO(header + tail_text), index_col=0, parse_dates=True, dtype=KLINES.columns
+    )
+    if len(new_raw) == 0 or len(new_raw) > STREAM_APPEND_LIMIT:
+        return None
+
+    engine = StreamingIndicators.from_state(meta["engine_state"])
+    new_rows = new_raw.join(stream_indicators(new_raw, engine))
+
+    # Таргет по closes: хвост старых строк + новые свечи
+    tail_index = pd.DatetimeIndex(np.array(meta["tail_times"], dtype="i8").view("datetime64[ns]"))
+    closes = pd.concat([pd.Series(meta["tail_closes"], index=tail_index), new_raw["close"]])
+    future_return = (closes.shift(-TARGET_HORIZON) - closes) / closes
+    target = (future_return > TARGET_RETURN_THRESHOLD).astype(int)
+
+    cached = read_features(entry_dir).copy()
+    refreshed = cached.index.intersection(tail_index)
+    cached.loc[refreshed, "target"] = target.loc[refreshed]
+    new_rows["target"] = target.loc[new_raw.index]
+
+    features = pd.concat([cached, new_rows[cached.columns].dropna()])
+    new_meta = {
+        **meta,
+        "source": source.name,
+        "source_hash": source_hash,
+        "source_size": source.stat().st_size,
+        "engine_state": engine.to_state(),
+        "tail_closes": closes.iloc[-TARGET_HORIZON:].tolist(),
+        "tail_times": _epoch_ns(closes.index[-TARGET_HORIZON:]),
+    }
+    _write_entry(entry_dir, features, new_meta)
+    return features
+
+
+def refresh_features(source: Path, cache_dir: str = FEATURE_CACHE_DIR) -> str:
+    entry_dir = entry_dir_for(source, cache_dir)
+    meta = read_meta(entry_dir)
+    if meta is not None and meta["config_hash"] != config_hash():
+        meta = None  # другие параметры индикаторов — запись целиком устарела
+
+    source_hash, prefix_hash = _hash_file(source, meta["source_size"] if meta else None)
+
+    if meta is not None:
+        if meta["source_hash"] == source_hash:
+            return "hit"
+        # Файл только дописан в конец — досчитываем признаки для новых свечей
+        if prefix_hash == meta["source_hash"]:
+            if _append_features(entry_dir, meta, source, source_hash) is not None:
+                return "append"
+
+    if source.stat().st_size >= CHUNKED_MIN_BYTES:
+        _write_entry_chunked(entry_dir, source, source_hash)
+        return "rebuild"
+
+    raw_df = read_frame(source, KLINES)
+    closes = raw_df["close"]
+    meta = _source_meta(
+        source,
+        source_hash,
+        StreamingIndicators.from_history(closes.to_numpy()),
+        closes.iloc[-TARGET_HORIZON:],
+    )
+    _write_entry(entry_dir, calculate_indicators(raw_df), meta)
+    return "rebuild"
+
+
+def load_features(source: Path, cache_dir: str = FEATURE_CACHE_DIR) -> pd.DataFrame:
+    _ = refresh_features(source, cache_dir)
+    return read_features(entry_dir_for(source, cache_dir))
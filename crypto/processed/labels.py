@@ -0,0 +1,124 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from crypto.processed.feature_cache import cached_entries, read_features
+from crypto.processed.prepare_data import TARGET_HORIZON, VOLATILITY_WINDOW
+from crypto.strategies.ensemble_crypto_strategy import train_ensemble_model
+from crypto.strategies.trailhawk_24.run_strategy import STOP_LOSS_MULT, TAKE_PROFIT_MULT
+
+# Constants
+HORIZONS = (TARGET_HORIZON, 12, 24)  # candles until timeout; 24 = hold of run_btc_backtest
+BARRIERS = ((TAKE_PROFIT_MULT, STOP_LOSS_MULT), (1.0, 1.0), (2.0, 1.0))  # (TP, SL) × volatility
+TP_LABEL, SL_LABEL, TIMEOUT_LABEL = 1, -1, 0
+LABEL_BLOCK = 1 << 18  # rows per pass — bounds the (rows × horizon) temporaries
+# --train writes here, next to (not over) the production models and predictions
+BARRIER_MODEL_DIR = "crypto/models/barrier"
+BARRIER_PREDICTIONS_DIR = "crypto/processed/barrier"
+
+
+def label_column(horizon: int, tp_mult: float, sl_mult: float) -> str:
+    return f"tb_h{horizon}_tp{tp_mult:g}_sl{sl_mult:g}"
+
+
+def _first_hit(hit: np.ndarray) -> np.ndarray:
+    # hit — по бегущему экстремуму, т.е. монотонен по строке: False…False True…True.
+    # Индекс первого касания = число False, без argmax/any; нет касания → ширина окна
+    return hit.shape[1] - hit.sum(axis=1)
+
+
+def barrier_labels(
+    price_df: pd.DataFrame,
+    horizons: tuple[int, ...] = HORIZONS,
+    barriers: tuple[tuple[float, float], ...] = BARRIERS,
+) -> pd.DataFrame:
+    # Triple barrier на каждой свече: TP = close + vol × tp, SL = close - vol × sl, таймаут.
+    # Одна пара бегущих max(high) / min(low) на окнах max(horizons) обслуживает все варианты
+    close = price_df["close"].to_numpy(dtype=float)
+    volatility = price_df["close"].rolling(window=VOLATILITY_WINDOW).std().to_numpy()
+    width = max(horizons)
+
+    # Строка i view — свечи i + 1 … i + width, без копий. За концом истории ±inf:
+    # там барьер не касается никогда, и строка без полного будущего уходит в таймаут
+    high = np.r_[price_df["high"].to_numpy(dtype=float), np.full(width, -np.inf)]
+    low = np.r_[price_df["low"].to_numpy(dtype=float), np.full(width, np.inf)]
+    highs = np.lib.stride_tricks.sliding_window_view(high[1:], width)
+    lows = np.lib.stride_tricks.sliding_window_view(low[1:], width)
+
+    labels = {
+        label_column(horizon, tp_mult, sl_mult): np.empty(len(close), dtype=np.int8)
+        for horizon in horizons
+        for tp_mult, sl_mult in barriers
+    }
+    for start in range(0, len(close), LABEL_BLOCK):
+        rows = slice(start, start + LABEL_BLOCK)
+        running_high = np.maximum.accumulate(highs[rows], axis=1)
+        running_low = np.minimum.accumulate(lows[rows], axis=1)
+        entry, vol = close[rows, None], volatility[rows, None]
+
+        for tp_mult, sl_mult in barriers:
+            # NaN-волатильность прогрева — сравнения ложны, барьеров нет, метка — таймаут
+            tp_col = _first_hit(running_high >= entry + vol * tp_mult)
+            sl_col = _first_hit(running_low <= entry - vol * sl_mult)
+            for horizon in horizons:
+                # TP раньше SL, а на одной свече — TP, как в resolve_trailhawk_exits
+                labels[label_column(horizon, tp_mult, sl_mult)][rows] = np.select(
+                    [(tp_col < horizon) & (tp_col <= sl_col), sl_col < horizon],
+                    [TP_LABEL, SL_LABEL],
+                    TIMEOUT_LABEL,
+                )
+
+    return pd.DataFrame(labels, index=price_df.index)
+
+
+def with_barrier_target(
+    price_df: pd.DataFrame,
+    horizon: int = 24,  # hold of run_btc_backtest
+    tp_mult: float = TAKE_PROFIT_MULT,
+    sl_mult: float = STOP_LOSS_MULT,
+) -> pd.DataFrame:
+    # 🎯 target = TP стратегии достигнут раньше SL и таймаута — то, на чём она реально зарабатывает
+    # Последним horizon свечам не хватает будущего — их таймаут не настоящий, отбрасываем
+    labels = barrier_labels(price_df, (horizon,), ((tp_mult, sl_mult),)).iloc[:-horizon]
+    price_df = price_df.iloc[:-horizon].copy()
+    price_df["target"] = (labels.iloc[:, 0] == TP_LABEL).astype(int)
+    return price_df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Triple-barrier label shares per cached symbol")
+    parser.add_argument(
+        "--train",
+        action="store_true",
+        help=f"also train on the TP-first target into {BARRIER_MODEL_DIR}",
+    )
+    args = parser.parse_args()
+
+    for entry_dir in cached_entries():
+        symbol = entry_dir.name.split("_")[0]
+        crypto_df = read_features(entry_dir)
+
+        started = time.perf_counter()
+        labels = barrier_labels(crypto_df)
+        elapsed = time.perf_counter() - started
+
+        print(f"\n=== {symbol} — Triple-barrier labels ({len(labels)} candles) ===")
+        shares = labels.apply(lambda column: column.value_counts(normalize=True)).T
+        print(shares.rename(columns={TP_LABEL: "tp", SL_LABEL: "sl", TIMEOUT_LABEL: "timeout"}))
+        print(f"Labeled {labels.shape[1]} variants in {elapsed:.2f}s")
+
+        if args.train:
+            Path(BARRIER_PREDICTIONS_DIR).mkdir(parents=True, exist_ok=True)
+            train_ensemble_model(
+                with_barrier_target(crypto_df),
+                symbol,
+                model_dir=BARRIER_MODEL_DIR,
+                predictions_dir=BARRIER_PREDICTIONS_DIR,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from crypto.data.get_binance_data import INTERVAL_MS
+from crypto.data.kline_store import (
+    KLINE_DTYPE,
+    STORE_DIR,
+    partitions,
+    read_klines,
+    write_klines,
+)
+from crypto.processed.feature_cache import cached_entries, read_features
+from crypto.processed.prepare_data import FEATURE_COLUMNS, compute_features
+from crypto.strategies.ensemble_crypto_strategy import train_ensemble_model
+
+# Constants
+# <cache>/<symbol>/<base>_<tf>/<YYYY-MM>.npy — same layout as the kline store
+TIMEFRAME_CACHE_DIR = "crypto/processed/timeframe_cache"
+HIGHER_TIMEFRAMES = ("4h", "1d")
+DAY_MS = 86_400_000
+SOURCES_FILE = "sources.json"  # month → [size, mtime_ns] of the base partition it was built from
+
+
+def _check_timeframe(interval: str, timeframe: str) -> None:
+    base_ms, tf_ms = INTERVAL_MS.get(interval), INTERVAL_MS.get(timeframe)
+    if base_ms is None or tf_ms is None or tf_ms <= base_ms or tf_ms % base_ms:
+        raise ValueError(f"Cannot build {timeframe} bars from {interval} candles")
+    # Бары, делящие сутки, не пересекают границу месяца — кэш можно вести по месяцам
+    if DAY_MS % tf_ms:
+        raise ValueError(f"Timeframe {timeframe} does not divide a day")
+
+
+def aggregate_klines(records: np.ndarray, timeframe: str) -> np.ndarray:
+    # OHLCV-агрегация: open первой свечи, high/low — экстремумы, close последней, объёмы — сумма
+    tf_ms = INTERVAL_MS[timeframe]
+    if len(records) == 0:
+        return np.empty(0, dtype=KLINE_DTYPE)
+
+    buckets = records["open_time"] // tf_ms
+    _, starts = np.unique(buckets, return_index=True)
+    ends = np.r_[starts[1:], len(records)]
+
+    bars = np.zeros(len(starts), dtype=KLINE_DTYPE)
+    bars["open_time"] = buckets[starts] * tf_ms
+    bars["close_time"] = bars["open_time"] + tf_ms - 1
+    bars["open"] = records["open"][starts]
+    bars["close"] = records["close"][ends - 1]
+    bars["high"] = np.maximum.reduceat(records["high"], starts)
+    bars["low"] = np.minimum.reduceat(records["low"], starts)
+    for name in (
+        "volume",
+        "quote_asset_volume",
+        "number_of_trades",
+        "taker_buy_base_volume",
+        "taker_buy_quote_volume",
+    ):
+        bars[name] = np.add.reduceat(records[name], starts)
+    return bars
+
+
+def _source_key(path: Path) -> list[int]:
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def refresh_timeframe(
+    symbol: str,
+    interval: str,
+    timeframe: str,
+    store_dir: str = STORE_DIR,
+    cache_dir: str = TIMEFRAME_CACHE_DIR,
+) -> int:
+    # Переагрегируем только месяцы, чья базовая партиция изменилась (обычно — последний)
+    _check_timeframe(interval, timeframe)
+    series_name = f"{interval}_{timeframe}"
+    sources_path = Path(cache_dir) / symbol / series_name / SOURCES_FILE
+    sources = json.loads(sources_path.read_text()) if sources_path.exists() else {}
+
+    rebuilt = 0
+    for path in partitions(symbol, interval, store_dir):
+        key = _source_key(path)
+        if sources.get(path.stem) == key:
+            continue
+        write_klines(aggregate_klines(np.load(path), timeframe), symbol, series_name, cache_dir)
+        sources[path.stem] = key
+        rebuilt += 1
+
+    if rebuilt:
+        sources_path.parent.mkdir(parents=True, exist_ok=True)
+        sources_path.write_text(json.dumps(sources, indent=2, sort_keys=True))
+    return rebuilt
+
+
+def timeframe_features(
+    symbol: str,
+    interval: str,
+    timeframe: str,
+    store_dir: str = STORE_DIR,
+    cache_dir: str = TIMEFRAME_CACHE_DIR,
+) -> pd.DataFrame:
+    _ = refresh_timeframe(symbol, interval, timeframe, store_dir, cache_dir)
+    bars = read_klines(symbol, f"{interval}_{timeframe}", store_dir=cache_dir)
+
+    bars_df = pd.DataFrame(
+        {"close": bars["close"]},
+        index=pd.DatetimeIndex(pd.to_datetime(bars["open_time"], unit="ms"), name="open_time"),
+    )
+    features = compute_features(bars_df)
+    features.columns = [f"{column}_{timeframe}" for column in features.columns]
+    return features
+
+
+def join_completed(
+    base_index: pd.DatetimeIndex, features: pd.DataFrame, interval: str, timeframe: str
+) -> pd.DataFrame:
+    # Бар старшего ТФ [T, T + tf) закрывается вместе с базовой свечой T + tf - base:
+    # с неё и позже его признаки известны. Текущий недостроенный бар не виден никогда
+    available_at = features.index + pd.Timedelta(
+        milliseconds=INTERVAL_MS[timeframe] - INTERVAL_MS[interval]
+    )
+    position = np.searchsorted(available_at.values, base_index.values, side="right") - 1
+
+    joined = features.iloc[np.maximum(position, 0)].set_axis(base_index)
+    joined.loc[position < 0] = np.nan
+    return joined
+
+
+def add_timeframe_features(
+    base_df: pd.DataFrame,
+    symbol: str,
+    interval: str,
+    timeframes: tuple[str, ...] = HIGHER_TIMEFRAMES,
+    store_dir: str = STORE_DIR,
+    cache_dir: str = TIMEFRAME_CACHE_DIR,
+) -> tuple[pd.DataFrame, list[str]]:
+    fused = [base_df]
+    for timeframe in timeframes:
+        features = timeframe_features(symbol, interval, timeframe, store_dir, cache_dir)
+        fused.append(join_completed(base_df.index, features, interval, timeframe))
+
+    fused_df = pd.concat(fused, axis=1)
+    # Начало истории, где старшим ТФ не хватило прогрева окон, в обучение не идёт
+    feature_columns = [*FEATURE_COLUMNS, *(column for df in fused[1:] for column in df.columns)]
+    return fused_df.dropna(subset=feature_columns), feature_columns
+
+
+if __name__ == "__main__":
+    for entry_dir in cached_entries():
+        symbol, interval = entry_dir.name.split("_")[:2]
+        fused_df, feature_columns = add_timeframe_features(
+            read_features(entry_dir), symbol, interval
+        )
+        train_ensemble_model(fused_df, symbol, feature_columns)
@@ -1,60 +1,195 @@
+from collections.abc import Iterator
+from dataclasses import dataclass, field
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+from crypto.artifacts import KLINES
+
 # Constants
 TARGET_RETURN_THRESHOLD = 0.005  # 0.5% return threshold
+TARGET_HORIZON = 3  # candles ahead for the target return
+RSI_WINDOW = 14
+MACD_FAST_SPAN = 12
+MACD_SLOW_SPAN = 26
+EMA_FAST_SPAN = 20
+EMA_SLOW_SPAN = 50
+VOLATILITY_WINDOW = 10
+
+FEATURE_COLUMNS = ["rsi", "macd", "ema20", "ema50", "return", "volatility"]
+EMA_SPANS = (MACD_FAST_SPAN, MACD_SLOW_SPAN, EMA_FAST_SPAN, EMA_SLOW_SPAN)
+WARMUP_ROWS = max(RSI_WINDOW + 1, VOLATILITY_WINDOW)  # closes a block needs from before itself
+CHUNK_ROWS = 100_000  # rows per block in chunked mode (~70 days of 1m candles)
+WINDOW_BLOCK = 1 << 16  # windows per pass — bounds the (rows × window) temporary
+
+
+def _rolling(values: np.ndarray, window: int, stat: str) -> np.ndarray:
+    # Каждое окно считается только по своим значениям, без бегущих сумм как в pandas rolling —
+    # поэтому результат не зависит от того, где начат расчёт, и чанки сходятся бит-в-бит
+    result = np.full(len(values), np.nan)
+    if len(values) < window:
+        return result
+    windows = np.lib.stride_tricks.sliding_window_view(values, window)
+    for start in range(0, len(windows), WINDOW_BLOCK):
+        block = windows[start : start + WINDOW_BLOCK]
+        # Сдвиг на первый элемент окна: ровное окно даёт ровно 0 и нет потери точности на 1e5
+        centered = block - block[:, :1]
+        out = result[start + window - 1 : start + window - 1 + len(block)]
+        if stat == "mean":
+            out[:] = block[:, 0] + centered.mean(axis=1)
+        else:
+            out[:] = centered.std(axis=1, ddof=1)
+    return result
+
+
+def _ema(closes: np.ndarray, span: int, seed: float | None = None) -> np.ndarray:
+    # seed — EMA на последней свече до блока: ewm(adjust=False) продолжается ровно с неё
+    if seed is None:
+        return pd.Series(closes).ewm(span=span, adjust=False).mean().to_numpy()
+    return pd.Series(np.r_[seed, closes]).ewm(span=span, adjust=False).mean().to_numpy()[1:]
+
+
+def _indicator_columns(
+    closes: np.ndarray, warmup: np.ndarray, emas: dict[int, float]
+) -> dict[str, np.ndarray]:
+    # warmup — последние closes перед блоком (пусто для начала истории);
+    # emas — EMA на свече перед блоком, обновляется на месте значениями последней свечи
+    extended = np.r_[warmup, closes]
+    skip = len(warmup)
+
+    # RSI — the first candle of the history has no delta and counts as zero gain and zero loss
+    delta = np.diff(extended, prepend=np.nan)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = -np.where(delta < 0, delta, 0.0)
+    avg_gain = _rolling(gain, RSI_WINDOW, "mean")[skip:]
+    avg_loss = _rolling(loss, RSI_WINDOW, "mean")[skip:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        rsi = 100 - (100 / (1 + rs))
+
+    # MACD & EMA
+    ema = {span: _ema(closes, span, emas.get(span)) for span in EMA_SPANS}
+    emas.update({span: float(values[-1]) for span, values in ema.items()})
+
+    # Return & Volatility
+    return {
+        "rsi": rsi,
+        "macd": ema[MACD_FAST_SPAN] - ema[MACD_SLOW_SPAN],
+        "ema20": ema[EMA_FAST_SPAN],
+        "ema50": ema[EMA_SLOW_SPAN],
+        "return": np.r_[np.nan, extended[1:] / extended[:-1] - 1][skip:],
+        "volatility": _rolling(extended, VOLATILITY_WINDOW, "std")[skip:],
+    }
+
+
+def _with_target(price_df: pd.DataFrame, future_close: pd.Series) -> pd.DataFrame:
+    # 🎯 Новый таргет — движение вверх на ≥ 0.5% за 3 свечи (3 часа)
+    future_return = (future_close - price_df["close"]) / price_df["close"]
+    price_df["target"] = (future_return > TARGET_RETURN_THRESHOLD).astype(int)
+    return price_df.dropna()
+
+
+def compute_features(price_df: pd.DataFrame) -> pd.DataFrame:
+    # Только FEATURE_COLUMNS, без таргета и без dropna — для рядов, которые не обучаем напрямую
+    columns = _indicator_columns(price_df["close"].to_numpy(dtype=float), np.empty(0), {})
+    return pd.DataFrame(columns, index=price_df.index)
 
 
 def calculate_indicators(price_df: pd.DataFrame) -> pd.DataFrame:
     price_df = price_df.copy()
+    features = compute_features(price_df)
+    for name in FEATURE_COLUMNS:
+        price_df[name] = features[name]
+    return _with_target(price_df, price_df["close"].shift(-TARGET_HORIZON))
+
+
+@dataclass
+class ChunkedIndicators:
+    # Состояние между блоками: хвост closes для окон, EMA на последней свече
+    # и последние TARGET_HORIZON строк, которым ещё не хватает будущего для таргета
+    warmup: np.ndarray = field(default_factory=lambda: np.empty(0))
+    warmup_times: np.ndarray = field(default_factory=lambda: np.empty(0, dtype="datetime64[ns]"))
+    emas: dict[int, float] = field(default_factory=dict)
+    held: pd.DataFrame | None = None
+    bars: int = 0
+
+    def process(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        chunk = chunk.copy()
+        closes = chunk["close"].to_numpy(dtype=float)
+        if len(closes) == 0:
+            return chunk.iloc[:0]
+
+        for name, values in _indicator_columns(closes, self.warmup, self.emas).items():
+            chunk[name] = values
+        self.warmup = np.r_[self.warmup, closes][-WARMUP_ROWS:]
+        times = chunk.index.values.astype("datetime64[ns]")
+        self.warmup_times = np.r_[self.warmup_times, times][-WARMUP_ROWS:]
+        self.bars += len(closes)
+
+        rows = chunk if self.held is None else pd.concat([self.held, chunk])
+        self.held = rows.iloc[-TARGET_HORIZON:]
+        ready = rows.iloc[:-TARGET_HORIZON]
+        return _with_target(ready.copy(), rows["close"].shift(-TARGET_HORIZON).iloc[: len(ready)])
+
+    def finish(self) -> pd.DataFrame:
+        # В конце истории будущего нет — как и в calculate_indicators, таргет этих строк 0
+        if self.held is None:
+            return pd.DataFrame()
+        held, self.held = self.held.copy(), None
+        return _with_target(held, pd.Series(np.nan, index=held.index))
+
+
+def iter_indicator_chunks(
+    source: Path, chunk_rows: int = CHUNK_ROWS, state: ChunkedIndicators | None = None
+) -> Iterator[pd.DataFrame]:
+    # Память — O(chunk_rows) при любой длине истории; склейка блоков == calculate_indicators
+    state = state or ChunkedIndicators()
+    # Те же dtype, что у read_frame(source, KLINES) в полной пересборке: volume — float32
+    with pd.read_csv(
+        source, index_col=0, parse_dates=True, dtype=KLINES.columns, chunksize=chunk_rows
+    ) as reader:
+        for chunk in reader:
+            features = state.process(chunk)
+            if len(features):
+                yield features
+    features = state.finish()
+    if len(features):
+        yield features
+
+
+def process_crypto_file(file_path: Path, output_dir: str = "crypto/processed") -> str:
+    # feature_cache сам импортирует calculate_indicators — импорт здесь, чтобы не было цикла
+    from crypto.processed.feature_cache import entry_dir_for, iter_feature_blocks, refresh_features
 
-    # RSI
-    delta = price_df["close"].astype(float).diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    avg_gain = gain.rolling(window=14).mean()
-    avg_loss = loss.rolling(window=14).mean()
-    rs = avg_gain / avg_loss
-    price_df["rsi"] = 100 - (100 / (1 + rs))
-
-    # MACD
-    ema12 = price_df["close"].ewm(span=12, adjust=False).mean()
-    ema26 = price_df["close"].ewm(span=26, adjust=False).mean()
-    price_df["macd"] = ema12 - ema26
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    cache_dir = str(Path(output_dir) / "feature_cache")
 
-    # EMA
-    price_df["ema20"] = price_df["close"].ewm(span=20, adjust=False).mean()
-    price_df["ema50"] = price_df["close"].ewm(span=50, adjust=False).mean()
+    print(f"[+] Processing {file_path.name}...")
+    status = refresh_features(file_path, cache_dir)
 
-    # Return & Volatility
-    price_df["return"] = price_df["close"].pct_change()
-    price_df["volatility"] = price_df["close"].rolling(window=10).std()
+    out_name = file_path.name.replace(".csv", "_features.csv")
+    out_path = Path(output_dir) / out_name
+    if status == "hit" and out_path.exists():
+        print(f"[✓] {file_path.name} unchanged — cached features are up to date")
+        return status
 
-    # 🎯 Новый таргет — движение вверх на ≥ 0.5% за 3 свечи (3 часа)
-    future_return = (price_df["close"].shift(-3) - price_df["close"]) / price_df["close"]
-    price_df["target"] = (future_return > TARGET_RETURN_THRESHOLD).astype(int)
+    # CSV — только экспорт; все стадии читают бинарный кэш. Пишем блоками, без всей истории в памяти
+    shape = (0, 0)
+    for k, block in enumerate(iter_feature_blocks(entry_dir_for(file_path, cache_dir))):
+        block.to_csv(out_path, mode="a" if k else "w", header=k == 0)
+        shape = (shape[0] + len(block), len(block.columns))
 
-    return price_df.dropna()
+    print(f"[✓] Saved processed file to {out_path} ({status}): {shape}")
+    return status
 
 
 def process_all_crypto_data(
     data_dir: str = "crypto/data", output_dir: str = "crypto/processed"
 ) -> None:
-    Path(output_dir).mkdir(parents=True, exist_ok=True)
-
     for file_path in Path(data_dir).iterdir():
         if file_path.name.endswith(".csv"):
-            print(f"[+] Processing {file_path.name}...")
-            price_df = pd.read_csv(file_path, index_col=0, parse_dates=True)
-
-            processed_df = calculate_indicators(price_df)
-
-            out_name = file_path.name.replace(".csv", "_features.csv")
-            out_path = Path(output_dir) / out_name
-            processed_df.to_csv(out_path)
-
-            print(f"[✓] Saved processed file to {out_path} — shape: {processed_df.shape}")
+            _ = process_crypto_file(file_path, output_dir)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,171 @@
+import json
+import math
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from crypto.processed.prepare_data import (
+    EMA_FAST_SPAN,
+    EMA_SLOW_SPAN,
+    EMA_SPANS,
+    FEATURE_COLUMNS,
+    MACD_FAST_SPAN,
+    MACD_SLOW_SPAN,
+    RSI_WINDOW,
+    VOLATILITY_WINDOW,
+)
+
+
+@dataclass
+class RollingWindow:
+    # Окно фиксированной длины с бегущими суммой и суммой квадратов.
+    # Значения хранятся со сдвигом `shift`, а суммы пересчитываются раз в `size`
+    # обновлений — так не копится ошибка от add/remove и нет катастрофической
+    # потери точности в sum_sq на ценах порядка 1e5.
+    size: int
+    values: deque = field(default_factory=deque)
+    shift: float = 0.0
+    total: float = 0.0
+    total_sq: float = 0.0
+    nonzero: int = 0
+    updates: int = 0
+
+    def push(self, value: float) -> None:
+        if len(self.values) == self.size:
+            old = self.values.popleft()
+            self.total -= old - self.shift
+            self.total_sq -= (old - self.shift) ** 2
+            self.nonzero -= old != 0
+        self.values.append(value)
+        self.total += value - self.shift
+        self.total_sq += (value - self.shift) ** 2
+        self.nonzero += value != 0
+
+        self.updates += 1
+        if self.updates % self.size == 0:
+            self._resum()
+
+    def _resum(self) -> None:
+        self.shift = sum(self.values) / len(self.values)
+        self.total = sum(value - self.shift for value in self.values)
+        self.total_sq = sum((value - self.shift) ** 2 for value in self.values)
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.size
+
+    def mean(self) -> float:
+        if not self.full:
+            return math.nan
+        # An all-zero window is exactly zero, as in pandas, whatever the float residue
+        return 0.0 if self.nonzero == 0 else self.shift + self.total / self.size
+
+    def std(self) -> float:
+        if not self.full:
+            return math.nan
+        variance = (self.total_sq - self.total * self.total / self.size) / (self.size - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+@dataclass
+class StreamingIndicators:
+    # O(1) на свечу: те же признаки, что calculate_indicators, но без пересчёта истории
+    prev_close: float | None = None
+    emas: dict[int, float] = field(default_factory=dict)
+    gains: RollingWindow = field(default_factory=lambda: RollingWindow(RSI_WINDOW))
+    losses: RollingWindow = field(default_factory=lambda: RollingWindow(RSI_WINDOW))
+    closes: RollingWindow = field(default_factory=lambda: RollingWindow(VOLATILITY_WINDOW))
+    bars: int = 0
+
+    def update(self, close: float) -> dict[str, float]:
+        close = float(close)
+
+        # RSI — the first candle has no delta and counts as zero gain and zero loss
+        delta = close - self.prev_close if self.prev_close is not None else 0.0
+        self.gains.push(max(delta, 0.0))
+        self.losses.push(max(-delta, 0.0))
+
+        # EMA (adjust=False) is seeded with the first close
+        for span in EMA_SPANS:
+            alpha = 2 / (span + 1)
+            previous = self.emas.get(span)
+            self.emas[span] = close if previous is None else alpha * close + (1 - alpha) * previous
+
+        self.closes.push(close)
+        pct_change = close / self.prev_close - 1 if self.prev_close is not None else math.nan
+        self.prev_close = close
+        self.bars += 1
+
+        return {
+            "rsi": self._rsi(),
+            "macd": self.emas[MACD_FAST_SPAN] - self.emas[MACD_SLOW_SPAN],
+            "ema20": self.emas[EMA_FAST_SPAN],
+            "ema50": self.emas[EMA_SLOW_SPAN],
+            "return": pct_change,
+            "volatility": self.closes.std(),
+        }
+
+    def _rsi(self) -> float:
+        avg_gain, avg_loss = self.gains.mean(), self.losses.mean()
+        if math.isnan(avg_gain) or (avg_gain == 0 and avg_loss == 0):
+            return math.nan
+        if avg_loss == 0:
+            return 100.0
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+    def to_state(self) -> dict:
+        windows = {"gains": self.gains, "losses": self.losses, "closes": self.closes}
+        return {
+            "prev_close": self.prev_close,
+            "emas": {str(span): value for span, value in self.emas.items()},
+            "bars": self.bars,
+            **{name: list(window.values) for name, window in windows.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "StreamingIndicators":
+        engine = cls(
+            prev_close=state["prev_close"],
+            emas={int(span): value for span, value in state["emas"].items()},
+            bars=state["bars"],
+        )
+        for name in ("gains", "losses", "closes"):
+            window = getattr(engine, name)
+            for value in state[name]:
+                window.push(value)
+        return engine
+
+    @classmethod
+    def from_history(cls, closes: np.ndarray) -> "StreamingIndicators":
+        # То же состояние, что после update() на каждой свече, но за один векторный проход
+        closes = np.asarray(closes, dtype=float)
+        emas = {
+            span: float(pd.Series(closes).ewm(span=span, adjust=False).mean().iloc[-1])
+            for span in EMA_SPANS
+        }
+        engine = cls(prev_close=float(closes[-1]), emas=emas, bars=len(closes))
+        for delta in np.diff(closes, prepend=closes[0])[-RSI_WINDOW:].tolist():
+            engine.gains.push(max(delta, 0.0))
+            engine.losses.push(max(-delta, 0.0))
+        for close in closes[-VOLATILITY_WINDOW:].tolist():
+            engine.closes.push(close)
+        return engine
+
+    def save_checkpoint(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(self.to_state()))
+
+    @classmethod
+    def load_checkpoint(cls, path: str | Path) -> "StreamingIndicators":
+        return cls.from_state(json.loads(Path(path).read_text()))
+
+
+def stream_indicators(
+    price_df: pd.DataFrame, engine: StreamingIndicators | None = None
+) -> pd.DataFrame:
+    # Прогон свечей через движок — прогрев перед live или сверка с batch-версией
+    engine = engine or StreamingIndicators()
+    rows = [engine.update(close) for close in price_df["close"].to_numpy(dtype=float)]
+    return pd.DataFrame(rows, index=price_df.index, columns=FEATURE_COLUMNS)
@@ -2,100 +2,84 @@ from pathlib import Path
 
 import pandas as pd
 
+from crypto.artifacts import PREDICTIONS, TRADES, read_frame, write_frame
+from crypto.backtest.engine import (
+    REASONS,
+    entry_indices,
+    price_arrays,
+    resolve_basic_exits,
+    smart_filter,
+)
+from crypto.instrumentation import count, count_values, instrumented_run, timer
+
 # Constants
 RSI_OVERBOUGHT = 75  # RSI level considered overbought
 TRAIL_START_CANDLE = 2  # Candle number when trailing stop begins
+TAKE_PROFIT_MULT = 2.5  # TP distance in volatility units
+STOP_LOSS_MULT = 1.5  # SL distance in volatility units
 
 
-def run_backtest(
-    path: str,
-    symbol: str,
+def backtest_trades(
+    price_data: pd.DataFrame,
     hold: int = 3,  # max hold time
     min_prob: float = 0.55,  # min ML confidence
     vol_threshold: float = 0.001,  # minimum volatility to even enter
-) -> None:
-    price_data = pd.read_csv(path, index_col=0, parse_dates=True)
-    trades = []
-
-    price_data["volatility"] = price_data["close"].rolling(window=10).std()
-    price_data["volume_ma"] = price_data["volume"].rolling(window=20).mean()
-
-    for i in range(len(price_data) - hold - 1):
-        row = price_data.iloc[i]
-
-        # ✅ ENTRY CONDITIONS (Smart Filter)
-        if (
-            row["prediction"] != 1
-            or row["prediction_prob"] < min_prob
-            or row["rsi"] >= RSI_OVERBOUGHT
-            or row["ema20"] <= row["ema50"]
-            or row["volatility"] < vol_threshold
-        ):
-            continue
-
-        entry_price = row["close"]
-        stop_loss = entry_price - row["volatility"] * 1.5
-        take_profit = entry_price + row["volatility"] * 2.5
-        trail_price = None
-        exit_index = None
-        reason = "hold"
-        exit_price = None  # Initialize exit_price
-
-        for j in range(1, hold + 1):
-            future_row = price_data.iloc[i + j]
-            high = future_row["high"]
-            low = future_row["low"]
-
-            # 📈 Take profit hit
-            if high >= take_profit:
-                exit_price = take_profit
-                exit_index = price_data.index[i + j]
-                reason = "tp"
-                break
-
-            # 🛑 Stop loss hit
-            if low <= stop_loss:
-                exit_price = stop_loss
-                exit_index = price_data.index[i + j]
-                reason = "sl"
-                break
-
-            # 📉 Trailing stop logic (optional)
-            if j >= TRAIL_START_CANDLE:
-                # if price moved in our direction, move up the stop
-                new_trail = future_row["close"] - row["volatility"]
-                if trail_price is None or new_trail > trail_price:
-                    trail_price = new_trail
-                if low < trail_price:
-                    exit_price = trail_price
-                    exit_index = price_data.index[i + j]
-                    reason = "trail"
-                    break
-
-        # ⏱ No exit? Use last close
-        if exit_index is None:
-            exit_price = price_data.iloc[i + hold]["close"]
-            exit_index = price_data.index[i + hold]
-            reason = "timeout"
-
-        pnl = (exit_price - entry_price) / entry_price
-        trades.append(
-            {
-                "entry_time": price_data.index[i],
-                "exit_time": exit_index,
-                "entry_price": entry_price,
-                "exit_price": exit_price,
-                "pnl": pnl,
-                "reason": reason,
-            }
+) -> pd.DataFrame:
+    with timer("features"):
+        price_data = price_data.copy()
+        price_data["volatility"] = price_data["close"].rolling(window=10).std()
+        price_data["volume_ma"] = price_data["volume"].rolling(window=20).mean()
+        arrays = price_arrays(price_data)
+
+    # ✅ ENTRY CONDITIONS (Smart Filter) — one vectorized pass over all candles
+    with timer("entries"):
+        entries = entry_indices(smart_filter(arrays, min_prob, RSI_OVERBOUGHT, vol_threshold), hold)
+    count("entries", len(entries))
+
+    # 📈 TP → 🛑 SL → 📉 trailing stop → ⏱ timeout, resolved for all entries in batches
+    with timer("exits"):
+        exit_pos, exit_price, reason = resolve_basic_exits(
+            arrays,
+            entries,
+            hold,
+            tp_mult=TAKE_PROFIT_MULT,
+            sl_mult=STOP_LOSS_MULT,
+            trail_start=TRAIL_START_CANDLE,
         )
+    count_values("exits", REASONS[reason])
+
+    entry_price = arrays["close"][entries]
+    trades = {
+        "entry_time": price_data.index[entries],
+        "exit_time": price_data.index[exit_pos],
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "pnl": (exit_price - entry_price) / entry_price,
+        "reason": REASONS[reason],
+    }
 
     trades_df = pd.DataFrame(trades)
     trades_df["cumulative_return"] = (1 + trades_df["pnl"]).cumprod() - 1
+    return trades_df
+
 
-    # 💾 Save result
-    out_path = f"crypto/processed/{symbol}_backtest_results.csv"
-    trades_df.to_csv(out_path)
+def run_backtest(
+    path: str,
+    symbol: str,
+    hold: int = 3,  # max hold time
+    min_prob: float = 0.55,  # min ML confidence
+    vol_threshold: float = 0.001,  # minimum volatility to even enter
+) -> None:
+    with instrumented_run("run_backtest", symbol=symbol):
+        with timer("load"):
+            price_data = read_frame(path, PREDICTIONS)
+        with timer("backtest"):
+            trades_df = backtest_trades(price_data, hold, min_prob, vol_threshold)
+
+        # 💾 Save result
+        out_path = f"crypto/processed/{symbol}_backtest_results.csv"
+        with timer("save"):
+            write_frame(trades_df, out_path, TRADES)
 
     print(f"\n=== {symbol} — Backtest Results ===")
     print(f"Trades taken: {len(trades_df)}")
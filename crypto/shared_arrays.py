@@ -0,0 +1,121 @@
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+# Constants
+ALIGNMENT = 64  # every array starts on a cache line inside the segment
+INDEX_KEY = "__index__"  # the DataFrame index travels as one more array
+
+
+@dataclass(frozen=True)
+class SharedArrays:
+    # Picklable handle — a few hundred bytes go to workers instead of the data itself
+    name: str
+    layout: tuple[tuple[str, str, tuple[int, ...], int], ...]  # (key, dtype, shape, offset)
+    index_name: str | None = None
+
+    @property
+    def columns(self) -> list[str]:
+        return [key for key, *_ in self.layout if key != INDEX_KEY]
+
+
+# Владелец сегментов — публикующий процесс: name → segment
+_published: dict[str, SharedMemory] = {}
+_lock = threading.Lock()
+# В воркере: одно подключение на сегмент на всю жизнь процесса — пулы живут один прогон
+_attached: dict[str, SharedMemory] = {}
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def publish_arrays(arrays: dict[str, np.ndarray], index_name: str | None = None) -> SharedArrays:
+    layout, size = [], 0
+    for key, values in arrays.items():
+        offset = _aligned(size)
+        layout.append((key, values.dtype.str, values.shape, offset))
+        size = offset + values.nbytes
+
+    segment = SharedMemory(create=True, size=max(size, 1))
+    shared = SharedArrays(segment.name, tuple(layout), index_name)
+    for (_, dtype, shape, offset), values in zip(shared.layout, arrays.values()):
+        np.ndarray(shape, dtype, buffer=segment.buf, offset=offset)[...] = values
+
+    with _lock:
+        _published[segment.name] = segment
+    return shared
+
+
+def publish_frame(df: pd.DataFrame, columns: list[str] | None = None) -> SharedArrays:
+    # Только числовые колонки: индекс — datetime64[ns], остальное в своём dtype
+    arrays = {name: df[name].to_numpy() for name in columns or df.columns}
+    if isinstance(df.index, pd.DatetimeIndex):
+        arrays[INDEX_KEY] = df.index.values.astype("datetime64[ns]")
+    else:
+        arrays[INDEX_KEY] = df.index.to_numpy()
+    for name, values in arrays.items():
+        if values.dtype.hasobject:
+            raise TypeError(f"Column {name!r} has dtype object and cannot be shared")
+    return publish_arrays(arrays, df.index.name)
+
+
+def release(shared: SharedArrays) -> None:
+    with _lock:
+        segment = _published.pop(shared.name)
+    try:
+        segment.close()
+    except BufferError:
+        pass  # в этом процессе ещё живы view — mmap закроется вместе с последней из них
+    segment.unlink()
+
+
+@contextmanager
+def shared_frame(df: pd.DataFrame, columns: list[str] | None = None) -> Iterator[SharedArrays]:
+    shared = publish_frame(df, columns)
+    try:
+        yield shared
+    finally:
+        release(shared)
+
+
+@contextmanager
+def shared_arrays(arrays: dict[str, np.ndarray]) -> Iterator[SharedArrays]:
+    shared = publish_arrays(arrays)
+    try:
+        yield shared
+    finally:
+        release(shared)
+
+
+def _segment(name: str) -> SharedMemory:
+    if name in _published:
+        return _published[name]
+    if name not in _attached:
+        # Воркер только читает: resource_tracker не должен удалять чужой сегмент при выходе
+        _attached[name] = SharedMemory(name, track=False)
+    return _attached[name]
+
+
+def attach_arrays(shared: SharedArrays) -> dict[str, np.ndarray]:
+    # Zero-copy read-only views: N воркеров читают одни и те же физические страницы
+    segment = _segment(shared.name)
+    arrays = {}
+    for key, dtype, shape, offset in shared.layout:
+        values = np.ndarray(shape, dtype, buffer=segment.buf, offset=offset)
+        values.flags.writeable = False
+        arrays[key] = values
+    return arrays
+
+
+def attach_frame(shared: SharedArrays) -> pd.DataFrame:
+    # copy=False: колонки — те же view. Запись в них не дойдёт до сегмента:
+    # с copy-on-write pandas скопирует колонку, без него — упадёт на read-only
+    arrays = attach_arrays(shared)
+    index = pd.Index(arrays.pop(INDEX_KEY), name=shared.index_name)
+    return pd.DataFrame(arrays, index=index, copy=False)
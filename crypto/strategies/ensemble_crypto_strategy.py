@@ -1,67 +1,236 @@
+import argparse
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+from scipy.special import expit
 from sklearn.ensemble import RandomForestClassifier, VotingClassifier
 from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import classification_report
+from sklearn.metrics import classification_report, log_loss
+from threadpoolctl import threadpool_limits
 from xgboost import XGBClassifier
 
+from crypto.artifacts import PREDICTIONS, read_frame, write_frame
+from crypto.instrumentation import count, instrumented_run, timer
+from crypto.processed.feature_cache import (
+    cached_entries,
+    entry_interval,
+    entry_rows,
+    entry_symbol,
+    read_features,
+    symbol_entries,
+)
+from crypto.processed.prepare_data import FEATURE_COLUMNS
+from crypto.strategies.model_store import MODEL_DIR, save_artifact
+
 # Constants
 PREDICTION_THRESHOLD = 0.5  # Threshold for positive class prediction
+SCHEDULE_REPORT = "crypto/processed/training_schedule.csv"
+PREDICTIONS_DIR = "crypto/processed"  # <dir>/<symbol>_predictions.csv
+INTERVAL = "1h"  # bars the models are trained on; one cache entry per symbol
 
 
 def load_data(path: Path) -> pd.DataFrame:
-    return pd.read_csv(path, index_col=0, parse_dates=True)
-
-
-def train_ensemble_model(df: pd.DataFrame, symbol: str) -> None:
-    features = ["rsi", "macd", "ema20", "ema50", "return", "volatility"]
-    target = "target"
-
-    # 🧠 Split по времени — честный трейдерский подход
-    split_point = int(len(df) * 0.8)
-    train_df = df.iloc[:split_point]
-    test_df = df.iloc[split_point:]
+    return read_frame(path)
 
-    # Extract features and target with explicit types
-    x_train, y_train = train_df[features].astype(float), train_df[target].astype(int)
-    x_test, y_test = test_df[features].astype(float), test_df[target].astype(int)
 
-    # 📦 Модели
-    xgb = XGBClassifier(use_label_encoder=False, eval_metric="logloss", verbosity=0)
-    rf = RandomForestClassifier(n_estimators=100, random_state=42)
+def build_ensemble(n_jobs: int = -1) -> VotingClassifier:
+    # 📦 Модели — каждая обучается ровно один раз внутри VotingClassifier
+    xgb = XGBClassifier(eval_metric="logloss", verbosity=0, n_jobs=n_jobs)
+    rf = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs)
     lr = LogisticRegression(max_iter=1000)
 
-    ensemble = VotingClassifier(estimators=[("xgb", xgb), ("rf", rf), ("lr", lr)], voting="hard")
-
-    _ = xgb.fit(x_train, y_train)
-    _ = ensemble.fit(x_train, y_train)
-    probs = xgb.predict_proba(x_test)[:, 1]  # вероятность класса 1
-    y_pred = (probs >= PREDICTION_THRESHOLD).astype(int)
-
-    print(f"\n=== {symbol} — Ensemble Model Report ===")
-    # Print classification report directly
-    print(f"{classification_report(y_test, y_pred, digits=4)}")
-
+    return VotingClassifier(estimators=[("xgb", xgb), ("rf", rf), ("lr", lr)], voting="soft")
+
+
+def fit_ensemble(x_train: pd.DataFrame, y_train: pd.Series, n_jobs: int = -1) -> VotingClassifier:
+    return build_ensemble(n_jobs).fit(x_train, y_train)
+
+
+def predict_ensemble(
+    ensemble: VotingClassifier, x: pd.DataFrame
+) -> tuple[np.ndarray, np.ndarray]:
+    # One predict_proba per base model gives both the majority vote and the averaged probability
+    model_probs = np.stack([model.predict_proba(x)[:, 1] for model in ensemble.estimators_])
+    votes = (model_probs >= PREDICTION_THRESHOLD).sum(axis=0)
+    y_pred = (votes * 2 > len(model_probs)).astype(int)
+    return y_pred, model_probs.mean(axis=0)
+
+
+def row_scorer(ensemble: VotingClassifier) -> Callable[[np.ndarray], tuple[int, float]]:
+    # predict_ensemble для одной строки без валидации sklearn и без пула потоков:
+    # ~1-3 мс на свечу вместо ~15. Деревья RF — в том же порядке суммирования, что и в sklearn
+    models = ensemble.named_estimators_
+    booster = models["xgb"].get_booster()
+    booster.set_param({"nthread": 1})
+    trees = models["rf"].estimators_
+    coef, intercept = models["lr"].coef_[0], float(models["lr"].intercept_[0])
+
+    def score(row: np.ndarray) -> tuple[int, float]:
+        x = np.asarray(row, dtype=float).reshape(1, -1)
+        x32 = x.astype(np.float32)
+        forest = np.zeros((1, 2))
+        for tree in trees:
+            forest += tree.predict_proba(x32, check_input=False)
+
+        model_probs = np.array(
+            [
+                float(booster.inplace_predict(x)[0]),
+                float(forest[0, 1] / len(trees)),
+                float(expit(x[0] @ coef + intercept)),
+            ]
+        )
+        votes = int((model_probs >= PREDICTION_THRESHOLD).sum())
+        return int(votes * 2 > len(model_probs)), float(model_probs.mean())
+
+    return score
+
+
+def save_predictions(
+    test_df: pd.DataFrame,
+    y_pred: np.ndarray,
+    probs: np.ndarray,
+    symbol: str,
+    predictions_dir: str = PREDICTIONS_DIR,
+) -> str:
     # 💾 Сохраняем test с prediction — для трейдера/бэктеста
     test_df = test_df.copy()
     test_df["prediction"] = y_pred
     test_df["prediction_prob"] = probs
 
-    out_path = f"crypto/processed/{symbol}_predictions.csv"
-    test_df.to_csv(out_path)
-    print(f"[✓] Saved predictions to {out_path}")
+    out_path = f"{predictions_dir}/{symbol}_predictions.csv"
+    with timer("save_predictions"):
+        write_frame(test_df, out_path, PREDICTIONS)
+    return out_path
+
+
+def train_ensemble_model(
+    df: pd.DataFrame,
+    symbol: str,
+    features: list[str] = FEATURE_COLUMNS,
+    n_jobs: int = -1,
+    model_dir: str = MODEL_DIR,
+    predictions_dir: str = PREDICTIONS_DIR,
+    interval: str | None = None,  # bars of df — recorded so updates never mix intervals
+) -> None:
+    target = "target"
 
+    with instrumented_run("train_ensemble_model", symbol=symbol):
+        # 🧠 Split по времени — честный трейдерский подход
+        split_point = int(len(df) * 0.8)
+        train_df = df.iloc[:split_point]
+        test_df = df.iloc[split_point:]
+
+        # Extract features and target with explicit types
+        x_train, y_train = train_df[features].astype(float), train_df[target].astype(int)
+        x_test, y_test = test_df[features].astype(float), test_df[target].astype(int)
+        count("rows_train", len(x_train))
+        count("rows_test", len(x_test))
+        count("positives_train", int(y_train.sum()))
+
+        with timer("fit"):
+            ensemble = fit_ensemble(x_train, y_train, n_jobs)
+        with timer("predict"):
+            y_pred, probs = predict_ensemble(ensemble, x_test)
+        # Лосс на отложенной выборке — эталон для проверки дрейфа в инкрементальных обновлениях
+        holdout = {"holdout_logloss": float(log_loss(y_test, probs, labels=[0, 1]))}
+        if interval is not None:
+            holdout["interval"] = interval
+        with timer("save_artifact"):
+            _ = save_artifact(
+                ensemble, symbol, train_df, features, target, model_dir, extra=holdout
+            )
+
+        # Одним print — отчёты параллельно обучаемых символов не перемешиваются
+        report = classification_report(y_test, y_pred, digits=4)
+        print(f"\n=== {symbol} — Ensemble Model Report ===\n{report}")
+
+        out_path = save_predictions(test_df, y_pred, probs, symbol, predictions_dir)
+    print(f"[✓] Saved predictions to {out_path}")
 
-def run_for_all() -> None:
-    processed_dir = Path("crypto/processed")
 
-    for file_path in processed_dir.iterdir():
-        if file_path.name.endswith("_features.csv"):
-            symbol = file_path.name.split("_")[0]
-            crypto_df = load_data(file_path)
-            train_ensemble_model(crypto_df, symbol)
+def thread_budget(
+    n_tasks: int, cpus: int | None = None, workers: int | None = None
+) -> tuple[int, int]:
+    # Сначала процессы: символы независимы и масштабируются линейно, а потоки RF/XGB
+    # на десятках тысяч строк — заметно хуже. Потоки получают только остаток ядер
+    cpus = cpus or os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, n_tasks, cpus))
+    return workers, max(1, cpus // workers)
+
+
+def _init_trainer(threads: int) -> None:
+    # BLAS/OpenMP воркера (LR, numpy) — в пределах его доли ядер, как и n_jobs моделей
+    _ = threadpool_limits(limits=threads)
+
+
+def _train_entry(entry_dir: Path, threads: int) -> dict:
+    symbol = entry_symbol(entry_dir)
+    started, cpu_started = time.perf_counter(), time.process_time()
+    # Признаки берём из бинарного кэша prepare_data, без парсинга *_features.csv
+    crypto_df = read_features(entry_dir)
+    train_ensemble_model(crypto_df, symbol, n_jobs=threads, interval=entry_interval(entry_dir))
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started  # все потоки процесса
+    return {
+        "symbol": symbol,
+        "rows": len(crypto_df),
+        "threads": threads,
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "cores": cpu / wall,
+    }
+
+
+def run_for_all(
+    workers: int | None = None, cpus: int | None = None, interval: str = INTERVAL
+) -> pd.DataFrame:
+    # Записи одного символа писали бы в одну модель и одни predictions — гонка в пуле
+    chosen = symbol_entries(interval=interval)
+    for entry_dir in sorted(set(cached_entries()) - set(chosen.values())):
+        print(f"[!] Skipping {entry_dir.name}: not the {interval} entry trained for its symbol")
+    # Длинные истории — первыми: в хвосте расписания остаются короткие задачи
+    entries = sorted(chosen.values(), key=entry_rows, reverse=True)
+    if not entries:
+        return pd.DataFrame()
+    cpus = cpus or os.cpu_count() or 1
+    workers, threads = thread_budget(len(entries), cpus, workers)
+
+    started = time.perf_counter()
+    if workers == 1:
+        rows = [_train_entry(entry_dir, threads) for entry_dir in entries]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_trainer, initargs=(threads,)
+        ) as pool:
+            rows = list(pool.map(_train_entry, entries, [threads] * len(entries)))
+    wall = time.perf_counter() - started
+
+    report = pd.DataFrame(rows)
+    report.to_csv(SCHEDULE_REPORT, index=False)
+    print(f"\n=== Training {len(entries)} symbols: {workers} workers × {threads} threads ===")
+    print(report.to_string(index=False, float_format="{:.2f}".format))
+    print(
+        f"Wall: {wall:.1f}s | sum of symbol time: {report['wall_s'].sum():.1f}s "
+        f"({report['wall_s'].sum() / wall:.1f}× concurrency) | "
+        f"core utilisation: {report['cpu_s'].sum() / (wall * cpus):.0%} of {cpus} CPUs"
+    )
+    print(f"[✓] Saved schedule report to {SCHEDULE_REPORT}")
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the ensemble for every cached symbol")
+    parser.add_argument("--workers", type=int, default=None, help="symbols trained at once")
+    parser.add_argument("--cpus", type=int, default=None, help="global core budget")
+    parser.add_argument("--interval", default=INTERVAL, help="cache entries to train on")
+    args = parser.parse_args()
+    _ = run_for_all(args.workers, args.cpus, args.interval)
 
 
 if __name__ == "__main__":
-    run_for_all()
+    main()
@@ -0,0 +1,273 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, VotingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, log_loss
+from xgboost import XGBClassifier
+
+from crypto.instrumentation import count, instrumented_run, timer
+from crypto.processed.feature_cache import (
+    cached_entries,
+    entry_symbol,
+    read_features,
+    symbol_entries,
+)
+from crypto.processed.prepare_data import FEATURE_COLUMNS, TARGET_HORIZON
+from crypto.strategies.ensemble_crypto_strategy import (
+    INTERVAL,
+    PREDICTIONS_DIR,
+    predict_ensemble,
+    save_predictions,
+    train_ensemble_model,
+)
+from crypto.strategies.model_store import (
+    MODEL_DIR,
+    artifact_path,
+    list_versions,
+    load_artifact,
+    save_artifact,
+)
+
+# Constants
+RECENT_BARS = 24 * 90  # new XGB rounds and RF trees learn on at least the last ~quarter
+XGB_MAX_GROWTH = 2.0  # booster twice its full-fit size → full retrain
+RF_MAX_ROTATED = 1.0  # as many trees replaced as the forest has → full retrain
+DRIFT_FEATURES = ["rsi", "return"]  # scale-free: PSI of ema/macd/volatility moves with price alone
+DRIFT_BARS = 24 * 30  # recent window vs the full-fit window; a week of rsi is too noisy
+PSI_BINS = 10
+PSI_THRESHOLD = 0.25  # the usual "significant shift" level
+PSI_FLOOR = 1e-4  # empty bins — no log(0)
+LOSS_DRIFT_RATIO = 1.2  # out-of-sample log loss since the full fit vs its holdout log loss
+MIN_DRIFT_ROWS = 48  # fewer out-of-sample rows — the loss check is noise, skip it
+
+
+def population_stability(
+    reference: np.ndarray, current: np.ndarray, bins: int = PSI_BINS
+) -> float:
+    # Бины — квантили эталона: каждый содержит ~1/bins его строк
+    edges = np.unique(np.quantile(reference, np.linspace(0, 1, bins + 1)[1:-1]))
+    expected, actual = (
+        np.clip(
+            np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+            / len(values),
+            PSI_FLOOR,
+            None,
+        )
+        for values in (reference, current)
+    )
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def model_interval(symbol: str, model_dir: str = MODEL_DIR) -> str | None:
+    if not list_versions(symbol, model_dir):
+        return None
+    meta = json.loads((artifact_path(symbol, model_dir=model_dir) / "meta.json").read_text())
+    # Пока интервал не писался в meta, модели учились только на часовых свечах
+    return meta.get("interval", INTERVAL)
+
+
+def incremental_state(ensemble: VotingClassifier, meta: dict) -> dict:
+    # Полное обучение пишет только holdout_logloss — остальное выводится из его meta
+    rounds = ensemble.named_estimators_["xgb"].get_booster().num_boosted_rounds()
+    return {
+        "interval": meta.get("interval", INTERVAL),
+        "base_version": meta.get("base_version", meta["version"]),
+        "base_train_end": meta.get("base_train_end", meta["train_end"]),
+        "base_rows": meta.get("base_rows", meta["train_rows"]),
+        "base_rounds": meta.get("base_rounds", rounds),
+        "holdout_logloss": meta.get("holdout_logloss"),
+        "updates": meta.get("updates", 0),
+        "rotated_trees": meta.get("rotated_trees", 0),
+        "oos_loss_sum": meta.get("oos_loss_sum", 0.0),
+        "oos_rows": meta.get("oos_rows", 0),
+    }
+
+
+def full_retrain_reasons(
+    ensemble: VotingClassifier,
+    state: dict,
+    labeled: pd.DataFrame,
+    recent: pd.DataFrame,
+    rounds: int,
+    trees: int,
+) -> list[str]:
+    models = ensemble.named_estimators_
+    reasons = []
+    if state["holdout_logloss"] is None:
+        reasons.append("no_holdout_loss")
+    if models["xgb"].get_booster().num_boosted_rounds() + rounds > (
+        XGB_MAX_GROWTH * state["base_rounds"]
+    ):
+        reasons.append("booster_grown")
+    if state["rotated_trees"] + trees > RF_MAX_ROTATED * len(models["rf"].estimators_):
+        reasons.append("forest_rotated")
+    if recent["target"].nunique() < 2:
+        reasons.append("one_class_window")
+
+    # Дрейф признаков: последний месяц против окна полного обучения
+    reference = labeled.loc[: state["base_train_end"]]
+    for name in DRIFT_FEATURES:
+        psi = population_stability(
+            reference[name].to_numpy(dtype=float), labeled[name].iloc[-DRIFT_BARS:].to_numpy()
+        )
+        if psi > PSI_THRESHOLD:
+            reasons.append(f"drift_{name}")
+
+    # Дрейф качества: средний лосс на ещё не виденных моделью свечах с момента полного обучения
+    if state["oos_rows"] >= MIN_DRIFT_ROWS and state["holdout_logloss"] is not None:
+        if state["oos_loss_sum"] / state["oos_rows"] > LOSS_DRIFT_RATIO * state["holdout_logloss"]:
+            reasons.append("loss_drift")
+    return reasons
+
+
+def boost_xgb(
+    xgb: XGBClassifier, x: pd.DataFrame, y: pd.Series, rounds: int, n_jobs: int
+) -> XGBClassifier:
+    # Продолжаем бустинг с сохранённого бустера: старые деревья не трогаем, добавляем rounds новых
+    params = {**xgb.get_params(), "n_estimators": rounds, "n_jobs": n_jobs}
+    return XGBClassifier(**params).fit(x, y, xgb_model=xgb.get_booster())
+
+
+def rotate_forest(
+    rf: RandomForestClassifier, x: pd.DataFrame, y: pd.Series, trees: int, n_jobs: int
+) -> None:
+    # warm_start доращивает trees деревьев на свежих данных, потом уходят самые старые
+    n_trees = len(rf.estimators_)
+    _ = rf.set_params(n_estimators=n_trees + trees, warm_start=True, n_jobs=n_jobs).fit(x, y)
+    rf.estimators_ = rf.estimators_[trees:]
+    _ = rf.set_params(n_estimators=n_trees, warm_start=False)
+
+
+def refit_lr(lr: LogisticRegression, x: pd.DataFrame, y: pd.Series) -> None:
+    # Та же задача на всём окне, что и при полном обучении, но lbfgs стартует с прежних весов
+    _ = lr.set_params(warm_start=True).fit(x, y)
+    _ = lr.set_params(warm_start=False)
+
+
+def update_ensemble_model(
+    df: pd.DataFrame,
+    symbol: str,
+    features: list[str] = FEATURE_COLUMNS,
+    n_jobs: int = -1,
+    full: bool = False,
+    interval: str = INTERVAL,  # bars of df; must match the model's
+    model_dir: str = MODEL_DIR,
+    predictions_dir: str = PREDICTIONS_DIR,
+) -> dict:
+    target = "target"
+    started = time.perf_counter()
+    report = {"symbol": symbol, "mode": "incremental", "new_rows": 0, "reasons": ""}
+
+    with instrumented_run("update_ensemble_model", symbol=symbol):
+        reasons = ["forced"] if full else [] if list_versions(symbol, model_dir) else ["no_model"]
+        if not reasons:
+            with timer("load_artifact"):
+                ensemble, meta = load_artifact(artifact_path(symbol, model_dir=model_dir))
+            # Минутные свечи после train_end часовой модели — не «новые данные» для неё
+            if meta.get("interval", INTERVAL) != interval:
+                raise ValueError(
+                    f"{symbol}: model trained on {meta.get('interval', INTERVAL)} bars, "
+                    f"got {interval} candles"
+                )
+            if meta["features"] != features or meta["target"] != target:
+                reasons.append("features_changed")
+
+        if not reasons:
+            # Последним TARGET_HORIZON свечам ещё не хватает будущего — их таргет не настоящий
+            labeled = df.iloc[:-TARGET_HORIZON]
+            new = labeled.loc[labeled.index > pd.Timestamp(meta["train_end"])]
+            report["new_rows"] = len(new)
+            count("rows_new", len(new))
+            if new.empty:
+                report["mode"] = "up_to_date"
+                report["seconds"] = time.perf_counter() - started
+                return report
+
+            state = incremental_state(ensemble, meta)
+            x_new, y_new = new[features].astype(float), new[target].astype(int)
+            with timer("score_new"):
+                # До обновления новые свечи — честный out-of-sample для проверки дрейфа
+                y_pred, probs = predict_ensemble(ensemble, x_new)
+            state["oos_loss_sum"] += float(log_loss(y_new, probs, labels=[0, 1])) * len(new)
+            state["oos_rows"] += len(new)
+            report["oos_logloss"] = state["oos_loss_sum"] / state["oos_rows"]
+            report["new_accuracy"] = accuracy_score(y_new, y_pred)
+
+            # Новым деревьям — доля, пропорциональная доле новых данных, но не меньше одного
+            share = len(new) / state["base_rows"]
+            rounds = max(1, round(state["base_rounds"] * share))
+            n_trees = len(ensemble.named_estimators_["rf"].estimators_)
+            trees = max(1, round(n_trees * share))
+            recent = labeled.iloc[-max(RECENT_BARS, len(new)) :]
+            with timer("drift_checks"):
+                reasons = full_retrain_reasons(ensemble, state, labeled, recent, rounds, trees)
+
+        if reasons:
+            report["mode"], report["reasons"] = "full", ",".join(reasons)
+            print(f"[!] {symbol}: full retrain ({report['reasons']})")
+            train_ensemble_model(df, symbol, features, n_jobs, model_dir, predictions_dir, interval)
+            report["seconds"] = time.perf_counter() - started
+            return report
+
+        x_recent, y_recent = recent[features].astype(float), recent[target].astype(int)
+        models = ensemble.named_estimators_
+        with timer("xgb_boost"):
+            xgb = boost_xgb(models["xgb"], x_recent, y_recent, rounds, n_jobs)
+            ensemble.estimators_[ensemble.estimators_.index(models["xgb"])] = xgb
+            models["xgb"] = xgb
+        with timer("rf_rotate"):
+            rotate_forest(models["rf"], x_recent, y_recent, trees, n_jobs)
+        with timer("lr_warm_start"):
+            refit_lr(models["lr"], labeled[features].astype(float), labeled[target].astype(int))
+
+        state["updates"] += 1
+        state["rotated_trees"] += trees
+        with timer("save_artifact"):
+            _ = save_artifact(ensemble, symbol, labeled, features, target, model_dir, extra=state)
+
+        # Прогнозы обновлённой модели — то же окно после полного обучения, что и у полного пути,
+        # плюс новые свечи: бэктесты и paper trading читают именно этот файл
+        window = df.loc[df.index > pd.Timestamp(state["base_train_end"])]
+        y_pred, probs = predict_ensemble(ensemble, window[features].astype(float))
+        _ = save_predictions(window, y_pred, probs, symbol, predictions_dir)
+
+    report |= {"xgb_rounds": rounds, "rf_trees": trees, "updates": state["updates"]}
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Update saved ensembles with new candles")
+    parser.add_argument("--symbols", nargs="+", default=None, help="default: every cached one")
+    parser.add_argument("--full", action="store_true", help="full retrain regardless of drift")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--interval", default=INTERVAL, help="for symbols without a model")
+    args = parser.parse_args()
+
+    rows = []
+    for symbol in sorted({entry_symbol(entry_dir) for entry_dir in cached_entries()}):
+        if args.symbols is not None and symbol not in args.symbols:
+            continue
+        # Одна запись на символ — того интервала, на котором обучена его модель
+        interval = model_interval(symbol) or args.interval
+        entry_dir = symbol_entries(interval=interval).get(symbol)
+        if entry_dir is None:
+            print(f"[!] {symbol}: no {interval} cache entry for its model, skipped")
+            continue
+        features_df = read_features(entry_dir)
+        rows.append(
+            update_ensemble_model(
+                features_df, symbol, n_jobs=args.n_jobs, full=args.full, interval=interval
+            )
+        )
+
+    print("\n=== Incremental model updates ===")
+    print(pd.DataFrame(rows).to_string(index=False, float_format="{:.3f}".format))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import hashlib
+import json
+from datetime import UTC, datetime
+from pathlib import Path
+
+import joblib
+import pandas as pd
+import sklearn
+import xgboost
+from sklearn.ensemble import VotingClassifier
+
+# Constants
+MODEL_DIR = "crypto/models"  # <models>/<symbol>/<version>/{model.joblib, meta.json}
+LATEST_FILE = "LATEST"  # plain-text pointer to the newest version (no symlinks needed)
+
+
+def data_hash(train_df: pd.DataFrame) -> str:
+    # Хэш самих обучающих строк — совпадает, только если модель видела те же данные
+    row_hashes = pd.util.hash_pandas_object(train_df, index=True).to_numpy()
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()[:16]
+
+
+def save_artifact(
+    ensemble: VotingClassifier,
+    symbol: str,
+    train_df: pd.DataFrame,
+    features: list[str],
+    target: str = "target",
+    model_dir: str = MODEL_DIR,
+    extra: dict | None = None,
+) -> Path:
+    created_at = datetime.now(UTC)
+    # Микросекунды — два обновления за одну секунду не делят версию; если всё же совпали,
+    # mkdir падает, а не перезаписывает уже сохранённую модель
+    version = created_at.strftime("%Y%m%dT%H%M%S%fZ")
+    artifact_dir = Path(model_dir) / symbol / version
+    artifact_dir.mkdir(parents=True)
+
+    _ = joblib.dump(ensemble, artifact_dir / "model.joblib")
+    meta = {
+        "symbol": symbol,
+        "version": version,
+        "created_at": created_at.isoformat(),
+        "features": features,
+        "target": target,
+        "train_start": str(train_df.index[0]),
+        "train_end": str(train_df.index[-1]),
+        "train_rows": len(train_df),
+        "data_hash": data_hash(train_df[[*features, target]]),
+        "models": [name for name, _ in ensemble.estimators],
+        "sklearn_version": sklearn.__version__,
+        "xgboost_version": xgboost.__version__,
+        **(extra or {}),  # метрики и состояние инкрементальных обновлений
+    }
+    (artifact_dir / "meta.json").write_text(json.dumps(meta, indent=2))
+    (Path(model_dir) / symbol / LATEST_FILE).write_text(version)
+
+    print(f"[✓] Saved model artifact {symbol}/{version} to {artifact_dir}")
+    return artifact_dir
+
+
+def list_versions(symbol: str, model_dir: str = MODEL_DIR) -> list[str]:
+    return sorted(path.parent.name for path in (Path(model_dir) / symbol).glob("*/meta.json"))
+
+
+def artifact_path(symbol: str, version: str | None = None, model_dir: str = MODEL_DIR) -> Path:
+    symbol_dir = Path(model_dir) / symbol
+    if version is None:
+        version = (symbol_dir / LATEST_FILE).read_text().strip()
+    return symbol_dir / version
+
+
+def load_artifact(artifact_dir: Path) -> tuple[VotingClassifier, dict]:
+    meta = json.loads((artifact_dir / "meta.json").read_text())
+    return joblib.load(artifact_dir / "model.joblib"), meta
@@ -0,0 +1,78 @@
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from crypto.processed.feature_cache import cached_entries, read_features
+from crypto.strategies.ensemble_crypto_strategy import predict_ensemble
+from crypto.strategies.model_store import artifact_path, load_artifact
+
+# Constants
+BENCHMARK_BATCH_SIZES = (1, 24, 1000)
+BENCHMARK_REPEATS = 200
+
+
+class ModelScorer:
+    # Модель грузится один раз; дальше score() — только инференс
+
+    def __init__(self, artifact_dir: Path, n_jobs: int = 1) -> None:
+        self.ensemble, self.meta = load_artifact(artifact_dir)
+        self.features: list[str] = self.meta["features"]
+
+        # For a handful of rows the RF/XGB thread pools cost more than the prediction itself
+        for model in self.ensemble.estimators_:
+            if "n_jobs" in model.get_params():
+                _ = model.set_params(n_jobs=n_jobs)
+
+    @classmethod
+    def latest(cls, symbol: str, n_jobs: int = 1) -> "ModelScorer":
+        return cls(artifact_path(symbol), n_jobs)
+
+    def score(self, rows: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+        return predict_ensemble(self.ensemble, rows[self.features].astype(float))
+
+
+def benchmark_scoring(
+    scorer: ModelScorer,
+    rows: pd.DataFrame,
+    batch_sizes: tuple[int, ...] = BENCHMARK_BATCH_SIZES,
+    repeats: int = BENCHMARK_REPEATS,
+) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    results = []
+
+    for batch_size in batch_sizes:
+        batch_size = min(batch_size, len(rows))
+        latencies = np.empty(repeats)
+        _ = scorer.score(rows.iloc[:batch_size])  # прогрев
+
+        for k in range(repeats):
+            start = int(rng.integers(0, len(rows) - batch_size + 1))
+            batch = rows.iloc[start : start + batch_size]
+            started = time.perf_counter()
+            _ = scorer.score(batch)
+            latencies[k] = time.perf_counter() - started
+
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        results.append(
+            {
+                "batch_size": batch_size,
+                "batch_p50_ms": p50,
+                "batch_p99_ms": p99,
+                "row_p50_ms": p50 / batch_size,
+                "row_p99_ms": p99 / batch_size,
+            }
+        )
+
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    for entry_dir in cached_entries():
+        symbol = entry_dir.name.split("_")[0]
+        scorer = ModelScorer.latest(symbol)
+        report = benchmark_scoring(scorer, read_features(entry_dir))
+
+        print(f"\n=== {symbol} — Scoring latency ({scorer.meta['version']}) ===")
+        print(report.to_string(index=False, float_format="{:.3f}".format))
@@ -1,14 +1,15 @@
 from typing import Any, cast
 
 import matplotlib.pyplot as plt
-import pandas as pd
 import seaborn as sns
 
+from crypto.backtest.trade_log import read_trades
+
 # Путь к файлу с результатами бэктеста
 csv_path = "crypto/processed/BTCUSDT_backtest_full_risk.csv"
 
-# Загружаем данные
-backtest_data = pd.read_csv(csv_path, parse_dates=["entry_time", "exit_time"])
+# Загружаем только нужные колонки; пик и просадка уже посчитаны бэктестером
+backtest_data = read_trades(csv_path, ["exit_time", "balance", "drawdown", "pnl_pct", "reason"])
 
 # === 1. Equity Curve ===
 _ = plt.figure(figsize=(12, 5))
@@ -25,10 +26,6 @@ _ = plt.tight_layout()
 _ = plt.show()
 
 # === 2. Max Drawdown ===
-backtest_data["peak"] = backtest_data["balance"].cummax()
-backtest_data["drawdown"] = (backtest_data["balance"] - backtest_data["peak"]) / backtest_data[
-    "peak"
-]
 max_dd = backtest_data["drawdown"].min()
 
 print(f"\n📉 Max Drawdown: {max_dd:.2%}\n")
@@ -0,0 +1,280 @@
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, fields
+
+import numpy as np
+import pandas as pd
+
+from crypto.artifacts import PREDICTIONS, read_frame
+from crypto.backtest.engine import price_arrays
+from crypto.shared_arrays import SharedArrays, attach_arrays, shared_arrays
+from crypto.strategies.trailhawk_24.run_strategy import (
+    TrailhawkParams,
+    net_returns,
+    simulate_trailhawk,
+)
+from crypto.strategies.walk_forward import TEST_BARS
+
+# Constants
+# name → (low, high, scale): "int" / "linear" / "log" — uniform on that scale;
+# "quantile" — uniform over quantile levels of the in-sample column in QUANTILE_COLUMNS
+SEARCH_SPACE = {
+    "hold": (4, 96, "int"),
+    "min_prob": (0.5, 0.75, "linear"),
+    "vol_threshold": (0.05, 0.95, "quantile"),  # volatility is a std of close in USD
+    "tp_mult": (0.5, 4.0, "linear"),
+    "sl_mult": (0.5, 4.0, "linear"),
+    "trail_mult": (0.2, 2.5, "linear"),
+    "trail_activation": (0.002, 0.05, "log"),
+    "rsi_overbought": (55, 90, "int"),
+}
+QUANTILE_COLUMNS = {"vol_threshold": "volatility"}
+ETA = 3  # keep the best 1/ETA of candidates per rung, give survivors ETA × more data
+N_BLOCKS = 27  # in-sample split into ETA**3 time blocks — the unit of data budget
+N_CANDIDATES = 2187  # ETA**7 random configs in the widest bracket
+MIN_TRADES_PER_BLOCK = 0.5  # fewer trades than this per evaluated block → config rejected
+DRAWDOWN_WEIGHT = 1.0  # objective = log growth + DRAWDOWN_WEIGHT × log(1 + max drawdown)
+IN_SAMPLE_FRACTION = 0.7  # the rest is walk-forward validation, never seen by the search
+TOP_CONFIGS = 10
+
+
+def sample_params(
+    n: int, rng: np.random.Generator, reference: dict[str, np.ndarray]
+) -> list[TrailhawkParams]:
+    columns = {}
+    for name, (low, high, scale) in SEARCH_SPACE.items():
+        if scale == "quantile":
+            levels = rng.uniform(low, high, size=n)
+            columns[name] = np.nanquantile(reference[QUANTILE_COLUMNS[name]], levels).tolist()
+        elif scale == "int":
+            columns[name] = rng.integers(low, high + 1, size=n).tolist()
+        elif scale == "log":
+            columns[name] = np.exp(rng.uniform(np.log(low), np.log(high), size=n)).tolist()
+        else:
+            columns[name] = rng.uniform(low, high, size=n).tolist()
+    return [TrailhawkParams(**dict(zip(columns, values))) for values in zip(*columns.values())]
+
+
+def block_ranges(start: int, end: int, n_blocks: int) -> list[tuple[int, int]]:
+    edges = np.linspace(start, end, n_blocks + 1).astype(int)
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+
+def rung_blocks(n_blocks: int, budget: int) -> list[int]:
+    # Блоки равномерно по всей истории — даже малый бюджет видит разные режимы рынка.
+    # Ранги вложены: блоки ранга r входят в ранг r + 1, их результаты переиспользуются
+    stride = n_blocks // budget
+    return list(range(stride // 2, n_blocks, stride))[:budget]
+
+
+def objective(pnl: np.ndarray, n_blocks: int) -> float:
+    if len(pnl) < MIN_TRADES_PER_BLOCK * n_blocks:
+        return -math.inf
+    equity = np.cumprod(1 + pnl)
+    max_drawdown = min((equity / np.maximum.accumulate(equity)).min(), 1.0) - 1
+    if equity[-1] <= 0 or max_drawdown <= -1:
+        return -math.inf
+    return float(np.log(equity[-1]) + DRAWDOWN_WEIGHT * np.log1p(max_drawdown))
+
+
+_worker_arrays: dict[str, np.ndarray] | None = None
+
+
+def _init_worker(shared: SharedArrays) -> None:
+    # Одна копия массивов в shared memory на все воркеры, в каждом — zero-copy view
+    global _worker_arrays
+    _worker_arrays = attach_arrays(shared)
+
+
+def evaluate_ranges(
+    arrays: dict[str, np.ndarray], params: TrailhawkParams, ranges: list[tuple[int, int]]
+) -> list[np.ndarray]:
+    # Каждый блок — самостоятельный бэктест: сделки не выходят за его границу
+    results = []
+    for lo, hi in ranges:
+        window = {name: values[lo:hi] for name, values in arrays.items()}
+        entries, _, exit_price_raw, _ = simulate_trailhawk(window, params)
+        _, _, pnl_pct = net_returns(window["close"][entries], exit_price_raw)
+        results.append(pnl_pct)
+    return results
+
+
+def _evaluate_in_worker(params: TrailhawkParams, ranges: list[tuple[int, int]]) -> list[np.ndarray]:
+    assert _worker_arrays is not None
+    return evaluate_ranges(_worker_arrays, params, ranges)
+
+
+def successive_halving(
+    pool: ProcessPoolExecutor,
+    candidates: list[TrailhawkParams],
+    ranges: list[tuple[int, int]],
+    min_budget: int,
+    workers: int,
+    eta: int = ETA,
+) -> pd.DataFrame:
+    cache: dict[tuple[int, int], np.ndarray] = {}  # (candidate, block) → pnl сделок блока
+    alive = list(range(len(candidates)))
+    budget = min_budget
+    rows = []
+
+    while True:
+        blocks = rung_blocks(len(ranges), budget)
+        todo = [(k, [b for b in blocks if (k, b) not in cache]) for k in alive]
+        chunks = pool.map(
+            _evaluate_in_worker,
+            [candidates[k] for k, _ in todo],
+            [[ranges[b] for b in missing] for _, missing in todo],
+            chunksize=max(1, len(todo) // (4 * workers)),
+        )
+        for (k, missing), results in zip(todo, chunks):
+            cache.update({(k, b): pnl for b, pnl in zip(missing, results)})
+
+        scores = {
+            k: objective(np.concatenate([cache[k, b] for b in blocks]), len(blocks))
+            for k in alive
+        }
+        rows += [{"candidate": k, "blocks": len(blocks), "score": scores[k]} for k in alive]
+
+        if budget >= len(ranges) or len(alive) <= 1:
+            break
+        keep = max(1, len(alive) // eta)
+        alive = sorted(alive, key=lambda k: scores[k], reverse=True)[:keep]
+        budget = min(budget * eta, len(ranges))
+
+    return pd.DataFrame(rows)
+
+
+def hyperband(
+    pool: ProcessPoolExecutor,
+    workers: int,
+    ranges: list[tuple[int, int]],
+    reference: dict[str, np.ndarray],
+    n_candidates: int = N_CANDIDATES,
+    eta: int = ETA,
+    seed: int = 0,
+    brackets: int | None = None,
+) -> tuple[list[TrailhawkParams], pd.DataFrame]:
+    # Брекеты от «много конфигов на малом бюджете» до «мало конфигов на всех данных»
+    rng = np.random.default_rng(seed)
+    s_max = round(math.log(len(ranges), eta))
+    candidates: list[TrailhawkParams] = []
+    history = []
+
+    for bracket, s in enumerate(range(s_max, -1, -1)):
+        if brackets is not None and bracket >= brackets:
+            break
+        # Классическая раскладка Hyperband: каждый брекет тратит примерно одинаковый бюджет
+        n = max(1, math.ceil(n_candidates / eta ** (s_max - s) * (s_max + 1) / (s + 1)))
+        bracket_candidates = sample_params(n, rng, reference)
+        started = time.perf_counter()
+        min_budget = len(ranges) // eta**s
+        rungs = successive_halving(pool, bracket_candidates, ranges, min_budget, workers, eta)
+        rungs["candidate"] += len(candidates)
+        rungs["bracket"] = bracket
+        history.append(rungs)
+        candidates += bracket_candidates
+        print(
+            f"[+] Bracket {bracket}: {n} configs from {len(ranges) // eta**s} blocks, "
+            f"{len(rungs)} evaluations in {time.perf_counter() - started:.1f}s"
+        )
+
+    return candidates, pd.concat(history, ignore_index=True)
+
+
+def walk_forward_scores(
+    arrays: dict[str, np.ndarray], params: TrailhawkParams, start: int, window: int = TEST_BARS
+) -> list[float]:
+    # Конфиг зафиксирован по in-sample; дальше — подряд идущие невиданные окна
+    end = len(arrays["close"])
+    ranges = block_ranges(start, end, max(1, (end - start) // window))
+    return [
+        float(np.log(np.prod(1 + pnl))) if len(pnl) and np.prod(1 + pnl) > 0 else 0.0
+        for pnl in evaluate_ranges(arrays, params, ranges)
+    ]
+
+
+def optimize_trailhawk(
+    price_data: pd.DataFrame,
+    n_candidates: int = N_CANDIDATES,
+    workers: int | None = None,
+    seed: int = 0,
+    brackets: int | None = None,
+    top: int = TOP_CONFIGS,
+) -> pd.DataFrame:
+    price_data = price_data.copy()
+    price_data["volatility"] = price_data["close"].rolling(window=10).std()
+    arrays = price_arrays(price_data)
+
+    split = int(len(price_data) * IN_SAMPLE_FRACTION)
+    ranges = block_ranges(0, split, N_BLOCKS)
+    # Пороги по квантилям — только из in-sample, валидация их не подсказывает
+    reference = {
+        column: price_data[column].to_numpy(dtype=float)[:split]
+        for column in set(QUANTILE_COLUMNS.values())
+    }
+    workers = workers or os.cpu_count() or 1
+
+    with shared_arrays(arrays) as shared:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(shared,)
+        ) as pool:
+            candidates, history = hyperband(
+                pool, workers, ranges, reference, n_candidates, ETA, seed, brackets
+            )
+
+    # Лучшие — только среди доживших до полного in-sample бюджета
+    finals = history[history["blocks"] == len(ranges)].sort_values("score", ascending=False)
+    ranked = [
+        ("search", candidates[candidate], score)
+        for candidate, score in zip(finals["candidate"].head(top), finals["score"].head(top))
+    ]
+    # Текущие параметры — точка отсчёта, с той же оценкой на тех же блоках
+    baseline = TrailhawkParams()
+    baseline_pnl = np.concatenate(evaluate_ranges(arrays, baseline, ranges))
+    ranked.append(("baseline", baseline, objective(baseline_pnl, len(ranges))))
+
+    rows = []
+    for source, params, score in ranked:
+        folds = walk_forward_scores(arrays, params, split)
+        rows.append(
+            {
+                "source": source,
+                **asdict(params),
+                "in_sample": score,
+                "wf_mean": np.mean(folds),
+                "wf_worst": np.min(folds),
+                "wf_positive": np.mean(np.array(folds) > 0),
+                "wf_folds": " ".join(f"{value:+.3f}" for value in folds),
+            }
+        )
+    columns = ["source", *(f.name for f in fields(TrailhawkParams))]
+    columns += ["in_sample", "wf_mean", "wf_worst", "wf_positive", "wf_folds"]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Hyperband search over trailhawk parameters")
+    parser.add_argument("--path", default="crypto/processed/BTCUSDT_predictions.csv")
+    parser.add_argument("--candidates", type=int, default=N_CANDIDATES)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--brackets", type=int, default=None, help="only the first N brackets")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    price_data = read_frame(args.path, PREDICTIONS)
+    report = optimize_trailhawk(price_data, args.candidates, args.workers, args.seed, args.brackets)
+
+    out_path = "crypto/processed/BTCUSDT_optimizer_results.csv"
+    report.to_csv(out_path, index=False)
+    print("\n=== BTCUSDT — Trailhawk parameter search (Hyperband) ===")
+    print(report.drop(columns="wf_folds").to_string(index=False, float_format="{:.4f}".format))
+    print(f"Elapsed: {time.perf_counter() - started:.1f}s")
+    print(f"[✓] Saved top configs to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import argparse
+import asyncio
+import csv
+import math
+import statistics
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TextIO
+
+import numpy as np
+import pandas as pd
+
+from crypto.artifacts import KLINES, read_frame
+from crypto.data.candle_feed import Candle, binance_kline_feed, replay_feed
+from crypto.data.get_binance_data import INTERVAL_MS
+from crypto.data.kline_store import STORE_DIR, read_klines
+from crypto.processed.streaming_indicators import StreamingIndicators
+from crypto.strategies.ensemble_crypto_strategy import row_scorer
+from crypto.strategies.model_store import artifact_path, load_artifact
+from crypto.strategies.trailhawk_24.run_strategy import (
+    COMMISSION,
+    RSI_OVERBOUGHT,
+    START_BALANCE,
+    STOP_LOSS_MULT,
+    TAKE_PROFIT_MULT,
+    TRAIL_ACTIVATION_THRESHOLD,
+    TRAIL_MULT,
+)
+
+# Constants
+SYMBOL = "BTCUSDT"
+INTERVAL = "1h"
+HOLD = 24  # same defaults as run_btc_backtest
+MIN_PROB = 0.52
+VOL_THRESHOLD = 0.0007
+LATENCY_WINDOW = 1_000  # decisions kept for latency percentiles — bounded, no growth over weeks
+STATUS_EVERY = 24  # bars between status lines
+REPLAY_WARMUP = 500  # bars of a replayed CSV used only to warm up the features
+PAPER_DIR = "crypto/processed"  # <dir>/<symbol>_paper_fills.csv, <symbol>_paper_balance.csv
+
+
+@dataclass
+class Position:
+    entry_time: int
+    entry_price: float
+    tp: float
+    sl: float
+    trail_offset: float
+    bars: int = 0
+    trail_active: bool = False
+    best_close: float = -math.inf
+
+    def update(self, candle: Candle) -> tuple[float, str] | None:
+        # Тот же порядок, что resolve_trailhawk_exits: трейл (после активации) → TP → SL
+        self.bars += 1
+        if (candle.high - self.entry_price) / self.entry_price >= TRAIL_ACTIVATION_THRESHOLD:
+            self.trail_active = True
+        if self.trail_active:
+            self.best_close = max(self.best_close, candle.close)
+            trail = self.best_close - self.trail_offset
+            if candle.low <= trail:
+                return trail, "trail"
+        if candle.high >= self.tp:
+            return self.tp, "tp"
+        if candle.low <= self.sl:
+            return self.sl, "sl"
+        return None
+
+
+@dataclass
+class PaperTrader:
+    score: Callable[[np.ndarray], tuple[int, float]]
+    engine: StreamingIndicators
+    features: list[str]
+    fills: TextIO
+    balances: TextIO
+    hold: int = HOLD
+    min_prob: float = MIN_PROB
+    vol_threshold: float = VOL_THRESHOLD
+    balance: float = START_BALANCE
+    position: Position | None = None
+    latencies: deque = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+    bars: int = 0
+    trades: int = 0
+
+    def __post_init__(self) -> None:
+        self.fill_writer = csv.writer(self.fills)
+        self.balance_writer = csv.writer(self.balances)
+
+    def on_candle(self, candle: Candle) -> None:
+        values = self.engine.update(candle.close)
+        self.bars += 1
+
+        if self.position is not None:
+            exit_fill = self.position.update(candle)
+            if exit_fill is None and self.position.bars >= self.hold:
+                exit_fill = (candle.close, "timeout")
+            if exit_fill is not None:
+                self._close(candle, *exit_fill)
+
+        # Одна позиция на всю сумму; сигнал ищем и на свече, где позиция закрылась
+        if self.position is None:
+            self._maybe_enter(candle, values)
+
+        self.latencies.append(time.perf_counter() - candle.received)
+        _ = self.balance_writer.writerow(
+            [
+                candle.open_time,
+                candle.close,
+                f"{self.equity(candle.close):.2f}",
+                int(self.position is not None),
+            ]
+        )
+        if self.bars % STATUS_EVERY == 0:
+            self.print_status(candle)
+
+    def _maybe_enter(self, candle: Candle, values: dict[str, float]) -> None:
+        row = np.array([values[name] for name in self.features])
+        if not np.isfinite(row).all():
+            return  # прогрев окон ещё не закончен — модель таких строк не видела
+        # Правила smart_filter без модели — сначала; модель зовём, только если они пропустили
+        close, std = candle.close, values["volatility"]
+        if (
+            values["rsi"] >= RSI_OVERBOUGHT
+            or values["ema20"] <= values["ema50"]
+            or std < self.vol_threshold
+            or (close + std * TAKE_PROFIT_MULT - close) / close < COMMISSION * 2
+        ):
+            return
+
+        prediction, prob = self.score(row)
+        if prediction != 1 or prob < self.min_prob:
+            return
+
+        self.position = Position(
+            entry_time=candle.open_time,
+            entry_price=close,
+            tp=close + std * TAKE_PROFIT_MULT,
+            sl=close - std * STOP_LOSS_MULT,
+            trail_offset=std * TRAIL_MULT,
+        )
+        _ = self.fill_writer.writerow(
+            [
+                candle.open_time,
+                "buy",
+                close,
+                close * (1 + COMMISSION),
+                "",
+                "",
+                f"{self.balance:.2f}",
+                f"{prob:.4f}",
+            ]
+        )
+        self.fills.flush()
+
+    def _close(self, candle: Candle, price: float, reason: str) -> None:
+        assert self.position is not None
+        entry_with_fee = self.position.entry_price * (1 + COMMISSION)
+        exit_with_fee = price * (1 - COMMISSION)
+        pnl_pct = (exit_with_fee - entry_with_fee) / entry_with_fee
+        self.balance += self.balance * pnl_pct
+        self.position = None
+        self.trades += 1
+
+        _ = self.fill_writer.writerow(
+            [
+                candle.open_time,
+                "sell",
+                price,
+                exit_with_fee,
+                reason,
+                f"{pnl_pct:.6f}",
+                f"{self.balance:.2f}",
+                "",
+            ]
+        )
+        self.fills.flush()
+        print(
+            f"[✓] {pd.to_datetime(candle.open_time, unit='ms')} sell ({reason}) "
+            f"pnl {pnl_pct:+.2%} → balance ${self.balance:.2f}"
+        )
+
+    def equity(self, close: float) -> float:
+        if self.position is None:
+            return self.balance
+        entry_with_fee = self.position.entry_price * (1 + COMMISSION)
+        return self.balance * close * (1 - COMMISSION) / entry_with_fee
+
+    def latency_ms(self) -> tuple[float, float, float]:
+        latencies = sorted(self.latencies)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        return statistics.median(latencies) * 1000, p99 * 1000, latencies[-1] * 1000
+
+    def print_status(self, candle: Candle) -> None:
+        p50, p99, worst = self.latency_ms()
+        self.balances.flush()
+        print(
+            f"[+] {pd.to_datetime(candle.open_time, unit='ms')} | bars {self.bars} | "
+            f"trades {self.trades} | equity ${self.equity(candle.close):.2f} | "
+            f"latency p50 {p50:.2f} ms, p99 {p99:.2f} ms, max {worst:.2f} ms"
+        )
+
+
+def _open_log(path: Path, header: list[str]) -> TextIO:
+    exists = path.exists()
+    log = path.open("a", newline="")
+    if not exists:
+        _ = csv.writer(log).writerow(header)
+    return log
+
+
+async def run_paper_trading(
+    feed: AsyncIterator[Candle],
+    engine: StreamingIndicators,
+    symbol: str = SYMBOL,
+    output_dir: str = PAPER_DIR,
+    score: Callable[[np.ndarray], tuple[int, float]] | None = None,
+    features: list[str] | None = None,
+) -> PaperTrader:
+    if score is None or features is None:
+        ensemble, meta = load_artifact(artifact_path(symbol))
+        score, features = row_scorer(ensemble), meta["features"]
+
+    fills = _open_log(
+        Path(output_dir) / f"{symbol}_paper_fills.csv",
+        ["time", "side", "price", "price_with_fee", "reason", "pnl_pct", "balance", "prob"],
+    )
+    balances = _open_log(
+        Path(output_dir) / f"{symbol}_paper_balance.csv",
+        ["time", "close", "equity", "in_position"],
+    )
+    trader = PaperTrader(score, engine, features, fills, balances)
+    try:
+        async for candle in feed:
+            trader.on_candle(candle)
+    finally:
+        fills.close()
+        balances.close()
+
+    print(f"\n=== {symbol} — Paper Trading ===")
+    print(f"Bars: {trader.bars} | trades: {trader.trades}")
+    print(f"Final balance: ${trader.balance:.2f}")
+    print(f"Total return: {(trader.balance / START_BALANCE - 1):.2%}")
+    if trader.latencies:
+        p50, p99, worst = trader.latency_ms()
+        print(f"Decision latency: p50 {p50:.2f} ms, p99 {p99:.2f} ms, max {worst:.2f} ms")
+    return trader
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Paper-trade trailhawk on closed live candles")
+    parser.add_argument("--symbol", default=SYMBOL)
+    parser.add_argument("--interval", default=INTERVAL)
+    parser.add_argument("--replay", help="OHLCV CSV to replay instead of the Binance socket")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds between replay bars")
+    args = parser.parse_args()
+
+    if args.replay:
+        price_df = read_frame(args.replay, KLINES)
+        engine = StreamingIndicators.from_history(price_df["close"].to_numpy()[:REPLAY_WARMUP])
+        feed = replay_feed(price_df.iloc[REPLAY_WARMUP:], args.delay)
+    else:
+        # Прогрев по всей истории из хранилища — то же состояние, что у batch-признаков
+        records = read_klines(args.symbol, args.interval, store_dir=STORE_DIR)
+        if len(records) == 0:
+            raise FileNotFoundError(f"No stored {args.symbol} {args.interval} candles to warm up")
+        engine = StreamingIndicators.from_history(records["close"])
+        last_open_time = int(records["open_time"][-1])
+        print(
+            f"[+] Warmed up on {len(records)} candles, next expected at "
+            f"{pd.to_datetime(last_open_time + INTERVAL_MS[args.interval], unit='ms')}"
+        )
+        feed = binance_kline_feed(args.symbol, args.interval, last_open_time)
+
+    _ = asyncio.run(run_paper_trading(feed, engine, args.symbol))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,14 @@
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
-import pandas as pd
 
+from crypto.backtest.trade_log import equity_columns, read_trades, trade_returns
 
-def plot_equity_curve(csv_path: str) -> None:
-    equity_data = pd.read_csv(csv_path, parse_dates=["entry_time", "exit_time"])
 
-    equity_data = equity_data.sort_values("exit_time")
-    equity_data["equity"] = (1 + equity_data["pnl"]).cumprod()
-    equity_data["drawdown"] = equity_data["equity"] / equity_data["equity"].cummax() - 1
+def plot_equity_curve(csv_path: str) -> None:
+    # В логе equity посчитана по порядку входа; ось X — время выхода, поэтому пересчитываем
+    # кривую в порядке выхода, иначе линия скачет назад по времени
+    equity_data = read_trades(csv_path).sort_values("exit_time")
+    equity_data = equity_data.assign(**equity_columns(trade_returns(equity_data)))
 
     smoothed = equity_data["equity"].rolling(window=5, min_periods=1).mean()
 
@@ -1,114 +1,134 @@
+from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 
+from crypto.artifacts import PREDICTIONS, TRADES, read_frame, write_frame
+from crypto.backtest.engine import (
+    REASONS,
+    compound_balance,
+    entry_indices,
+    price_arrays,
+    resolve_trailhawk_exits,
+    smart_filter,
+)
+from crypto.instrumentation import count, count_filter, count_values, instrumented_run, timer
+
 # Constants
 TRAIL_ACTIVATION_THRESHOLD = 0.012  # 1.2% price increase to activate trailing stop
 RSI_OVERBOUGHT = 70  # RSI level considered overbought
 COMMISSION = 0.0005  # 0.05% commission on entry and exit
 START_BALANCE = 10_000.0  # Starting demo balance
+TAKE_PROFIT_MULT = 1.5  # TP distance in volatility units
+STOP_LOSS_MULT = 2.0  # SL distance in volatility units
+TRAIL_MULT = 0.8  # Trailing stop distance below close in volatility units
 
 
-def run_btc_backtest(
-    path: str = "crypto/processed/BTCUSDT_predictions.csv",
-    hold: int = 24,
-    min_prob: float = 0.52,
-    vol_threshold: float = 0.0007,
-) -> None:
-    price_data = pd.read_csv(path, index_col=0, parse_dates=True)
-    trades = []
-    balance = START_BALANCE
-
-    price_data["volatility"] = price_data["close"].rolling(window=10).std()
-
-    for i in range(len(price_data) - hold - 1):
-        row = price_data.iloc[i]
+@dataclass(frozen=True)
+class TrailhawkParams:
+    hold: int = 24
+    min_prob: float = 0.52
+    vol_threshold: float = 0.0007
+    tp_mult: float = TAKE_PROFIT_MULT
+    sl_mult: float = STOP_LOSS_MULT
+    trail_mult: float = TRAIL_MULT
+    trail_activation: float = TRAIL_ACTIVATION_THRESHOLD
+    rsi_overbought: float = RSI_OVERBOUGHT
 
-        if (
-            row["prediction"] != 1
-            or row["prediction_prob"] < min_prob
-            or row["ema20"] <= row["ema50"]
-            or row["rsi"] >= RSI_OVERBOUGHT
-            or row["volatility"] < vol_threshold
-        ):
-            continue
 
-        entry_price_raw = row["close"]
-        std = row["volatility"]
-        tp = entry_price_raw + std * 1.5
-        sl = entry_price_raw - std * 2
+def simulate_trailhawk(
+    arrays: dict[str, np.ndarray], params: TrailhawkParams
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    with timer("entries"):
+        mask = smart_filter(arrays, params.min_prob, params.rsi_overbought, params.vol_threshold)
 
         # Пропуск сделок с низким потенциальным профитом
-        expected_profit_ratio = (tp - entry_price_raw) / entry_price_raw
-        if expected_profit_ratio < COMMISSION * 2:
-            continue
-
-        trail_active = False
-        trail_stop = None
-        reason = "timeout"
-        j = hold
-
-        for j in range(1, hold + 1):
-            future_row = price_data.iloc[i + j]
-            high = future_row["high"]
-            low = future_row["low"]
-            close = future_row["close"]
-
-            if (
-                not trail_active
-                and (high - entry_price_raw) / entry_price_raw >= TRAIL_ACTIVATION_THRESHOLD
-            ):
-                trail_active = True
-                trail_stop = close - std * 0.8
-
-            if trail_active:
-                new_trail = close - std * 0.8
-                if trail_stop is None or new_trail > trail_stop:
-                    trail_stop = new_trail
-                if low <= trail_stop:
-                    exit_price_raw = trail_stop
-                    reason = "trail"
-                    break
-
-            if high >= tp:
-                exit_price_raw = tp
-                reason = "tp"
-                break
-
-            if low <= sl:
-                exit_price_raw = sl
-                reason = "sl"
-                break
-        else:
-            exit_price_raw = price_data.iloc[i + hold]["close"]
-
-        # Комиссия на вход и выход
-        entry_price = entry_price_raw * (1 + COMMISSION)
-        exit_price = exit_price_raw * (1 - COMMISSION)
-
-        pnl_pct = (exit_price - entry_price) / entry_price
-        trade_profit = balance * pnl_pct
-        balance += trade_profit
-
-        exit_index = price_data.index[i + j] if j <= hold else price_data.index[i + hold]
-
-        trades.append(
-            {
-                "entry_time": price_data.index[i],
-                "exit_time": exit_index,
-                "entry_price": entry_price_raw,
-                "exit_price": exit_price_raw,
-                "entry_price_with_fee": entry_price,
-                "exit_price_with_fee": exit_price,
-                "pnl_pct": pnl_pct,
-                "pnl_usd": trade_profit,
-                "balance": balance,
-                "reason": reason,
-            }
+        close, std = arrays["close"], arrays["volatility"]
+        expected_profit_ratio = (close + std * params.tp_mult - close) / close
+        profitable = ~(expected_profit_ratio < COMMISSION * 2)
+        # rejected_first по второму условию — отказы среди прошедших smart_filter
+        count_filter(
+            "trailhawk_filter",
+            {"smart_filter": mask, "expected profit < 2 × commission": profitable},
+        )
+        mask &= profitable
+
+        entries = entry_indices(mask, params.hold)
+    count("entries", len(entries))
+
+    with timer("exits"):
+        exit_pos, exit_price_raw, reason = resolve_trailhawk_exits(
+            arrays,
+            entries,
+            params.hold,
+            tp_mult=params.tp_mult,
+            sl_mult=params.sl_mult,
+            trail_mult=params.trail_mult,
+            trail_activation=params.trail_activation,
         )
+    count_values("exits", REASONS[reason])
+    return entries, exit_pos, exit_price_raw, reason
+
 
-    trades_df = pd.DataFrame(trades)
+def net_returns(
+    entry_price_raw: np.ndarray, exit_price_raw: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Комиссия на вход и выход
+    entry_price = entry_price_raw * (1 + COMMISSION)
+    exit_price = exit_price_raw * (1 - COMMISSION)
+    return entry_price, exit_price, (exit_price - entry_price) / entry_price
 
-    out_path = "crypto/processed/BTCUSDT_backtest_full_risk.csv"
-    trades_df.to_csv(out_path)
+
+def backtest_trades(
+    price_data: pd.DataFrame,
+    hold: int = 24,
+    min_prob: float = 0.52,
+    vol_threshold: float = 0.0007,
+    params: TrailhawkParams | None = None,  # полный набор параметров — перекрывает три выше
+) -> pd.DataFrame:
+    params = params or TrailhawkParams(hold, min_prob, vol_threshold)
+    with timer("features"):
+        price_data = price_data.copy()
+        price_data["volatility"] = price_data["close"].rolling(window=10).std()
+        arrays = price_arrays(price_data)
+
+    entries, exit_pos, exit_price_raw, reason = simulate_trailhawk(arrays, params)
+    entry_price_raw = arrays["close"][entries]
+    entry_price, exit_price, pnl_pct = net_returns(entry_price_raw, exit_price_raw)
+    trade_profit, balance = compound_balance(pnl_pct, START_BALANCE)
+
+    return pd.DataFrame(
+        {
+            "entry_time": price_data.index[entries],
+            "exit_time": price_data.index[exit_pos],
+            "entry_price": entry_price_raw,
+            "exit_price": exit_price_raw,
+            "entry_price_with_fee": entry_price,
+            "exit_price_with_fee": exit_price,
+            "pnl_pct": pnl_pct,
+            "pnl_usd": trade_profit,
+            "balance": balance,
+            "reason": REASONS[reason],
+        }
+    )
+
+
+def run_btc_backtest(
+    path: str = "crypto/processed/BTCUSDT_predictions.csv",
+    hold: int = 24,
+    min_prob: float = 0.52,
+    vol_threshold: float = 0.0007,
+) -> None:
+    with instrumented_run("run_btc_backtest", symbol="BTCUSDT"):
+        with timer("load"):
+            price_data = read_frame(path, PREDICTIONS)
+        with timer("backtest"):
+            trades_df = backtest_trades(price_data, hold, min_prob, vol_threshold)
+        balance = trades_df["balance"].iloc[-1] if len(trades_df) else START_BALANCE
+
+        out_path = "crypto/processed/BTCUSDT_backtest_full_risk.csv"
+        with timer("save"):
+            write_frame(trades_df, out_path, TRADES)
 
     print("\n=== BTCUSDT — Backtest with Full Risk and Commission ===")
     print(f"Trades taken: {len(trades_df)}")
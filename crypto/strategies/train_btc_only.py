@@ -1,21 +1,22 @@
 from pathlib import Path
 
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier, VotingClassifier
-from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report
-from xgboost import XGBClassifier
 
-PREDICTION_THRESHOLD = 0.5
+from crypto.artifacts import PREDICTIONS, write_frame
+from crypto.processed.feature_cache import load_features
+from crypto.processed.prepare_data import FEATURE_COLUMNS
+from crypto.strategies.ensemble_crypto_strategy import fit_ensemble, predict_ensemble
+from crypto.strategies.model_store import save_artifact
 
 
 def load_btc_data() -> pd.DataFrame:
-    path = Path("crypto/processed/BTCUSDT_1h_2020-05-01_2025-05-01_features.csv")
-    return pd.read_csv(path, index_col=0, parse_dates=True)
+    path = Path("crypto/data/BTCUSDT_1h_2020-05-01_2025-05-01.csv")
+    return load_features(path)
 
 
 def train_model(df: pd.DataFrame) -> None:
-    features = ["rsi", "macd", "ema20", "ema50", "return", "volatility"]
+    features = FEATURE_COLUMNS
     target = "target"
 
     split_point = int(len(df) * 0.8)
@@ -27,17 +28,10 @@ def train_model(df: pd.DataFrame) -> None:
     x_test = test_df[features].astype(float)
     y_test = test_df[target].astype(int)
 
-    # Модели
-    xgb = XGBClassifier(use_label_encoder=False, eval_metric="logloss", verbosity=0)
-    rf = RandomForestClassifier(n_estimators=100, random_state=42)
-    lr = LogisticRegression(max_iter=1000)
-
-    _ = xgb.fit(x_train, y_train)
-    ensemble = VotingClassifier(estimators=[("xgb", xgb), ("rf", rf), ("lr", lr)], voting="hard")
-    _ = ensemble.fit(x_train, y_train)
-
-    probs = xgb.predict_proba(x_test)[:, 1]
-    y_pred = (probs >= PREDICTION_THRESHOLD).astype(int)
+    # Модели — тот же ансамбль, что в ensemble_crypto_strategy
+    ensemble = fit_ensemble(x_train, y_train)
+    y_pred, probs = predict_ensemble(ensemble, x_test)
+    _ = save_artifact(ensemble, "BTCUSDT", train_df, features, target)
 
     print("\n=== BTCUSDT — Ensemble Model Report ===")
     print(f"{classification_report(y_test, y_pred, digits=4)}")
@@ -47,7 +41,7 @@ def train_model(df: pd.DataFrame) -> None:
     test_df["prediction_prob"] = probs
 
     out_path = "crypto/processed/BTCUSDT_predictions.csv"
-    test_df.to_csv(out_path)
+    write_frame(test_df, out_path, PREDICTIONS)
     print(f"[✓] Saved to {out_path}")
 
 
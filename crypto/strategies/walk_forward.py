@@ -0,0 +1,140 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, precision_score
+
+from crypto.artifacts import PREDICTIONS, write_frame
+from crypto.instrumentation import process_peak
+from crypto.processed.feature_cache import cached_entries, read_features
+from crypto.processed.prepare_data import FEATURE_COLUMNS, TARGET_HORIZON
+from crypto.shared_arrays import SharedArrays, attach_frame, shared_frame
+from crypto.strategies.ensemble_crypto_strategy import (
+    fit_ensemble,
+    predict_ensemble,
+    thread_budget,
+)
+
+# Constants
+TRAIN_BARS = 24 * 365  # 1 year of 1h candles in the first (or every rolling) train window
+TEST_BARS = 24 * 90  # each fold predicts the next ~quarter
+EMBARGO_BARS = TARGET_HORIZON  # the last train labels look this far ahead — into the test window
+
+
+@dataclass(frozen=True)
+class Fold:
+    fold: int
+    train_start: int
+    train_end: int
+    test_start: int
+    test_end: int
+
+
+def make_folds(
+    n_rows: int,
+    train_bars: int = TRAIN_BARS,
+    test_bars: int = TEST_BARS,
+    expanding: bool = True,
+    embargo: int = EMBARGO_BARS,
+) -> list[Fold]:
+    folds = []
+    test_start = train_bars
+    while test_start < n_rows:
+        test_end = min(test_start + test_bars, n_rows)
+        train_end = test_start - embargo
+        train_start = 0 if expanding else max(test_start - train_bars, 0)
+        folds.append(Fold(len(folds), train_start, train_end, test_start, test_end))
+        test_start = test_end
+    return folds
+
+
+def _run_fold(
+    fold: Fold, shared: SharedArrays, n_jobs: int
+) -> tuple[np.ndarray, np.ndarray, dict]:
+    # Признаки и таргет — view на общую копию; фолд берёт из неё только свои строки
+    data = attach_frame(shared)
+    x, y = data[FEATURE_COLUMNS], data["target"]
+    train, test = slice(fold.train_start, fold.train_end), slice(fold.test_start, fold.test_end)
+    x_train, y_train, x_test, y_test = x.iloc[train], y.iloc[train], x.iloc[test], y.iloc[test]
+
+    started = time.perf_counter()
+    y_pred, probs = predict_ensemble(fit_ensemble(x_train, y_train, n_jobs), x_test)
+
+    report = {
+        **asdict(fold),
+        "train_rows": len(x_train),
+        "test_rows": len(x_test),
+        "seconds": time.perf_counter() - started,
+        "peak_rss_mb": process_peak() / 2**20,
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision": precision_score(y_test, y_pred, zero_division=0),
+    }
+    return y_pred, probs, report
+
+
+def walk_forward_predictions(
+    df: pd.DataFrame,
+    train_bars: int = TRAIN_BARS,
+    test_bars: int = TEST_BARS,
+    expanding: bool = True,
+    workers: int | None = None,
+    cpus: int | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    x, y = df[FEATURE_COLUMNS].astype(float), df["target"].astype(int)
+    folds = make_folds(len(df), train_bars, test_bars, expanding)
+    if not folds:
+        raise ValueError(f"Need more than {train_bars} rows for walk-forward, got {len(df)}")
+
+    # Свежий процесс на каждый фолд — иначе peak RSS одного фолда перетекает в следующий.
+    # Данные публикуются один раз, в задачу уходит только дескриптор сегмента.
+    # Ядра делятся между фолдами и потоками моделей — без переподписки
+    workers, threads = thread_budget(len(folds), cpus, workers)
+    with shared_frame(x.assign(target=y)) as shared, ProcessPoolExecutor(
+        max_workers=workers, max_tasks_per_child=1
+    ) as pool:
+        futures = [pool.submit(_run_fold, fold, shared, threads) for fold in folds]
+        results = [future.result() for future in futures]
+
+    # Склеиваем out-of-sample прогнозы всех фолдов в один непрерывный ряд
+    predicted = df.iloc[folds[0].test_start :].copy()
+    predicted["prediction"] = np.concatenate([y_pred for y_pred, _, _ in results])
+    predicted["prediction_prob"] = np.concatenate([probs for _, probs, _ in results])
+
+    return predicted, pd.DataFrame([report for _, _, report in results])
+
+
+def run_walk_forward(
+    df: pd.DataFrame,
+    symbol: str,
+    train_bars: int = TRAIN_BARS,
+    test_bars: int = TEST_BARS,
+    expanding: bool = True,
+    workers: int | None = None,
+    cpus: int | None = None,
+) -> None:
+    started = time.perf_counter()
+    predicted, folds_df = walk_forward_predictions(
+        df, train_bars, test_bars, expanding, workers, cpus
+    )
+
+    print(f"\n=== {symbol} — Walk-Forward ({'expanding' if expanding else 'rolling'}) ===")
+    columns = ["fold", "train_rows", "test_rows", "seconds", "peak_rss_mb", "accuracy", "precision"]
+    print(folds_df[columns].to_string(index=False, float_format="{:.3f}".format))
+    print(
+        f"Folds: {len(folds_df)} | covered: {predicted.index[0]} → {predicted.index[-1]} | "
+        f"wall: {time.perf_counter() - started:.1f}s | "
+        f"sum of fold time: {folds_df['seconds'].sum():.1f}s | "
+        f"max peak RSS: {folds_df['peak_rss_mb'].max():.0f} MB"
+    )
+
+    out_path = f"crypto/processed/{symbol}_predictions.csv"
+    write_frame(predicted, out_path, PREDICTIONS)
+    folds_df.to_csv(f"crypto/processed/{symbol}_walk_forward_folds.csv", index=False)
+    print(f"[✓] Saved walk-forward predictions to {out_path}")
+
+
+if __name__ == "__main__":
+    for entry_dir in cached_entries():
+        run_walk_forward(read_features(entry_dir), entry_dir.name.split("_")[0])
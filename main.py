@@ -1,6 +1,4 @@
-def main():
-    print("Hello from stock-insight-ml!")
-
+from crypto.pipeline import main
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,91 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from crypto.data.get_binance_data import INTERVAL_MS, PAGE_LIMIT
+
+
+def stub_kline(open_time: int, step: int) -> list:
+    # Детерминированная свеча: по open_time всегда одни и те же значения
+    close = 100.0 + (open_time // step) % 50
+    return [
+        open_time,
+        str(close - 0.5),
+        str(close + 1.0),
+        str(close - 1.0),
+        str(close),
+        "10.0",
+        open_time + step - 1,
+        str(close * 10),
+        7,
+        "4.0",
+        str(close * 4),
+        "0",
+    ]
+
+
+class StubBinance:
+    # Local /api/v3/klines: same params, paging and limit as the exchange, every request logged
+    def __init__(self, listed_from: int, listed_until: int) -> None:
+        self.listed_from, self.listed_until = listed_from, listed_until
+        self.requests: list[dict[str, str]] = []
+        self.lock = threading.Lock()
+        # (startTime, status, headers) — served once, in place of the page, to the first match
+        self.faults: list[tuple[int, int, dict[str, str]]] = []
+        self.broken: tuple[int, int] | None = None  # startTime in [lo, hi) → 400 every time
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                status, headers, body = stub.respond(url.path, params)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                _ = self.wfile.write(json.dumps(body).encode())
+
+            def log_message(self, *_) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/v3/klines"
+
+    def __enter__(self) -> "StubBinance":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def respond(self, path: str, params: dict[str, str]) -> tuple[int, dict[str, str], object]:
+        start = int(params.get("startTime", 0))
+        with self.lock:
+            self.requests.append(params)
+            for fault in self.faults:
+                if fault[0] == start:
+                    self.faults.remove(fault)
+                    return fault[1], fault[2], {"code": -1003, "msg": "stub fault"}
+        if path != "/api/v3/klines":
+            return 404, {}, {"code": -1, "msg": "not found"}
+        if self.broken is not None and self.broken[0] <= start < self.broken[1]:
+            return 400, {}, {"code": -1100, "msg": "stub broken range"}
+        return 200, {"X-MBX-USED-WEIGHT-1M": str(2 * len(self.requests))}, self.klines(params)
+
+    def klines(self, params: dict[str, str]) -> list[list]:
+        step = INTERVAL_MS[params["interval"]]
+        start = max(int(params["startTime"]), self.listed_from)
+        end = min(int(params.get("endTime", self.listed_until)), self.listed_until - 1)
+        first = -(-start // step) * step
+        limit = min(int(params.get("limit", 500)), PAGE_LIMIT)
+        return [stub_kline(t, step) for t in range(first, end + 1, step)[:limit]]
@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from crypto.backtest.benchmark_exits import python_loop_exits
+from crypto.backtest.engine import price_arrays, resolve_trailhawk_exits
+from crypto.strategies.trailhawk_24.run_strategy import (
+    STOP_LOSS_MULT,
+    TAKE_PROFIT_MULT,
+    TRAIL_ACTIVATION_THRESHOLD,
+    TRAIL_MULT,
+)
+
+ROWS = 2_000
+HOLDS = (1, 24, 168)
+
+
+class TrailhawkExitsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        close = 60_000 * np.exp(np.cumsum(rng.normal(0, 0.004, ROWS)))
+        price_data = pd.DataFrame(
+            {
+                "high": close * (1 + rng.uniform(0, 0.006, ROWS)),
+                "low": close * (1 - rng.uniform(0, 0.006, ROWS)),
+                "close": close,
+            }
+        )
+        price_data["volatility"] = price_data["close"].rolling(window=10).std()
+        self.arrays = price_arrays(price_data)
+        self.params = (TAKE_PROFIT_MULT, STOP_LOSS_MULT, TRAIL_MULT, TRAIL_ACTIVATION_THRESHOLD)
+
+    def test_kernel_matches_the_row_loop_trade_for_trade(self) -> None:
+        for hold in HOLDS:
+            with self.subTest(hold=hold):
+                # Каждая свеча с волатильностью — вход: все ветки выхода (trail/TP/SL/timeout)
+                volatility = self.arrays["volatility"][: ROWS - hold - 1]
+                entries = np.flatnonzero(~np.isnan(volatility))
+                expected = python_loop_exits(self.arrays, entries, hold, *self.params)
+                actual = resolve_trailhawk_exits(self.arrays, entries, hold, *self.params)
+                for name, want, got in zip(("exit_pos", "exit_price", "reason"), expected, actual):
+                    np.testing.assert_array_equal(got, want, err_msg=name)
+
+
+if __name__ == "__main__":
+    unittest.main()
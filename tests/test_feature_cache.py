@@ -0,0 +1,84 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from crypto.processed.feature_cache import (
+    OLD_SUFFIX,
+    TMP_SUFFIX,
+    cached_entries,
+    entry_dir_for,
+    read_features,
+    refresh_features,
+    symbol_entries,
+)
+
+ROWS = 400
+
+
+class FeatureCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        close = 2_000 * np.exp(np.cumsum(rng.normal(0, 0.01, ROWS)))
+        index = pd.date_range("2024-01-01", periods=ROWS, freq="h", name="open_time")
+        self.klines = pd.DataFrame(
+            {
+                "open": close,
+                "high": close * 1.004,
+                "low": close * 0.996,
+                "close": close,
+                "volume": rng.lognormal(3, 1, ROWS),
+            },
+            index=index,
+        )
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.source = Path(root.name) / "ETHUSDT_1h.csv"
+        self.cache_dir = str(Path(root.name) / "cache")
+
+    def test_appended_rows_keep_the_rebuild_dtypes(self) -> None:
+        self.klines.iloc[:300].to_csv(self.source)
+        self.assertEqual(refresh_features(self.source, self.cache_dir), "rebuild")
+        rebuilt = read_features(entry_dir_for(self.source, self.cache_dir))
+
+        self.klines.to_csv(self.source)  # тот же файл, дописанный в конец
+        self.assertEqual(refresh_features(self.source, self.cache_dir), "append")
+        appended = read_features(entry_dir_for(self.source, self.cache_dir))
+        self.assertTrue(appended.dtypes.equals(rebuilt.dtypes))
+        self.assertEqual(appended["volume"].dtype, np.float32)
+
+    def test_leftover_swap_directories_are_not_entries(self) -> None:
+        self.klines.to_csv(self.source)
+        _ = refresh_features(self.source, self.cache_dir)
+        entry_dir = entry_dir_for(self.source, self.cache_dir)
+        for suffix in (TMP_SUFFIX, OLD_SUFFIX):
+            shutil.copytree(entry_dir, entry_dir.with_name(entry_dir.name + suffix))
+        self.assertEqual(cached_entries(self.cache_dir), [entry_dir])
+
+    def test_one_entry_per_symbol(self) -> None:
+        root = self.source.parent
+        for name, rows in (
+            ("BTCUSDT_1h_2024-01-01_2024-01-10", 200),
+            ("BTCUSDT_1h_2024-01-01_2024-01-17", ROWS),
+            ("BTCUSDT_1m_2024-01-01_2024-01-02", ROWS),
+            ("ETHUSDT_1h_2024-01-01_2024-01-10", 200),
+        ):
+            self.klines.iloc[:rows].to_csv(root / f"{name}.csv")
+            _ = refresh_features(root / f"{name}.csv", self.cache_dir)
+
+        chosen = symbol_entries(self.cache_dir, "1h")
+        self.assertEqual(
+            {symbol: entry_dir.name for symbol, entry_dir in chosen.items()},
+            {
+                "BTCUSDT": "BTCUSDT_1h_2024-01-01_2024-01-17",  # самая длинная часовая история
+                "ETHUSDT": "ETHUSDT_1h_2024-01-01_2024-01-10",
+            },
+        )
+        self.assertEqual(symbol_entries(self.cache_dir, "1m")["BTCUSDT"].name.split("_")[1], "1m")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import tempfile
+import time
+import unittest
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
+
+import numpy as np
+from binance_stub import StubBinance
+
+from crypto.data.get_binance_data import (
+    INTERVAL_MS,
+    PAGE_LIMIT,
+    PAGES_PER_CHUNK,
+    _retry_after,
+    update_store_concurrent,
+)
+from crypto.data.kline_store import first_open_time, last_close_time, read_klines, to_ms
+
+MINUTE = INTERVAL_MS["1m"]
+CHUNK_MS = MINUTE * PAGE_LIMIT * PAGES_PER_CHUNK  # ~7 дней минуток на один кусок
+LISTED_FROM = to_ms("2024-01-01")
+LISTED_UNTIL = to_ms("2024-03-01")
+
+
+class RetryAfterTest(unittest.TestCase):
+    def test_seconds_and_http_date(self) -> None:
+        self.assertEqual(_retry_after("2", 9.0), 2.0)
+        ahead = format_datetime(datetime.now(UTC) + timedelta(seconds=30), usegmt=True)
+        self.assertAlmostEqual(_retry_after(ahead, 9.0), 30.0, delta=2.0)
+        past = format_datetime(datetime.now(UTC) - timedelta(seconds=30), usegmt=True)
+        self.assertEqual(_retry_after(past, 9.0), 0.0)
+        self.assertEqual(_retry_after("soon", 9.0), 9.0)
+        self.assertEqual(_retry_after(None, 9.0), 9.0)
+
+
+class ConcurrentDownloadTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.stub = StubBinance(LISTED_FROM, LISTED_UNTIL).__enter__()
+        self.addCleanup(self.stub.__exit__)
+        store = tempfile.TemporaryDirectory()
+        self.addCleanup(store.cleanup)
+        self.store_dir = store.name
+
+    def download(self, start: str, end: str, symbols: tuple[str, ...] = ("BTCUSDT",)) -> dict:
+        return update_store_concurrent(
+            list(symbols), "1m", start, end, 4, self.store_dir, self.stub.base_url
+        )
+
+    def assert_contiguous(self, symbol: str, start: str, end: str) -> None:
+        stored = read_klines(symbol, "1m", store_dir=self.store_dir)
+        self.assertEqual(stored["open_time"][0], to_ms(start))
+        self.assertEqual(stored["open_time"][-1], to_ms(end))
+        self.assertTrue((np.diff(stored["open_time"]) == MINUTE).all())
+
+    def test_429_and_418_wait_for_retry_after_and_retry(self) -> None:
+        chunk_start = LISTED_FROM + CHUNK_MS
+        date = format_datetime(datetime.now(UTC) + timedelta(seconds=1), usegmt=True)
+        self.stub.faults += [
+            (LISTED_FROM, 429, {"Retry-After": "1"}),
+            (chunk_start, 418, {"Retry-After": date}),
+        ]
+
+        started = time.perf_counter()
+        stats = self.download("2024-01-01", "2024-01-20", ("BTCUSDT", "ETHUSDT"))
+        self.assertGreaterEqual(time.perf_counter() - started, 0.9)  # блок общий для всех потоков
+
+        self.assertEqual(self.stub.faults, [])
+        self.assertEqual(sum(symbol_stats.retries for symbol_stats in stats.values()), 2)
+        self.assertEqual(
+            sum(symbol_stats.requests for symbol_stats in stats.values()), len(self.stub.requests)
+        )
+        for symbol in ("BTCUSDT", "ETHUSDT"):
+            self.assert_contiguous(symbol, "2024-01-01", "2024-01-20")
+
+    def test_failed_chunk_leaves_no_hole_and_resume_completes(self) -> None:
+        broken_start = LISTED_FROM + 2 * CHUNK_MS
+        self.stub.broken = (broken_start, broken_start + 1)
+
+        with self.assertRaises(RuntimeError):
+            _ = self.download("2024-01-01", "2024-02-01")
+        # Куски после упавшего уже скачаны, но не записаны: хранилище обрывается перед дырой
+        self.assertEqual(last_close_time("BTCUSDT", "1m", self.store_dir), broken_start - 1)
+
+        self.stub.broken = None
+        self.stub.requests.clear()
+        stats = self.download("2024-01-01", "2024-02-01")
+        # Докачка начинается ровно с упавшего куска; уже сохранённое не запрашивается снова
+        resumed_from = min(int(params["startTime"]) for params in self.stub.requests)
+        self.assertEqual(resumed_from, broken_start)
+        missing = (to_ms("2024-02-01") - broken_start) // MINUTE + 1
+        self.assertEqual(stats["BTCUSDT"].candles, missing)
+        self.assert_contiguous("BTCUSDT", "2024-01-01", "2024-02-01")
+
+    def test_head_range_is_written_only_when_complete(self) -> None:
+        _ = self.download("2024-01-29", "2024-02-01")
+        self.stub.broken = (LISTED_FROM + CHUNK_MS, LISTED_FROM + CHUNK_MS + 1)
+
+        with self.assertRaises(RuntimeError):
+            _ = self.download("2024-01-01", "2024-02-01")
+        self.assertEqual(first_open_time("BTCUSDT", "1m", self.store_dir), to_ms("2024-01-29"))
+
+        self.stub.broken = None
+        _ = self.download("2024-01-01", "2024-02-01")
+        self.assert_contiguous("BTCUSDT", "2024-01-01", "2024-02-01")
+
+
+if __name__ == "__main__":
+    unittest.main()
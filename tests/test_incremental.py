@@ -0,0 +1,81 @@
+import contextlib
+import io
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from crypto.artifacts import read_frame
+from crypto.processed.prepare_data import FEATURE_COLUMNS, calculate_indicators
+from crypto.strategies.ensemble_crypto_strategy import predict_ensemble
+from crypto.strategies.incremental import (
+    PSI_THRESHOLD,
+    population_stability,
+    update_ensemble_model,
+)
+from crypto.strategies.model_store import artifact_path, load_artifact
+
+ROWS = 1_600
+NEW_ROWS = 48
+
+
+def synthetic_features(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 2_000 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    index = pd.date_range("2024-01-01", periods=rows, freq="h", name="open_time")
+    klines = pd.DataFrame(
+        {"open": close, "high": close, "low": close, "close": close, "volume": 1.0}, index=index
+    )
+    return calculate_indicators(klines)
+
+
+class PopulationStabilityTest(unittest.TestCase):
+    def test_same_distribution_is_stable_and_a_shift_is_not(self) -> None:
+        rng = np.random.default_rng(0)
+        reference = rng.normal(0, 1, 5_000)
+        self.assertLess(population_stability(reference, rng.normal(0, 1, 1_000)), 0.05)
+        self.assertGreater(population_stability(reference, rng.normal(1, 1, 1_000)), PSI_THRESHOLD)
+
+
+class UpdateEnsembleTest(unittest.TestCase):
+    def setUp(self) -> None:
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.dirs = {"model_dir": f"{root.name}/models", "predictions_dir": root.name}
+        self.features_df = synthetic_features(ROWS + NEW_ROWS)
+
+    def update(self, df: pd.DataFrame, interval: str = "1h") -> dict:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return update_ensemble_model(df, "ETHUSDT", n_jobs=1, interval=interval, **self.dirs)
+
+    def test_update_keeps_the_forest_size_and_adds_boosted_rounds(self) -> None:
+        self.assertEqual(self.update(self.features_df.iloc[:-NEW_ROWS])["mode"], "full")
+        before, _ = load_artifact(artifact_path("ETHUSDT", model_dir=self.dirs["model_dir"]))
+        rounds = before.named_estimators_["xgb"].get_booster().num_boosted_rounds()
+        trees = before.named_estimators_["rf"].estimators_
+
+        report = self.update(self.features_df)
+        self.assertEqual(report["mode"], "incremental", report["reasons"])
+        after, meta = load_artifact(artifact_path("ETHUSDT", model_dir=self.dirs["model_dir"]))
+        models = after.named_estimators_
+        self.assertEqual(
+            models["xgb"].get_booster().num_boosted_rounds(), rounds + report["xgb_rounds"]
+        )
+        self.assertEqual(len(models["rf"].estimators_), len(trees))
+        self.assertEqual(meta["rotated_trees"], report["rf_trees"])
+
+        # Прогнозы переписаны обновлённой моделью и доходят до последней свечи
+        predictions = read_frame(f"{self.dirs['predictions_dir']}/ETHUSDT_predictions.csv")
+        self.assertEqual(predictions.index[-1], self.features_df.index[-1])
+        _, probs = predict_ensemble(after, predictions[FEATURE_COLUMNS].astype(float))
+        np.testing.assert_allclose(predictions["prediction_prob"], probs)
+
+    def test_candles_of_another_interval_are_rejected(self) -> None:
+        _ = self.update(self.features_df.iloc[:-NEW_ROWS])
+        with self.assertRaises(ValueError):
+            _ = self.update(self.features_df, interval="1m")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from binance_stub import StubBinance, stub_kline
+
+from crypto.data.get_binance_data import get_klines, update_store
+from crypto.data.kline_store import (
+    klines_to_array,
+    last_close_time,
+    partitions,
+    read_klines,
+    to_ms,
+    write_klines,
+)
+
+HOUR = 3_600_000
+LISTED_FROM = to_ms("2024-01-01")
+LISTED_UNTIL = to_ms("2024-06-01")
+
+
+class KlineStoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.stub = StubBinance(LISTED_FROM, LISTED_UNTIL).__enter__()
+        self.addCleanup(self.stub.__exit__)
+        store = tempfile.TemporaryDirectory()
+        self.addCleanup(store.cleanup)
+        self.store_dir = store.name
+
+    def update(self, start: str, end: str) -> int:
+        return update_store("BTCUSDT", "1h", start, end, self.store_dir, self.stub.base_url)
+
+    def test_get_klines_pages_through_the_stub(self) -> None:
+        klines_df = get_klines("BTCUSDT", "1h", "2024-01-01", "2024-03-01", self.stub.base_url)
+        self.assertEqual(len(klines_df), (to_ms("2024-03-01") - LISTED_FROM) // HOUR + 1)
+        self.assertTrue(klines_df.index.is_monotonic_increasing)
+        self.assertGreater(len(self.stub.requests), 1)  # > PAGE_LIMIT свечей — несколько страниц
+
+    def test_partitions_by_month(self) -> None:
+        _ = self.update("2024-01-20", "2024-03-10")
+        self.assertEqual(
+            [path.stem for path in partitions("BTCUSDT", "1h", self.store_dir)],
+            ["2024-01", "2024-02", "2024-03"],
+        )
+        for path in partitions("BTCUSDT", "1h", self.store_dir):
+            months = np.load(path)["open_time"].astype("datetime64[ms]").astype("datetime64[M]")
+            self.assertTrue((months == np.datetime64(path.stem, "M")).all())
+
+        stored = read_klines("BTCUSDT", "1h", store_dir=self.store_dir)
+        self.assertTrue((np.diff(stored["open_time"]) == HOUR).all())
+        self.assertEqual(stored["open_time"][0], to_ms("2024-01-20"))
+
+    def test_resume_fetches_only_the_missing_tail(self) -> None:
+        _ = self.update("2024-01-01", "2024-02-01")
+        stored_until = last_close_time("BTCUSDT", "1h", self.store_dir)
+        assert stored_until is not None
+
+        self.stub.requests.clear()
+        self.assertEqual(self.update("2024-01-01", "2024-02-01"), 0)
+        self.assertEqual(self.stub.requests, [])  # всё уже в хранилище — ни одного запроса
+
+        fetched = self.update("2024-01-01", "2024-03-01")
+        self.assertEqual(int(self.stub.requests[0]["startTime"]), stored_until + 1)
+        self.assertEqual(fetched, (to_ms("2024-03-01") - to_ms("2024-02-01")) // HOUR)
+
+        stored = read_klines("BTCUSDT", "1h", store_dir=self.store_dir)
+        self.assertTrue((np.diff(stored["open_time"]) == HOUR).all())
+
+    def test_boundary_duplicates_are_stored_once_and_the_fresh_candle_wins(self) -> None:
+        boundary = to_ms("2024-02-01")
+        first = [stub_kline(boundary - HOUR * k, HOUR) for k in range(3, -1, -1)]
+        write_klines(klines_to_array(first), "BTCUSDT", "1h", self.store_dir)
+
+        # Перекрытие на границе месяца: свеча boundary приходит снова, уже с другим close
+        fresh = [stub_kline(boundary + HOUR * k, HOUR) for k in range(3)]
+        fresh[0][4] = "123.0"
+        write_klines(klines_to_array(fresh), "BTCUSDT", "1h", self.store_dir)
+
+        stored = read_klines("BTCUSDT", "1h", store_dir=self.store_dir)
+        self.assertEqual(len(stored), 6)
+        self.assertEqual(len(np.unique(stored["open_time"])), 6)
+        self.assertEqual(stored["close"][stored["open_time"] == boundary][0], 123.0)
+        self.assertEqual(Path(partitions("BTCUSDT", "1h", self.store_dir)[-1]).stem, "2024-02")
+
+
+if __name__ == "__main__":
+    unittest.main()
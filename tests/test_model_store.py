@@ -0,0 +1,53 @@
+import tempfile
+import unittest
+from datetime import UTC, datetime
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from crypto.strategies.ensemble_crypto_strategy import build_ensemble
+from crypto.strategies.model_store import artifact_path, list_versions, load_artifact, save_artifact
+
+FEATURES = ["rsi", "return"]
+
+
+class SaveArtifactTest(unittest.TestCase):
+    def setUp(self) -> None:
+        models = tempfile.TemporaryDirectory()
+        self.addCleanup(models.cleanup)
+        self.model_dir = models.name
+        index = pd.date_range("2024-01-01", periods=4, freq="h")
+        self.train_df = pd.DataFrame(
+            {"rsi": np.arange(4.0), "return": np.zeros(4), "target": [0, 1, 0, 1]}, index=index
+        )
+
+    def save(self, rows: int) -> str:
+        train_df = self.train_df.iloc[:rows]
+        artifact_dir = save_artifact(
+            build_ensemble(), "BTCUSDT", train_df, FEATURES, model_dir=self.model_dir
+        )
+        return artifact_dir.name
+
+    def test_back_to_back_saves_get_distinct_versions(self) -> None:
+        versions = [self.save(rows) for rows in (2, 3, 4)]
+        self.assertEqual(len(set(versions)), 3)
+        self.assertEqual(list_versions("BTCUSDT", self.model_dir), sorted(versions))
+        latest = artifact_path("BTCUSDT", model_dir=self.model_dir)
+        self.assertEqual(latest.name, versions[-1])
+
+    def test_existing_version_is_never_overwritten(self) -> None:
+        frozen = datetime(2024, 1, 1, tzinfo=UTC)
+        with mock.patch("crypto.strategies.model_store.datetime") as clock:
+            clock.now.return_value = frozen
+            version = self.save(2)
+            with self.assertRaises(FileExistsError):
+                _ = self.save(4)
+
+        _, meta = load_artifact(artifact_path("BTCUSDT", version, self.model_dir))
+        self.assertEqual(meta["train_rows"], 2)
+        self.assertEqual(artifact_path("BTCUSDT", model_dir=self.model_dir).name, version)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from crypto.pipeline import build_stages, run_pipeline
+from crypto.strategies.walk_forward import TEST_BARS, TRAIN_BARS
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent / "crypto"
+ROWS = TRAIN_BARS + TEST_BARS // 4  # один фолд walk-forward
+
+
+class PipelineFreshnessTest(unittest.TestCase):
+    def setUp(self) -> None:
+        # Стадии пишут по путям от cwd — гоняем их в копии исходников, а не в рабочем дереве
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        shutil.copytree(
+            PACKAGE_DIR,
+            Path(root.name) / "crypto",
+            ignore=shutil.ignore_patterns("__pycache__", "*.csv", "*.npz", "models"),
+        )
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(root.name)
+
+        rng = np.random.default_rng(0)
+        close = 2_000 * np.exp(np.cumsum(rng.normal(0, 0.01, ROWS)))
+        index = pd.date_range("2020-05-01", periods=ROWS, freq="h", name="open_time")
+        klines = pd.DataFrame(
+            {
+                "open": close,
+                "high": close * 1.004,
+                "low": close * 0.996,
+                "close": close,
+                "volume": rng.lognormal(3, 1, ROWS),
+            },
+            index=index,
+        )
+        self.stages = build_stages(
+            ["ETHUSDT"], "1h", "2020-05-01", "2021-08-01", download=False, walk_forward=True
+        )
+        source = Path("crypto/data/ETHUSDT_1h_2020-05-01_2021-08-01.csv")
+        source.parent.mkdir(parents=True, exist_ok=True)
+        klines.to_csv(source)
+
+    def run_stages(self) -> dict[str, str]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = run_pipeline(self.stages, workers=1)
+        return dict(zip(report["stage"], report["status"]))
+
+    def test_second_walk_forward_run_skips_every_stage(self) -> None:
+        names = [stage.name for stage in self.stages]
+        self.assertEqual(self.run_stages(), dict.fromkeys(names, "ran"))
+        self.assertEqual(self.run_stages(), dict.fromkeys(names, "fresh"))
+
+
+if __name__ == "__main__":
+    unittest.main()
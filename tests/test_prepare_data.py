@@ -0,0 +1,38 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from crypto.processed.prepare_data import calculate_indicators, iter_indicator_chunks
+
+ROWS = 3000
+
+
+class ChunkedIndicatorsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        close = 60_000 * np.exp(np.cumsum(rng.normal(0, 0.002, ROWS)))
+        close[500:530] = close[500]  # ровный участок: нулевые gain/loss и volatility
+        index = pd.date_range("2024-01-01", periods=ROWS, freq="min", name="time")
+        raw = pd.DataFrame({"close": close, "volume": 1.0}, index=index)
+
+        source = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.source = Path(source.name) / "BTCUSDT_1m.csv"
+        raw.to_csv(self.source)
+        self.batch = calculate_indicators(pd.read_csv(self.source, index_col=0, parse_dates=True))
+
+    def test_chunks_reproduce_the_batch_frame(self) -> None:
+        for chunk_rows in (7, 97, 1000, ROWS + 1):
+            with self.subTest(chunk_rows=chunk_rows):
+                chunked = pd.concat(list(iter_indicator_chunks(self.source, chunk_rows)))
+                self.assertTrue(chunked.index.equals(self.batch.index))
+                self.assertTrue(chunked["target"].equals(self.batch["target"]))
+                for name in chunked.columns:
+                    np.testing.assert_array_equal(chunked[name], self.batch[name])
+
+
+if __name__ == "__main__":
+    unittest.main()
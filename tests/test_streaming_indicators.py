@@ -0,0 +1,49 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from crypto.processed.prepare_data import FEATURE_COLUMNS, calculate_indicators
+from crypto.processed.streaming_indicators import StreamingIndicators, stream_indicators
+
+ROWS = 5_000
+CHECKPOINT_ROW = 2_345
+
+
+class StreamingIndicatorsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        close = 60_000 * np.exp(np.cumsum(rng.normal(0, 0.004, ROWS)))
+        close[1_000:1_030] = close[1_000]  # ровный участок: нулевые gain/loss и volatility
+        index = pd.date_range("2024-01-01", periods=ROWS, freq="h", name="open_time")
+        self.price_df = pd.DataFrame({"close": close, "volume": 1.0}, index=index)
+        self.batch = calculate_indicators(self.price_df)
+
+    def assert_matches_batch(self, streamed: pd.DataFrame) -> None:
+        streamed = streamed.loc[self.batch.index]
+        for name in FEATURE_COLUMNS:
+            np.testing.assert_allclose(
+                streamed[name], self.batch[name], rtol=1e-9, atol=1e-9, err_msg=name
+            )
+
+    def test_stream_matches_the_batch_features(self) -> None:
+        self.assert_matches_batch(stream_indicators(self.price_df))
+
+    def test_checkpoint_restore_continues_the_stream(self) -> None:
+        engine = StreamingIndicators()
+        head = stream_indicators(self.price_df.iloc[:CHECKPOINT_ROW], engine)
+
+        checkpoint = tempfile.TemporaryDirectory()
+        self.addCleanup(checkpoint.cleanup)
+        path = Path(checkpoint.name) / "state.json"
+        engine.save_checkpoint(path)
+        restored = StreamingIndicators.load_checkpoint(path)
+
+        tail = stream_indicators(self.price_df.iloc[CHECKPOINT_ROW:], restored)
+        self.assert_matches_batch(pd.concat([head, tail]))
+
+
+if __name__ == "__main__":
+    unittest.main()